@@ -4,11 +4,17 @@
 
 """Public buildspec to GIT mapping."""
 
+import collections
 import re
 from deps2git import SplitScmUrl
 
 GIT_HOST = 'https://chromium.googlesource.com/'
-webkit_git = GIT_HOST + 'chromium/blink.git'
+
+# What CleanDeps() learns about a buildspec that SvnUrlToGitUrl() needs:
+# webkit_git is the repository the top-level WebKit entry is checked out from.
+BuildspecContext = collections.namedtuple('BuildspecContext', ['webkit_git'])
+
+DEFAULT_CONTEXT = BuildspecContext(webkit_git=GIT_HOST + 'chromium/blink.git')
 
 # Remove the ffmpeg overrides, since the buildspec DEPS have stripped out these
 # (and other) vars that they don't use, and without them in the DEPS, deps2git
@@ -20,7 +26,11 @@ DEPS_OVERRIDES = {
 
 # pylint: disable=W0613
 def CleanDeps(deps, deps_os, include_rules, skip_child_includes, hooks):
-  global webkit_git
+  """Clean up the sections of a buildspec in place.
+
+  Return the BuildspecContext to map its URLs with.  Nothing is shared
+  between calls, so several buildspecs can be cleaned up concurrently."""
+  webkit_git = DEFAULT_CONTEXT.webkit_git
   webkit_rev = None
   for os, deps_section in ([(None, deps)] +
                            [(os, deps_os[os]) for os in deps_os]):
@@ -118,8 +128,14 @@ def CleanDeps(deps, deps_os, include_rules, skip_child_includes, hooks):
     url, rev = SplitScmUrl(dep_url)
     deps['src/third_party/WebKit'] = '%s@%s' % (url, webkit_rev)
 
-def SvnUrlToGitUrl(path, svn_url):
-  """Convert a chromium SVN URL to a chromium Git URL."""
+  return BuildspecContext(webkit_git=webkit_git)
+
+
+def SvnUrlToGitUrl(path, svn_url, context=None):
+  """Convert a chromium SVN URL to a chromium Git URL.
+
+  context is what CleanDeps() returned for the buildspec svn_url is from."""
+  context = context or DEFAULT_CONTEXT
 
   match = re.match(
       '(https?://src.chromium.org/svn|svn://svn.chromium.org/chrome)(/.*)',
@@ -184,7 +200,7 @@ def SvnUrlToGitUrl(path, svn_url):
   # Make the top-level webkit entry checkout the full webkit git repository,
   # which replaces all the (non-iOS) sub-path entries.
   if svn_url == '/trunk/deps/third_party/WebKit':
-    return (path, webkit_git, GIT_HOST)
+    return (path, context.webkit_git, GIT_HOST)
 
   # Make the top-level python/selenium entry checkout the full selenium/py git
   # repository, which replaces all the sub-path entries.
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import threading
+import unittest
+
+import buildspec_to_git
+import svn_to_git_public
+import url_mapper
+
+
+GIT_HOST = buildspec_to_git.GIT_HOST
+WEBKIT = '/trunk/deps/third_party/WebKit'
+
+
+def _Buildspec(webkit_root, rev):
+  """Return the deps of a buildspec with WebKit sub-path entries."""
+  return {
+      'src/third_party/WebKit': WEBKIT + '@1',
+      'src/third_party/WebKit/Source': '%s/trunk/Source@%d' % (
+          webkit_root, rev),
+      'src/third_party/WebKit/Tools': '%s/trunk/Tools@%d' % (
+          webkit_root, rev),
+  }
+
+
+class CleanDepsTest(unittest.TestCase):
+  def testContext(self):
+    deps = _Buildspec('http://svn.webkit.org/repository/webkit', 1234)
+    context = buildspec_to_git.CleanDeps(deps, {}, [], [], [])
+    self.assertEqual({'src/third_party/WebKit': WEBKIT + '@1234'}, deps)
+    self.assertEqual(
+        ('src/third_party/WebKit', GIT_HOST + 'external/WebKit_trimmed.git',
+         GIT_HOST),
+        buildspec_to_git.SvnUrlToGitUrl('src/third_party/WebKit', WEBKIT,
+                                        context))
+    # Without a context, the blink repository is used.
+    self.assertEqual(
+        ('src/third_party/WebKit', GIT_HOST + 'chromium/blink.git', GIT_HOST),
+        buildspec_to_git.SvnUrlToGitUrl('src/third_party/WebKit', WEBKIT))
+
+  def testConcurrent(self):
+    roots = ['http://svn.webkit.org/repository/webkit',
+             'http://src.chromium.org/blink'] * 20
+    git_urls = [None] * len(roots)
+    mapper = url_mapper.UrlMapper([buildspec_to_git, svn_to_git_public])
+    start = threading.Event()
+    def _Convert(index):
+      start.wait()
+      deps = _Buildspec(roots[index], 1000 + index)
+      context = buildspec_to_git.CleanDeps(deps, {}, [], [], [])
+      git_urls[index] = mapper.Map('src/third_party/WebKit', WEBKIT,
+                                   {buildspec_to_git: context})[1]
+    threads = [threading.Thread(target=_Convert, args=(index,))
+               for index in xrange(len(roots))]
+    for th in threads:
+      th.start()
+    start.set()
+    for th in threads:
+      th.join()
+    self.assertEqual([GIT_HOST + 'external/WebKit_trimmed.git',
+                      GIT_HOST + 'chromium/blink.git'] * 20, git_urls)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""A persistent cache of SVN revision to Git commit id conversions.
+
+It also remembers how long each repository took to convert, so later runs
+can start with the slowest ones, when each repository was last verified to
+exist, and how SVN URLs were mapped to Git URLs by each version of the rules
+modules."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# Name of the cache database inside the cache or repos directory.
+CACHE_FILE = 'deps2git-conversions.sqlite'
+
+# Default number of conversions to keep.  Each row is ~150 bytes, so this
+# bounds the database to a few tens of MB.
+DEFAULT_MAX_ENTRIES = 200000
+
+
+class ConversionCache(object):
+  """Maps (git_url, svn_branch, svn_rev) to a Git commit id across runs.
+
+  An SVN revision always maps to the same commit, so entries never go stale.
+  The least recently used entries are evicted once there are more than
+  max_entries of them.  Safe to share between threads and processes.
+
+  Also keeps the time the last lookups in each repository took, when each
+  repository was last verified, and url_mapper.UrlMapper mappings."""
+
+  def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+    self.path = path
+    self.max_entries = max_entries
+    self._lock = threading.Lock()
+    self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+    with self._db:
+      self._db.execute(
+          'CREATE TABLE IF NOT EXISTS conversions ('
+          '  git_url TEXT NOT NULL,'
+          '  svn_branch TEXT NOT NULL,'
+          '  svn_rev TEXT NOT NULL,'
+          '  git_hash TEXT NOT NULL,'
+          '  last_used REAL NOT NULL,'
+          '  PRIMARY KEY (git_url, svn_branch, svn_rev))')
+      self._db.execute(
+          'CREATE INDEX IF NOT EXISTS conversions_last_used '
+          'ON conversions (last_used)')
+      self._db.execute(
+          'CREATE TABLE IF NOT EXISTS timings ('
+          '  git_url TEXT PRIMARY KEY,'
+          '  seconds REAL NOT NULL,'
+          '  last_used REAL NOT NULL)')
+      self._db.execute(
+          'CREATE TABLE IF NOT EXISTS verified ('
+          '  git_url TEXT PRIMARY KEY,'
+          '  last_used REAL NOT NULL)')
+      self._db.execute(
+          'CREATE TABLE IF NOT EXISTS url_mappings ('
+          '  fingerprint TEXT NOT NULL,'
+          '  key TEXT NOT NULL,'
+          '  converted_data TEXT NOT NULL,'
+          '  last_used REAL NOT NULL,'
+          '  PRIMARY KEY (fingerprint, key))')
+
+  def LookupMany(self, git_url, svn_revs):
+    """Look up (svn_rev, svn_branch) pairs of one repository.
+
+    Return a dict mapping the pairs that are in the cache to their Git commit
+    id."""
+    found = {}
+    now = time.time()
+    with self._lock, self._db:
+      for svn_rev, svn_branch in svn_revs:
+        row = self._db.execute(
+            'SELECT git_hash FROM conversions '
+            'WHERE git_url = ? AND svn_branch = ? AND svn_rev = ?',
+            (git_url, svn_branch or '', str(svn_rev))).fetchone()
+        if row:
+          found[(svn_rev, svn_branch)] = str(row[0])
+      if found:
+        self._db.executemany(
+            'UPDATE conversions SET last_used = ? '
+            'WHERE git_url = ? AND svn_branch = ? AND svn_rev = ?',
+            [(now, git_url, svn_branch or '', str(svn_rev))
+             for svn_rev, svn_branch in found])
+    return found
+
+  def AddMany(self, git_url, git_hashes):
+    """Record a dict mapping (svn_rev, svn_branch) pairs to Git commit ids."""
+    if not git_hashes:
+      return
+    now = time.time()
+    with self._lock, self._db:
+      self._db.executemany(
+          'INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?, ?)',
+          [(git_url, svn_branch or '', str(svn_rev), git_hash, now)
+           for (svn_rev, svn_branch), git_hash in git_hashes.iteritems()])
+      count = self._db.execute('SELECT COUNT(*) FROM conversions').fetchone()[0]
+      if count > self.max_entries:
+        self._db.execute(
+            'DELETE FROM conversions WHERE rowid IN ('
+            '  SELECT rowid FROM conversions ORDER BY last_used LIMIT ?)',
+            (count - self.max_entries,))
+
+  def GetTimings(self):
+    """Return a dict mapping git URLs to the seconds their lookups took."""
+    with self._lock:
+      return dict((str(git_url), seconds) for git_url, seconds in
+                  self._db.execute('SELECT git_url, seconds FROM timings'))
+
+  def AddTiming(self, git_url, seconds):
+    """Record that looking up revisions in git_url took seconds."""
+    now = time.time()
+    with self._lock, self._db:
+      self._db.execute('INSERT OR REPLACE INTO timings VALUES (?, ?, ?)',
+                       (git_url, seconds, now))
+      count = self._db.execute('SELECT COUNT(*) FROM timings').fetchone()[0]
+      if count > self.max_entries:
+        self._db.execute(
+            'DELETE FROM timings WHERE rowid IN ('
+            '  SELECT rowid FROM timings ORDER BY last_used LIMIT ?)',
+            (count - self.max_entries,))
+
+  def GetVerified(self, max_age):
+    """Return the set of git URLs verified at most max_age seconds ago."""
+    with self._lock:
+      return set(str(git_url) for (git_url,) in self._db.execute(
+          'SELECT git_url FROM verified WHERE last_used >= ?',
+          (time.time() - max_age,)))
+
+  def AddVerified(self, git_url):
+    """Record that git_url was just verified to exist."""
+    with self._lock, self._db:
+      self._db.execute('INSERT OR REPLACE INTO verified VALUES (?, ?)',
+                       (git_url, time.time()))
+      self._db.execute('DELETE FROM verified WHERE rowid IN ('
+                       '  SELECT rowid FROM verified ORDER BY last_used DESC'
+                       '  LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+  def GetUrlMappings(self, fingerprint, limit):
+    """Return the limit most recently used URL mappings saved with fingerprint.
+
+    That is a dict mapping (path, svn_url, contexts) keys to the
+    (path, git_url, git_host[, svn_branch]) tuple or None they mapped to."""
+    mappings = {}
+    with self._lock:
+      for key, converted_data in self._db.execute(
+          'SELECT key, converted_data FROM url_mappings WHERE fingerprint = ? '
+          'ORDER BY last_used DESC LIMIT ?', (fingerprint, limit)):
+        path, svn_url, contexts = json.loads(key)
+        converted_data = json.loads(converted_data)
+        if converted_data is not None:
+          converted_data = tuple(str(value) for value in converted_data)
+        contexts = tuple(context and tuple(str(value) for value in context)
+                         for context in contexts)
+        mappings[(str(path), str(svn_url), contexts)] = converted_data
+    return mappings
+
+  def AddUrlMappings(self, fingerprint, mappings):
+    """Record a dict of URL mappings, as returned by GetUrlMappings()."""
+    if not mappings:
+      return
+    now = time.time()
+    with self._lock, self._db:
+      self._db.executemany(
+          'INSERT OR REPLACE INTO url_mappings VALUES (?, ?, ?, ?)',
+          [(fingerprint, json.dumps(key), json.dumps(converted_data), now)
+           for key, converted_data in mappings.iteritems()])
+      self._db.execute(
+          'DELETE FROM url_mappings WHERE rowid IN ('
+          '  SELECT rowid FROM url_mappings ORDER BY last_used DESC'
+          '  LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+  def Close(self):
+    with self._lock:
+      self._db.close()
+
+
+def Open(cache_dir, max_entries=DEFAULT_MAX_ENTRIES):
+  """Open the conversion cache kept in cache_dir, creating it if needed."""
+  if not os.path.isdir(cache_dir):
+    os.makedirs(cache_dir)
+  return ConversionCache(os.path.join(cache_dir, CACHE_FILE), max_entries)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import shutil
+import tempfile
+import time
+import unittest
+
+import conversion_cache
+
+
+URL = 'https://chromium.googlesource.com/chromium/src/foo.git'
+
+
+class ConversionCacheTest(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def testPersists(self):
+    cache = conversion_cache.Open(self.tmp_dir)
+    cache.AddMany(URL, {('13', None): 'a' * 40, ('13', '1750'): 'b' * 40})
+    cache.Close()
+    cache = conversion_cache.Open(self.tmp_dir)
+    self.assertEqual(
+        {('13', None): 'a' * 40, ('13', '1750'): 'b' * 40},
+        cache.LookupMany(URL, [('13', None), ('13', '1750'), ('21', None)]))
+    self.assertEqual({}, cache.LookupMany(URL + '.other', [('13', None)]))
+    cache.Close()
+
+  def testEviction(self):
+    cache = conversion_cache.Open(self.tmp_dir, max_entries=2)
+    cache.AddMany(URL, {('1', None): 'a' * 40})
+    cache.AddMany(URL, {('2', None): 'b' * 40})
+    # Using r1 makes r2 the least recently used entry.
+    cache.LookupMany(URL, [('1', None)])
+    cache.AddMany(URL, {('3', None): 'c' * 40})
+    self.assertEqual(
+        {('1', None): 'a' * 40, ('3', None): 'c' * 40},
+        cache.LookupMany(URL, [('1', None), ('2', None), ('3', None)]))
+    cache.Close()
+
+  def testTimings(self):
+    cache = conversion_cache.Open(self.tmp_dir)
+    cache.AddTiming(URL, 12.5)
+    cache.AddTiming(URL + '.other', 1)
+    cache.AddTiming(URL, 10)
+    cache.Close()
+    cache = conversion_cache.Open(self.tmp_dir)
+    self.assertEqual({URL: 10, URL + '.other': 1}, cache.GetTimings())
+    cache.Close()
+
+  def testVerified(self):
+    cache = conversion_cache.Open(self.tmp_dir)
+    cache.AddVerified(URL)
+    self.assertEqual(set([URL]), cache.GetVerified(60))
+    time.sleep(0.1)
+    self.assertEqual(set(), cache.GetVerified(0.05))
+    cache.Close()
+
+  def testUrlMappings(self):
+    key = ('src/foo', '/trunk/deps/foo', (None, ('webkit_git',)))
+    converted_data = ('src/foo', URL, 'https://chromium.googlesource.com/')
+    cache = conversion_cache.Open(self.tmp_dir)
+    cache.AddUrlMappings('1', {key: converted_data})
+    cache.AddUrlMappings('2', {key: None})
+    cache.Close()
+    cache = conversion_cache.Open(self.tmp_dir)
+    self.assertEqual({key: converted_data}, cache.GetUrlMappings('1', 10))
+    self.assertEqual({key: None}, cache.GetUrlMappings('2', 10))
+    self.assertEqual({}, cache.GetUrlMappings('3', 10))
+    cache.Close()
+
+
+if __name__ == '__main__':
+  unittest.main()
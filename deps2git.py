@@ -6,20 +6,25 @@
 """Convert SVN based DEPS into .DEPS.git for use with NewGit."""
 
 import collections
-from cStringIO import StringIO
+import heapq
 import json
 import optparse
 import os
 import Queue
+import shlex
 import shutil
+import signal
 import subprocess
 import sys
 import threading
 import time
+import urlparse
 
+import conversion_cache
 import deps_utils
 import git_tools
 import svn_to_git_public
+import url_mapper
 
 try:
   import git_cache
@@ -30,13 +35,16 @@ except ImportError:
       sys.path.append(p)
   import git_cache
 
+# results is the ConversionResults of the DEPS the dep is from.
 Job = collections.namedtuple(
     'Job',
-    ['dep', 'git_url', 'dep_url', 'path', 'git_host', 'dep_rev', 'svn_branch'])
+    ['dep', 'git_url', 'dep_url', 'path', 'git_host', 'dep_rev', 'svn_branch',
+     'os_dep', 'results'])
 
 ConversionResults = collections.namedtuple(
     'ConversionResults',
-    ['new_deps', 'deps_vars', 'bad_git_urls', 'bad_dep_urls', 'bad_git_hash'])
+    ['new_deps', 'new_deps_os', 'deps_vars', 'bad_git_urls', 'bad_dep_urls',
+     'bad_git_hash'])
 
 # This is copied from depot_tools/gclient.py
 DEPS_OS_CHOICES = {
@@ -65,8 +73,27 @@ def SplitScmUrl(url):
 
 def SvnRevToGitHash(
     svn_rev, git_url, repos_path, workspace, dep_path, git_host,
-    svn_branch_name=None, cache_dir=None, outbuf=None, shallow=None):
+    svn_branch_name=None, cache_dir=None, outbuf=None, shallow=None,
+    search_mode=git_tools.SEARCH_INDEX):
   """Convert a SVN revision to a Git commit id."""
+  git_hash = SvnRevsToGitHashes(
+      [(svn_rev, svn_branch_name)], git_url, repos_path, workspace, dep_path,
+      git_host, cache_dir, outbuf, shallow,
+      search_mode)[(svn_rev, svn_branch_name)]
+  if isinstance(git_hash, Exception):
+    raise git_hash
+  return git_hash.git_hash
+
+
+def SvnRevsToGitHashes(
+    svn_revs, git_url, repos_path, workspace, dep_path, git_host,
+    cache_dir=None, outbuf=None, shallow=None,
+    search_mode=git_tools.SEARCH_INDEX):
+  """Convert many SVN revisions of one repository to Git commit ids.
+
+  svn_revs is a list of (svn_rev, svn_branch_name) pairs.  Return a dict
+  mapping each pair to a git_tools.SearchResult, or to the
+  git_tools.SearchError describing why it couldn't be found."""
   git_repo = None
   if git_url.startswith(git_host):
     git_repo = git_url.replace(git_host, '')
@@ -77,12 +104,14 @@ def SvnRevToGitHash(
     # We cannot actually find the commit id, but this mode is useful
     # just for testing the URL mappings.  Produce an output file that
     # can't actually be used, but can be eyeballed for correct URLs.
-    return 'xxx-r%s' % svn_rev
+    return dict((rev, git_tools.SearchResult('xxx-r%s' % rev[0], None, None))
+                for rev in svn_revs)
   if repos_path:
     mirror = True
     git_repo_path = os.path.join(repos_path, git_repo)
-    if not os.path.exists(git_repo_path) or not os.listdir(git_repo_path):
-      git_tools.Clone(git_url, git_repo_path, mirror, outbuf)
+    with git_tools.RepoLock(git_repo_path, mirror, exclusive=True):
+      if not os.path.exists(git_repo_path) or not os.listdir(git_repo_path):
+        git_tools.Clone(git_url, git_repo_path, mirror, outbuf)
   elif cache_dir:
     mirror = True
     git_repo_path = git_tools.PopulateCache(git_url, shallow)
@@ -103,31 +132,43 @@ def SvnRevToGitHash(
     if not os.path.exists(git_repo_path):
       git_tools.Clone(git_url, git_repo_path, mirror, outbuf)
 
-  if svn_branch_name:
-    # svn branches are mirrored with:
-    # branches = branches/*:refs/remotes/branch-heads/*
-    if mirror:
-      refspec = 'refs/branch-heads/' + svn_branch_name
-    else:
-      refspec = 'refs/remotes/branch-heads/' + svn_branch_name
-  else:
-    if mirror:
-      refspec = 'refs/heads/master'
+  git_hashes = {}
+  requests = {}
+  for svn_rev, svn_branch_name in svn_revs:
+    if svn_branch_name:
+      # svn branches are mirrored with:
+      # branches = branches/*:refs/remotes/branch-heads/*
+      if mirror:
+        refspec = 'refs/branch-heads/' + svn_branch_name
+      else:
+        refspec = 'refs/remotes/branch-heads/' + svn_branch_name
     else:
-      refspec = 'refs/remotes/origin/master'
+      if mirror:
+        refspec = 'refs/heads/master'
+      else:
+        refspec = 'refs/remotes/origin/master'
 
-  # Work-around for:
-  #   http://code.google.com/p/chromium/issues/detail?id=362222
-  if (git_url.startswith('https://chromium.googlesource.com/external/pefile')
-      and int(svn_rev) in (63, 141)):
-    return '72c6ae42396cb913bcab63c15585dc3b5c3f92f1'
+    # Work-around for:
+    #   http://code.google.com/p/chromium/issues/detail?id=362222
+    if (git_url.startswith('https://chromium.googlesource.com/external/pefile')
+        and int(svn_rev) in (63, 141)):
+      git_hashes[(svn_rev, svn_branch_name)] = git_tools.SearchResult(
+          '72c6ae42396cb913bcab63c15585dc3b5c3f92f1', int(svn_rev), None)
+      continue
 
-  # Work-around for crbug.com/391270, bleeding_edge is a local branch.
-  if (git_url.startswith('https://chromium.googlesource.com/external/v8')
-      and svn_branch_name == 'bleeding_edge'):
-    refspec = 'bleeding_edge'
+    # Work-around for crbug.com/391270, bleeding_edge is a local branch.
+    if (git_url.startswith('https://chromium.googlesource.com/external/v8')
+        and svn_branch_name == 'bleeding_edge'):
+      refspec = 'bleeding_edge'
 
-  return git_tools.Search(git_repo_path, svn_rev, mirror, refspec, git_url)
+    requests[(svn_rev, svn_branch_name)] = (svn_rev, refspec)
+
+  if requests:
+    found = git_tools.SearchBatch(git_repo_path, requests.values(), mirror,
+                                  git_url, search_mode)
+    for rev, request in requests.iteritems():
+      git_hashes[rev] = found[request]
+  return git_hashes
 
 
 def MessageMain(message_q, threads):
@@ -145,38 +186,235 @@ def MessageMain(message_q, threads):
       print >> sys.stderr, msg
 
 
-def ConvertDepMain(dep_q, message_q, options, results):
+class RepoQueue(object):
+  """Hands out the job lists of repositories to the worker threads.
+
+  Job lists are handed out in order, except that those of git hosts which
+  already have jobs_per_host repositories being converted are skipped, so a
+  busy host doesn't keep idle workers from the other hosts' repositories."""
+
+  def __init__(self, job_lists, jobs_per_host=None):
+    self.cond = threading.Condition()
+    self.pending = list(job_lists)
+    self.jobs_per_host = jobs_per_host
+    self.running = collections.defaultdict(int)
+
+  def __len__(self):
+    with self.cond:
+      return len(self.pending)
+
+  def Get(self):
+    """Return the next job list to convert, or None when there are none left.
+
+    Every job list returned must be handed back to Done()."""
+    with self.cond:
+      while self.pending:
+        for jobs in self.pending:
+          host = urlparse.urlparse(jobs[0].git_url).netloc
+          if (not self.jobs_per_host or
+              self.running[host] < self.jobs_per_host):
+            self.pending.remove(jobs)
+            self.running[host] += 1
+            return jobs
+        self.cond.wait()
+    return None
+
+  def Done(self, jobs):
+    with self.cond:
+      self.running[urlparse.urlparse(jobs[0].git_url).netloc] -= 1
+      self.cond.notify_all()
+
+  def Close(self):
+    """Drop the job lists not handed out yet."""
+    with self.cond:
+      self.pending = []
+      self.cond.notify_all()
+
+
+def ConvertDepMain(dep_q, options, conv_cache=None, errors=None):
+  """Worker thread converting the job lists of dep_q, a RepoQueue.
+
+  If errors is given, a fatal error is appended to it as a sys.exc_info()
+  triple, and all the workers stop taking new jobs."""
   cur_thread = threading.current_thread()
   while True:
+    # All the jobs in a batch share the same git repository.
+    jobs = dep_q.Get()
+    if not jobs:
+      break
+    cur_thread.working_on = ' '.join(job.dep for job in jobs)
     try:
-      job = dep_q.get(False)
-      dep, git_url, dep_url, path, git_host, dep_rev, svn_branch = job
-      cur_thread.working_on = dep
-    except Queue.Empty:
-      cur_thread.working_on = None
-      return
+      ConvertRepoJobs(jobs, options, conv_cache)
+    except Exception:
+      if errors is None:
+        raise
+      errors.append(sys.exc_info())
+      dep_q.Close()
+    finally:
+      dep_q.Done(jobs)
+  cur_thread.working_on = None
+
+
+class Verifier(object):
+  """Pings git repositories to check that they exist, as a separate stage.
+
+  Pings run on their own threads, at most jobs_per_host at once for each git
+  host.  A failed ping is retried up to tries times with exponential backoff;
+  a repository waiting for its next try doesn't hold up any thread.  If
+  conv_cache is given, repositories it verified less than ttl seconds ago are
+  not pinged again."""
+
+  def __init__(self, message_q, jobs_per_host, conv_cache=None, ttl=None,
+               tries=5, delay=0.5):
+    self.message_q = message_q
+    self.jobs_per_host = jobs_per_host
+    self.conv_cache = conv_cache
+    self.ttl = ttl
+    self.tries = tries
+    self.delay = delay
+    self.cond = threading.Condition()
+    # Heap of (when, git_url, dep, try_index, delay) to ping.
+    self.pending = []
+    self.running = collections.defaultdict(int)
+    self.bad_git_urls = set()
+    self.threads = []
+    self.stopped = False
 
-    outbuf = StringIO()
-    def _print(s):
-      for l in s.splitlines():
-        outbuf.write('[%s] %s\n' % (dep, l))
+  def Start(self, deps_by_url):
+    """Start verifying the git URLs of deps_by_url, a {git_url: dep} dict."""
+    git_urls = set(deps_by_url)
+    if self.conv_cache and self.ttl:
+      for git_url in git_urls & self.conv_cache.GetVerified(self.ttl):
+        self.message_q.put('[%s] %s was verified recently' % (
+            deps_by_url[git_url], git_url))
+        git_urls.remove(git_url)
+    now = time.time()
+    self.pending = [(now, git_url, deps_by_url[git_url], 1, self.delay)
+                    for git_url in sorted(git_urls)]
+    heapq.heapify(self.pending)
+    hosts = set(urlparse.urlparse(git_url).netloc for git_url in git_urls)
+    for _ in xrange(min(len(git_urls), len(hosts) * self.jobs_per_host)):
+      th = threading.Thread(target=self._Main)
+      th.start()
+      self.threads.append(th)
 
-    if options.verify:
-      delay = 0.5
+  def Wait(self):
+    """Wait for the verification to finish; return the bad git URLs."""
+    for th in self.threads:
+      th.join()
+    return self.bad_git_urls
+
+  def Stop(self):
+    """Drop the pings not started yet, and don't retry the running ones."""
+    with self.cond:
+      self.stopped = True
+      self.pending = []
+      self.cond.notify_all()
+
+  def _Next(self):
+    """Return the next ping to run, or None when there are none left."""
+    with self.cond:
+      while self.pending or sum(self.running.itervalues()):
+        # A running ping may fail and be retried, so keep waiting for it.
+        now = time.time()
+        wait = None
+        for item in sorted(self.pending):
+          when, git_url = item[:2]
+          if when > now:
+            wait = when - now
+            break
+          host = urlparse.urlparse(git_url).netloc
+          if self.running[host] < self.jobs_per_host:
+            self.pending.remove(item)
+            heapq.heapify(self.pending)
+            self.running[host] += 1
+            return item
+        self.cond.wait(wait)
+    return None
+
+  def _Main(self):
+    while True:
+      item = self._Next()
+      if not item:
+        return
+      _, git_url, dep, try_index, delay = item
       success = False
-      for try_index in range(1, 6):
-        _print('checking %s (try #%d) ...' % (git_url, try_index))
-        if git_tools.Ping(git_url, verbose=True):
-          _print(' success')
-          success = True
-          break
-        _print(' failure')
-        _print('sleeping for %.01f seconds ...' % delay)
-        time.sleep(delay)
-        delay *= 2
-
-      if not success:
-        results.bad_git_urls.add(git_url)
+      msg = '[%s] checking %s (try #%d) ... ' % (dep, git_url, try_index)
+      try:
+        success = git_tools.Ping(git_url, verbose=True)
+        msg += 'success' if success else 'failure'
+        if success and self.conv_cache:
+          self.conv_cache.AddVerified(git_url)
+      except Exception as e:
+        # An error recording a successful ping doesn't make it fail.
+        if not success:
+          msg += 'failure'
+        msg += ' (%s)' % e
+      finally:
+        # Always release the host, or _Next() would wait for it forever.
+        with self.cond:
+          self.running[urlparse.urlparse(git_url).netloc] -= 1
+          if not success:
+            if try_index < self.tries and not self.stopped:
+              msg += '\n[%s] retrying in %.01f seconds ...' % (dep, delay)
+              heapq.heappush(self.pending, (time.time() + delay, git_url, dep,
+                                            try_index + 1, delay * 2))
+            else:
+              self.bad_git_urls.add(git_url)
+          self.cond.notify_all()
+      self.message_q.put(msg)
+
+
+def ConvertRepoJobs(jobs, options, conv_cache=None):
+  """Convert a list of jobs sharing the same git repository.
+
+  The jobs may come from several DEPS files; each converted dep is added to
+  the results of its own."""
+  git_url = jobs[0].git_url
+
+  # Resolve the hashes for all the subversion revisions in one pass over the
+  # repository.
+  # The same revision may be pinned by several deps_os sections.
+  svn_revs = sorted(set(
+      (job.dep_rev, job.svn_branch) for job in jobs
+      if job.dep_rev != 'HEAD' and not job.dep_url.endswith('.git')))
+  git_hashes = {}
+  if svn_revs and conv_cache:
+    git_hashes = conv_cache.LookupMany(git_url, svn_revs)
+    svn_revs = [rev for rev in svn_revs if rev not in git_hashes]
+  if svn_revs:
+    start = time.time()
+    try:
+      new_hashes = SvnRevsToGitHashes(
+          svn_revs, git_url, options.repos, options.workspace, jobs[0].path,
+          jobs[0].git_host, options.cache_dir,
+          search_mode=options.search_mode)
+    except Exception as e:
+      if options.no_fail_fast:
+        # The results of each DEPS using the repository get the error once.
+        for results in dict((id(job.results), job.results)
+                            for job in jobs).itervalues():
+          results.bad_git_hash.append(e)
+        return
+      raise
+    final_hashes = {}
+    for rev, found in new_hashes.iteritems():
+      if isinstance(found, Exception):
+        git_hashes[rev] = found
+        continue
+      git_hashes[rev] = found.git_hash
+      # A fuzzy match may only be the newest commit a lagging mirror has so
+      # far; it is final once the ref has moved past the requested revision.
+      svn_rev = int(rev[0])
+      if found.found_rev == svn_rev or (found.tip_rev is not None and
+                                        found.tip_rev > svn_rev):
+        final_hashes[rev] = found.git_hash
+    if conv_cache:
+      conv_cache.AddTiming(git_url, time.time() - start)
+      conv_cache.AddMany(git_url, final_hashes)
+
+  for job in jobs:
+    dep, git_url, dep_url, path, _, dep_rev, svn_branch, os_dep, results = job
 
     # Get the Git hash based off the SVN rev.
     git_hash = ''
@@ -187,83 +425,180 @@ def ConvertDepMain(dep_q, message_q, options, results):
         git_hash = '@%s' % dep_rev
       else:
         try:
-          git_hash = '@%s' % SvnRevToGitHash(
-              dep_rev, git_url, options.repos, options.workspace, path,
-              git_host, svn_branch, options.cache_dir)
+          found = git_hashes[(dep_rev, svn_branch)]
+          if isinstance(found, Exception):
+            raise found
+          git_hash = '@%s' % found
         except Exception as e:
           if options.no_fail_fast:
             results.bad_git_hash.append(e)
             continue
           raise
 
-    # If this is webkit, we need to add the var for the hash.
-    if dep == 'src/third_party/WebKit' and dep_rev:
-      results.deps_vars['webkit_rev'] = git_hash
-      git_hash = 'VAR_WEBKIT_REV'
+    AddGitDep(results, os_dep, dep, path, git_url, dep_rev, git_hash)
+
+
+def AddGitDep(results, os_dep, dep, path, git_url, dep_rev, git_hash):
+  """Add a converted dep to results; git_hash is '' or '@<commit id>'.
+
+  os_dep is the deps_os section the dep belongs to, or None for 'deps'."""
+  # If this is webkit, we need to add the var for the hash.
+  if dep == 'src/third_party/WebKit' and dep_rev:
+    results.deps_vars['webkit_rev'] = git_hash
+    git_hash = 'VAR_WEBKIT_REV'
+
+  # Hack to preserve the angle_revision variable in .DEPS.git.
+  # This will go away as soon as deps2git does.
+  if dep == 'src/third_party/angle' and git_hash:
+    # Cut the leading '@' so this variable has the same semantics in
+    # DEPS and .DEPS.git.
+    results.deps_vars['angle_revision'] = git_hash[1:]
+    git_hash = 'VAR_ANGLE_REVISION'
+
+  # Add this Git dep to the new deps.
+  _NewDeps(results, os_dep)[path] = '%s%s' % (git_url, git_hash)
+
 
-    # Hack to preserve the angle_revision variable in .DEPS.git.
-    # This will go away as soon as deps2git does.
-    if dep == 'src/third_party/angle' and git_hash:
-      # Cut the leading '@' so this variable has the same semantics in
-      # DEPS and .DEPS.git.
-      results.deps_vars['angle_revision'] = git_hash[1:]
-      git_hash = 'VAR_ANGLE_REVISION'
+def _NewDeps(results, os_dep):
+  if os_dep is None:
+    return results.new_deps
+  return results.new_deps_os[os_dep]
 
-    # Add this Git dep to the new deps.
-    results.new_deps[path] = '%s%s' % (git_url, git_hash)
 
-    message_q.put(outbuf.getvalue())
+def PreviousGitHash(previous_git_dep, git_url, dep_rev):
+  """Return the git_hash to reuse for a dep from the previous .DEPS.git.
 
+  Return None if previous_git_dep doesn't point at git_url or doesn't pin a
+  commit when dep_rev does."""
+  if not previous_git_dep:
+    return None
+  previous_url, previous_rev = SplitScmUrl(previous_git_dep)
+  if previous_url != git_url:
+    return None
+  if dep_rev == 'HEAD':
+    return '' if previous_rev == 'HEAD' else None
+  if previous_rev == 'HEAD':
+    return None
+  return '@%s' % previous_rev
 
-def ConvertDepsToGit(deps, options, deps_vars, svn_to_git_objs):
-  """Convert a 'deps' section in a DEPS file from SVN to Git."""
-  results = ConversionResults(
+
+def ScheduleRepos(jobs_by_repo, timings):
+  """Order the per-repository job lists, most expensive first.
+
+  Starting with the slowest repositories keeps them from being picked up last
+  and holding up the whole run.  The cost of a repository is how long its
+  lookups took in the previous run, from timings.  Repositories without a
+  timing might need to be cloned, so they go first, the ones with the most
+  revisions to find first."""
+  def _Cost(repo_key):
+    jobs = jobs_by_repo[repo_key]
+    return (-timings.get(jobs[0].git_url, float('inf')), -len(jobs), repo_key)
+  return [jobs_by_repo[repo_key]
+          for repo_key in sorted(jobs_by_repo, key=_Cost)]
+
+
+def NewResults(deps_vars, deps_os):
+  """Return empty ConversionResults for a DEPS with those deps_os sections."""
+  return ConversionResults(
       new_deps={},
+      new_deps_os=dict((os_dep, {}) for os_dep in deps_os),
       deps_vars=deps_vars,
       bad_git_urls=set([]),
       bad_dep_urls=[],
       bad_git_hash=[]
   )
 
+
+def QueueDepsJobs(jobs_by_repo, results, deps, deps_os, options, mapper,
+                  contexts=None, previous=None):
+  """Map the URLs of the 'deps' and 'deps_os' sections of a DEPS file.
+
+  The jobs looking up the Git commit ids of its deps are added to
+  jobs_by_repo, a {repo_key: [Job]} dict, to be run by RunJobs(); the deps
+  needing no lookup are added to results right away.  See ConvertDepsToGit()
+  for the other arguments."""
+  ((previous_deps, previous_deps_os),
+   (previous_git_deps, previous_git_deps_os)) = previous or (({}, {}), ({}, {}))
+
   # Populate our deps list.
-  deps_to_process = Queue.Queue()
-  for dep, dep_url in deps.iteritems():
-    if not dep_url:  # dep is 'None' and emitted to exclude the dep
-      results.new_deps[dep] = None
-      continue
+  sections = [(None, deps, previous_deps, previous_git_deps)]
+  for os_dep in sorted(deps_os):
+    sections.append((os_dep, deps_os[os_dep],
+                     previous_deps_os.get(os_dep, {}),
+                     previous_git_deps_os.get(os_dep, {})))
+  for os_dep, section, previous_section, previous_git_section in sections:
+    for dep, dep_url in section.iteritems():
+      if not dep_url:  # dep is 'None' and emitted to exclude the dep
+        _NewDeps(results, os_dep)[dep] = None
+        continue
 
-    # Get the URL and the revision/hash for this dependency.
-    dep_url, dep_rev = SplitScmUrl(deps[dep])
+      # Get the URL and the revision/hash for this dependency.
+      dep_url, dep_rev = SplitScmUrl(section[dep])
 
-    path = dep
-    git_url = dep_url
-    svn_branch = None
-    git_host = dep_url
+      path = dep
+      git_url = dep_url
+      svn_branch = None
+      git_host = dep_url
 
-    if not dep_url.endswith('.git'):
-      # Convert this SVN URL to a Git URL.
-      for svn_git_converter in svn_to_git_objs:
-        converted_data = svn_git_converter.SvnUrlToGitUrl(dep, dep_url)
+      if not dep_url.endswith('.git'):
+        # Convert this SVN URL to a Git URL.
+        converted_data = mapper.Map(dep, dep_url, contexts)
         if converted_data:
           path, git_url, git_host = converted_data[:3]
           if len(converted_data) > 3:
             svn_branch = converted_data[3]
-          break
-      else:
-        # Make all match failures fatal to catch errors early. When a match is
-        # found, we break out of the loop so the exception is not thrown.
-        if options.no_fail_fast:
-          results.bad_dep_urls.append(dep_url)
+        else:
+          # Make all match failures fatal to catch errors early. When a match
+          # is found, we break out of the loop so the exception is not thrown.
+          if options.no_fail_fast:
+            results.bad_dep_urls.append(dep_url)
+            continue
+          raise RuntimeError('No match found for %s' % dep_url)
+
+      if previous_section.get(dep) == section[dep]:
+        git_hash = PreviousGitHash(previous_git_section.get(path), git_url,
+                                   dep_rev)
+        if git_hash is not None:
+          AddGitDep(results, os_dep, dep, path, git_url, dep_rev, git_hash)
           continue
-        raise RuntimeError('No match found for %s' % dep_url)
 
-    deps_to_process.put(
-        Job(dep, git_url, dep_url, path, git_host, dep_rev, svn_branch))
+      # Checkouts in a workspace are per-path, mirrors are shared by every dep
+      # using the same git_url.
+      repo_key = git_url
+      if not options.repos and not options.cache_dir and options.workspace:
+        repo_key = (git_url, path)
+      jobs_by_repo.setdefault(repo_key, []).append(
+          Job(dep, git_url, dep_url, path, git_host, dep_rev, svn_branch,
+              os_dep, results))
+
+
+def RunJobs(jobs_by_repo, options, conv_cache=None):
+  """Run the jobs of jobs_by_repo on a pool of options.num_threads workers.
+
+  With options.verify, the repositories are verified at the same time, and
+  the ones that couldn't be are added to the bad_git_urls of the results of
+  the jobs using them.  The first fatal error is re-raised once all the
+  workers have stopped."""
+  # Queue the jobs one repository at a time, so all the revisions needed from
+  # a repository are resolved in a single pass over it by a single worker.
+  timings = conv_cache.GetTimings() if conv_cache else {}
+  deps_to_process = RepoQueue(ScheduleRepos(jobs_by_repo, timings),
+                              options.jobs_per_host)
 
   threads = []
+  errors = []
   message_q = Queue.Queue()
-  thread_args = (deps_to_process, message_q, options, results)
-  num_threads = options.num_threads or deps_to_process.qsize()
+
+  # Verify the repositories while their revisions are being looked up.
+  verifier = None
+  if options.verify:
+    verifier = Verifier(message_q, options.verify_jobs_per_host, conv_cache,
+                        options.verify_ttl)
+    verifier.Start(dict((jobs[0].git_url, jobs[0].dep)
+                        for jobs in jobs_by_repo.itervalues()))
+
+  thread_args = (deps_to_process, options, conv_cache, errors)
+  num_threads = options.num_threads or len(deps_to_process)
   for _ in xrange(num_threads):
     th = threading.Thread(target=ConvertDepMain, args=thread_args)
     th.working_on = None
@@ -272,14 +607,215 @@ def ConvertDepsToGit(deps, options, deps_vars, svn_to_git_objs):
   message_th = threading.Thread(target=MessageMain, args=(message_q, threads))
   message_th.start()
 
-  for th in threads:
-    th.join()
+  try:
+    for th in threads:
+      # Join with a timeout, or Ctrl-C isn't handled until the workers stop.
+      while th.is_alive():
+        th.join(1)
+  except (KeyboardInterrupt, SystemExit):
+    # git runs out of reach of Ctrl-C, see git_tools.KillAll(); kill it, and
+    # let the workers and verifier run out of work.
+    deps_to_process.Close()
+    if verifier:
+      verifier.Stop()
+    git_tools.KillAll()
+    message_q.put(Queue.Empty)
+    raise
+  if verifier:
+    bad_git_urls = verifier.Wait()
+    for jobs in jobs_by_repo.itervalues():
+      for job in jobs:
+        if job.git_url in bad_git_urls:
+          job.results.bad_git_urls.add(job.git_url)
   message_q.put(Queue.Empty)
   message_th.join()
 
+  if errors:
+    # Re-raise the first fatal error, with its original traceback.
+    raise errors[0][0], errors[0][1], errors[0][2]
+
+
+def ConvertDepsToGit(deps, options, deps_vars, svn_to_git_objs,
+                     conv_cache=None, previous=None, deps_os=None,
+                     mapper=None, contexts=None):
+  """Convert the 'deps' and 'deps_os' sections in a DEPS file from SVN to Git.
+
+  All the sections are converted in one pass, so a revision pinned by several
+  of them is only looked up once.  The converted deps_os sections are returned
+  in results.new_deps_os.
+
+  conv_cache is an optional conversion_cache.ConversionCache consulted before
+  looking up SVN revisions in the Git repositories.  previous is an optional
+  ((deps, deps_os), (git_deps, git_deps_os)) pair holding the sections of a
+  previously converted DEPS and .DEPS.git; the Git commit ids of unchanged
+  deps are reused from it.  mapper is an optional url_mapper.UrlMapper of
+  svn_to_git_objs, to share its memo with other conversions.  contexts maps
+  the svn_to_git_objs to what their CleanDeps() returned for this DEPS."""
+  deps_os = deps_os or {}
+  mapper = mapper or url_mapper.UrlMapper(svn_to_git_objs)
+  results = NewResults(deps_vars, deps_os)
+  jobs_by_repo = {}
+  QueueDepsJobs(jobs_by_repo, results, deps, deps_os, options, mapper,
+                contexts, previous)
+  RunJobs(jobs_by_repo, options, conv_cache)
   return results
 
 
+def ConvertDepsBatch(batch, options, conv_cache=None):
+  """Convert many DEPS files at once; return their ConversionResults.
+
+  batch is a list of (deps, deps_os, deps_vars, mapper, contexts) tuples, one
+  per DEPS file, as taken by ConvertDepsToGit().  Their jobs share a single
+  pool of workers, and all the revisions a batch needs from a repository are
+  looked up in a single pass over it."""
+  all_results = []
+  jobs_by_repo = {}
+  for deps, deps_os, deps_vars, mapper, contexts in batch:
+    results = NewResults(deps_vars, deps_os)
+    QueueDepsJobs(jobs_by_repo, results, deps, deps_os, options, mapper,
+                  contexts)
+    all_results.append(results)
+  RunJobs(jobs_by_repo, options, conv_cache)
+  return all_results
+
+
+def PreprocessDeps(svn_to_git_objs, deps, deps_os, include_rules,
+                   skip_child_includes, hooks):
+  """Clean up a DEPS with the CleanDeps() of the rules modules that have one.
+
+  Return a dict mapping the modules to the context their CleanDeps()
+  returned, to map the URLs of that DEPS with."""
+  contexts = {}
+  for svn_git_converter in svn_to_git_objs:
+    if hasattr(svn_git_converter, 'CleanDeps'):
+      context = svn_git_converter.CleanDeps(deps, deps_os, include_rules,
+                                            skip_child_includes, hooks)
+      if context is not None:
+        contexts[svn_git_converter] = context
+  return contexts
+
+
+def ReadManifest(manifest):
+  """Return the (deps, out, [rules]) paths of each line of a --batch manifest.
+
+  Each line is 'DEPS OUTPUT [RULES...]', split like a shell command line, and
+  '#' starts a comment.  Relative paths are relative to the manifest."""
+  entries = []
+  manifest_dir = os.path.dirname(os.path.abspath(manifest))
+  with open(manifest) as f:
+    for line_num, line in enumerate(f, 1):
+      fields = shlex.split(line, comments=True)
+      if not fields:
+        continue
+      if len(fields) < 2:
+        raise RuntimeError('%s:%d: expected "DEPS OUTPUT [RULES...]"' % (
+            manifest, line_num))
+      paths = [os.path.join(manifest_dir, field) for field in fields]
+      entries.append((paths[0], paths[1], paths[2:]))
+  return entries
+
+
+def ReportErrors(results, deps_file=None):
+  """Print what couldn't be converted in results; return True if anything."""
+  if not (results.bad_git_urls or results.bad_dep_urls or
+          results.bad_git_hash):
+    return False
+  if deps_file:
+    print >> sys.stderr, '\n%s:' % deps_file
+  if results.bad_git_urls:
+    print >> sys.stderr, ('\nUnable to resolve the following repositories. '
+        'Please make sure\nthat any svn URLs have a git mirror associated with '
+        'them.\nTo see the exact error, run `git ls-remote [repository]` where'
+        '\n[repository] is the URL ending in .git (strip off the @revision\n'
+        'number.) For more information, visit http://code.google.com\n'
+        '/p/chromium/wiki/UsingGit#Adding_new_repositories_to_DEPS.\n')
+    for dep in results.bad_git_urls:
+      print >> sys.stderr, ' ' + dep
+  if results.bad_dep_urls:
+    print >> sys.stderr, '\nNo mappings found for the following urls:\n'
+    for bad in results.bad_dep_urls:
+      print >> sys.stderr, ' ' + bad
+  if results.bad_git_hash:
+    print >> sys.stderr, '\nsvn rev to git hash failures:\n'
+    for bad in results.bad_git_hash:
+      print >> sys.stderr, ' ' + str(bad)
+  return True
+
+
+def ConvertBatch(manifest, options, svn_to_git_objs, deps_vars,
+                 conv_cache=None, compiled_rules_dir=None):
+  """Convert all the DEPS files listed in a --batch manifest.
+
+  The rules listed for a DEPS file take precedence over svn_to_git_objs.
+  DEPS files using the same rules share a url_mapper.UrlMapper.  Return the
+  exit code of deps2git."""
+  start = time.time()
+  entries = ReadManifest(manifest)
+  rules_modules = {}
+  mappers = {}
+  batch = []
+  sections = []
+  for deps_file, _, rules_files in entries:
+    chain = []
+    for rules_file in rules_files:
+      if not os.path.exists(rules_file):
+        raise RuntimeError('Can\'t locate rules file "%s".' % rules_file)
+      if rules_file not in rules_modules:
+        rules_modules[rules_file] = url_mapper.LoadRulesModule(
+            rules_file, compiled_rules_dir)
+      chain.append(rules_modules[rules_file])
+    chain.extend(obj for obj in svn_to_git_objs if obj not in chain)
+    mapper = mappers.get(tuple(chain))
+    if not mapper:
+      mapper = url_mapper.UrlMapper(chain, conv_cache=conv_cache)
+      mappers[tuple(chain)] = mapper
+
+    deps, deps_os, include_rules, skip_child_includes, hooks = (
+        deps_utils.GetDepsContent(deps_file))
+    contexts = PreprocessDeps(chain, deps, deps_os, include_rules,
+                              skip_child_includes, hooks)
+    # Conversions add variables, such as webkit_rev.
+    batch.append((deps, deps_os, dict(deps_vars), mapper, contexts))
+    sections.append((include_rules, skip_child_includes, hooks))
+
+  all_results = ConvertDepsBatch(batch, options, conv_cache)
+  if conv_cache:
+    for mapper in mappers.itervalues():
+      mapper.Flush()
+
+  failed = 0
+  bad_git_urls = set()
+  for (deps_file, out, _), results, (include_rules, skip_child_includes,
+                                     hooks) in zip(entries, all_results,
+                                                   sections):
+    bad_git_urls.update(results.bad_git_urls)
+    if ReportErrors(results, deps_file):
+      failed += 1
+    elif not options.verify:
+      deps_utils.WriteDeps(out, results.deps_vars, results.new_deps,
+                           results.new_deps_os, include_rules,
+                           skip_child_includes, hooks)
+  if options.json:
+    with open(options.json, 'w') as f:
+      json.dump(list(bad_git_urls), f, sort_keys=True, indent=2)
+
+  elapsed = time.time() - start
+  print >> sys.stderr, (
+      '\nConverted %d DEPS files in %.1f seconds (%.1f DEPS/minute), '
+      '%d failed.' % (len(entries), elapsed,
+                      len(entries) * 60 / max(elapsed, 0.001), failed))
+  if options.verbose:
+    print >> sys.stderr, 'Started %d subprocesses.' % git_tools.SpawnCount()
+    print >> sys.stderr, 'Mapped %d SVN URLs, %d of them memoized.' % (
+        sum(mapper.hits + mapper.misses for mapper in mappers.itervalues()),
+        sum(mapper.hits for mapper in mappers.itervalues()))
+  return 2 if failed else 0
+
+
+def _Terminate(signum, _frame):
+  raise SystemExit(128 + signum)
+
+
 def main():
   parser = optparse.OptionParser()
   parser.add_option('-d', '--deps', default='DEPS',
@@ -288,10 +824,15 @@ def main():
                     help='path to the converted DEPS file (default: stdout)')
   parser.add_option('-j', '--num-threads', type='int', default=4,
                     help='Maximum number of threads')
+  parser.add_option('--jobs-per-host', type='int', metavar='N',
+                    help='Maximum number of repositories of a single git host '
+                    'to work on at once (default: no limit)')
   parser.add_option('-t', '--type',
                     help='[DEPRECATED] type of DEPS file (public, etc)')
-  parser.add_option('-x', '--extra-rules',
-                    help='Path to file with additional conversion rules.')
+  parser.add_option('-x', '--extra-rules', action='append',
+                    help='Path to file with additional conversion rules. '
+                    'May be given several times; the rules of earlier files '
+                    'take precedence.')
   parser.add_option('-r', '--repos',
                     help='path to the directory holding all the Git repos')
   parser.add_option('-w', '--workspace', metavar='PATH',
@@ -300,35 +841,137 @@ def main():
                     help='top level of a gclient git cache diretory.')
   parser.add_option('-s', '--shallow', action='store_true',
                     help='Use shallow checkouts when populating cache dirs.')
+  parser.add_option('--clone-filter', choices=git_tools.PARTIAL_CLONE_FILTERS,
+                    help='Make the repos in --repos or --cache_dir partial '
+                    'clones without blobs ("blob:none") or trees and blobs '
+                    '("tree:0"). Only commits are needed to find revisions.')
   parser.add_option('--no_fail_fast', action='store_true',
                     help='Try to process the whole DEPS, rather than failing '
                     'on the first bad entry.')
+  parser.add_option('--write-commit-graph', action='store_true',
+                    help='Refresh the commit-graph of mirrors in the '
+                    'background after cloning or fetching them, to speed up '
+                    'later lookups.')
+  parser.add_option('--write-bitmaps', action='store_true',
+                    help='With --write-commit-graph, also repack mirrors with '
+                    'reachability bitmaps.')
+  parser.add_option('--full-fetch', action='store_true',
+                    help='Fetch every ref of a repo, instead of just the '
+                    'branch needed for the lookup.')
+  parser.add_option('--max-fetch-age', type='float', metavar='SECONDS',
+                    help='Don\'t fetch a repo that a deps2git run fetched less '
+                    'than SECONDS ago, if that fetch covered the requested '
+                    'revision.')
+  parser.add_option('--search-mode', default=git_tools.SEARCH_INDEX,
+                    choices=git_tools.SEARCH_MODES,
+                    help='How to find the git commit for an SVN revision: '
+                    '"index" keeps an SVN revision index in each repo, '
+                    '"bisect" bisects first-parent history, '
+                    '"regex" scans the git-svn-id of every commit with one '
+                    '"git log" per branch, without keeping an index '
+                    '(default: %default)')
+  parser.add_option('--no-conversion-cache', action='store_true',
+                    help='Don\'t read or update the cache of SVN revision to '
+                    'Git commit conversions kept in the --cache_dir or '
+                    '--repos directory.')
+  parser.add_option('--conversion-cache-size', type='int',
+                    default=conversion_cache.DEFAULT_MAX_ENTRIES,
+                    metavar='ENTRIES',
+                    help='Maximum number of conversions to keep in the cache '
+                    '(default: %default)')
+  parser.add_option('--incremental', nargs=2,
+                    metavar='PREVIOUS_DEPS PREVIOUS_DEPS_GIT',
+                    help='Reuse the Git commit ids of the deps that are the '
+                    'same as in PREVIOUS_DEPS from its conversion, '
+                    'PREVIOUS_DEPS_GIT. Only the changed deps are looked up.')
+  parser.add_option('--timeout', type='float', default=git_tools.TIMEOUT,
+                    metavar='SECONDS',
+                    help='Kill any git command running for longer than this '
+                    '(default: %default)')
+  for operation in ('ping', 'fetch', 'search', 'clone'):
+    parser.add_option('--timeout-%s' % operation, type='float',
+                      metavar='SECONDS',
+                      help='Kill %s commands running for longer than this '
+                      '(default: --timeout)' % operation)
+  parser.add_option('-v', '--verbose', action='store_true',
+                    help='Show the commands being run, and how many were run')
   parser.add_option('--verify', action='store_true',
                     help='ping each Git repo to make sure it exists')
+  parser.add_option('--no-http-ping', action='store_true',
+                    help='With --verify, always ping repositories with '
+                    '"git ls-remote", rather than fetching their refs over '
+                    'shared keep-alive HTTP connections first.')
+  parser.add_option('--verify-jobs-per-host', type='int', default=4,
+                    metavar='N',
+                    help='Maximum number of repositories of a single git host '
+                    'to ping at once with --verify (default: %default)')
+  parser.add_option('--verify-ttl', type='float', default=3600,
+                    metavar='SECONDS',
+                    help='With --verify, don\'t ping repositories that were '
+                    'found to exist less than SECONDS ago, according to the '
+                    'conversion cache. 0 pings them all. (default: %default)')
   parser.add_option('--json',
                     help='path to a JSON file for machine-readable output')
+  parser.add_option('--batch', metavar='MANIFEST',
+                    help='Convert all the DEPS files listed in MANIFEST at '
+                    'once, sharing the workers, repos and conversion cache. '
+                    'Each line of MANIFEST is "DEPS OUTPUT [RULES...]", where '
+                    'the RULES files take precedence over --extra-rules for '
+                    'that DEPS. Relative paths are relative to MANIFEST.')
   options = parser.parse_args()[0]
 
+  # Turn SIGTERM into SystemExit, so that running git commands get killed.
+  signal.signal(signal.SIGTERM, _Terminate)
+
+  if options.batch and (options.workspace or options.incremental):
+    parser.error('Can\'t specify batch with workspace or incremental.')
+
   # Get the content of the DEPS file.
-  deps, deps_os, include_rules, skip_child_includes, hooks = (
-      deps_utils.GetDepsContent(options.deps))
+  if not options.batch:
+    deps, deps_os, include_rules, skip_child_includes, hooks = (
+        deps_utils.GetDepsContent(options.deps))
 
   if options.extra_rules and options.type:
     parser.error('Can\'t specify type and extra-rules at the same time.')
   elif options.type:
-    options.extra_rules = os.path.join(
+    options.extra_rules = [os.path.join(
         os.path.abspath(os.path.dirname(__file__)),
-        'svn_to_git_%s.py' % options.type)
+        'svn_to_git_%s.py' % options.type)]
   if options.cache_dir and options.repos:
     parser.error('Can\'t specify both cache_dir and repos at the same time.')
   if options.shallow and not options.cache_dir:
     parser.error('--shallow only supported with --cache_dir.')
+  if options.clone_filter and not (options.repos or options.cache_dir):
+    parser.error('--clone-filter needs --repos or --cache_dir.')
+  if options.write_bitmaps and not options.write_commit_graph:
+    parser.error('--write-bitmaps only supported with --write-commit-graph.')
+  if options.incremental and options.verify:
+    parser.error('Can\'t specify both incremental and verify at the same '
+                 'time.')
+  if options.jobs_per_host is not None and options.jobs_per_host < 1:
+    parser.error('--jobs-per-host must be at least 1.')
+  if options.verify_jobs_per_host < 1:
+    parser.error('--verify-jobs-per-host must be at least 1.')
 
   if options.cache_dir:
     options.cache_dir = os.path.abspath(options.cache_dir)
 
-  if options.extra_rules and not os.path.exists(options.extra_rules):
-    raise RuntimeError('Can\'t locate rules file "%s".' % options.extra_rules)
+  git_tools.FULL_FETCH = options.full_fetch
+  git_tools.PARTIAL_CLONE_FILTER = options.clone_filter
+  git_tools.WRITE_COMMIT_GRAPH = options.write_commit_graph
+  git_tools.WRITE_BITMAPS = options.write_bitmaps
+  git_tools.MAX_FETCH_AGE = options.max_fetch_age
+  git_tools.VERBOSE = options.verbose
+  git_tools.HTTP_PING = not options.no_http_ping
+  git_tools.TIMEOUT = options.timeout
+  git_tools.PING_TIMEOUT = options.timeout_ping
+  git_tools.FETCH_TIMEOUT = options.timeout_fetch
+  git_tools.SEARCH_TIMEOUT = options.timeout_search
+  git_tools.CLONE_TIMEOUT = options.timeout_clone
+
+  for extra_rules in options.extra_rules or []:
+    if not os.path.exists(extra_rules):
+      raise RuntimeError('Can\'t locate rules file "%s".' % extra_rules)
 
   # Create a var containing the Git and Webkit URL, this will make it easy for
   # people to use a mirror instead.
@@ -338,15 +981,6 @@ def main():
       'webkit_url': git_url + '/chromium/blink.git',
   }
 
-  # Find and load svn_to_git_* modules that handle the URL mapping.
-  svn_to_git_objs = [svn_to_git_public]
-  if options.extra_rules:
-    rules_dir, rules_file = os.path.split(options.extra_rules)
-    rules_file_base = os.path.splitext(rules_file)[0]
-    sys.path.insert(0, rules_dir)
-    svn_to_git_mod = __import__(rules_file_base)
-    svn_to_git_objs.insert(0, svn_to_git_mod)
-
   # If a workspace parameter is given, and a .gclient file is present, limit
   # DEPS conversion to only the repositories that are actually used in this
   # checkout.  Also, if a cache dir is specified in .gclient, honor it.
@@ -372,52 +1006,80 @@ def main():
 
   if options.cache_dir:
     git_cache.Mirror.SetCachePath(options.cache_dir)
-  else:
+  elif not options.repos:
+    # --repos takes precedence over the cache dir, so don't spend a git process
+    # looking it up.
     try:
       options.cache_dir = git_cache.Mirror.GetCachePath()
     except RuntimeError:
       pass
 
-  # Do general pre-processing of the DEPS data.
-  for svn_git_converter in svn_to_git_objs:
-    if hasattr(svn_git_converter, 'CleanDeps'):
-      svn_git_converter.CleanDeps(deps, deps_os, include_rules,
-                                  skip_child_includes, hooks)
+  # Find and load svn_to_git_* modules that handle the URL mapping, in order
+  # of precedence.  Their compiled code is kept with the repos.
+  compiled_rules_dir = None
+  if options.repos or options.cache_dir:
+    compiled_rules_dir = os.path.join(options.repos or options.cache_dir,
+                                      url_mapper.COMPILED_RULES_DIR)
+  svn_to_git_objs = [
+      url_mapper.LoadRulesModule(extra_rules, compiled_rules_dir)
+      for extra_rules in options.extra_rules or []]
+  if svn_to_git_public not in svn_to_git_objs:
+    svn_to_git_objs.append(svn_to_git_public)
+
+  # SVN revisions never move, so conversions found by earlier runs can be
+  # reused without touching the repositories.
+  conv_cache = None
+  if not options.no_conversion_cache and (options.repos or options.cache_dir):
+    conv_cache = conversion_cache.Open(options.repos or options.cache_dir,
+                                       options.conversion_cache_size)
+
+  if options.batch:
+    try:
+      return ConvertBatch(options.batch, options, svn_to_git_objs, deps_vars,
+                          conv_cache, compiled_rules_dir)
+    finally:
+      if conv_cache:
+        conv_cache.Close()
+
+  # The previous DEPS is cleaned up like the new one below, so that their
+  # entries can be compared.
+  previous_deps, previous_deps_os = {}, {}
+  previous_git_deps, previous_git_deps_os = {}, {}
+  if options.incremental:
+    previous_deps, previous_deps_os, _, _, _ = deps_utils.GetDepsContent(
+        options.incremental[0])
+    previous_git_deps, previous_git_deps_os, _, _, _ = (
+        deps_utils.GetDepsContent(options.incremental[1]))
+    for svn_git_converter in svn_to_git_objs:
+      if hasattr(svn_git_converter, 'CleanDeps'):
+        svn_git_converter.CleanDeps(previous_deps, previous_deps_os, [], [], [])
 
-  # Convert the DEPS file to Git.
+  # Do general pre-processing of the DEPS data, and keep what the rules
+  # modules need to know about it to map its URLs.
+  contexts = PreprocessDeps(svn_to_git_objs, deps, deps_os, include_rules,
+                            skip_child_includes, hooks)
+
+  # Convert the DEPS file to Git.  The SVN to Git URL mappings are memoized,
+  # and kept in the conversion cache for as long as the rules don't change.
+  mapper = url_mapper.UrlMapper(svn_to_git_objs, conv_cache=conv_cache)
   results = ConvertDepsToGit(
-      deps, options, deps_vars, svn_to_git_objs)
-  for os_dep in deps_os:
-    os_results = ConvertDepsToGit(deps_os[os_dep], options, deps_vars,
-                                  svn_to_git_objs)
-    deps_os[os_dep] = os_results.new_deps
-    results.bad_git_urls.update(os_results.bad_git_urls)
-    results.bad_dep_urls.extend(os_results.bad_dep_urls)
-    results.bad_git_hash.extend(os_results.bad_git_hash)
+      deps, options, deps_vars, svn_to_git_objs, conv_cache,
+      ((previous_deps, previous_deps_os),
+       (previous_git_deps, previous_git_deps_os)), deps_os, mapper, contexts)
+  deps_os = results.new_deps_os
+  if conv_cache:
+    mapper.Flush()
+    conv_cache.Close()
+  if options.verbose:
+    print >> sys.stderr, 'Started %d subprocesses.' % git_tools.SpawnCount()
+    print >> sys.stderr, 'Mapped %d SVN URLs, %d of them memoized.' % (
+        mapper.hits + mapper.misses, mapper.hits)
 
   if options.json:
     with open(options.json, 'w') as f:
       json.dump(list(results.bad_git_urls), f, sort_keys=True, indent=2)
 
-  if results.bad_git_urls:
-    print >> sys.stderr, ('\nUnable to resolve the following repositories. '
-        'Please make sure\nthat any svn URLs have a git mirror associated with '
-        'them.\nTo see the exact error, run `git ls-remote [repository]` where'
-        '\n[repository] is the URL ending in .git (strip off the @revision\n'
-        'number.) For more information, visit http://code.google.com\n'
-        '/p/chromium/wiki/UsingGit#Adding_new_repositories_to_DEPS.\n')
-    for dep in results.bad_git_urls:
-      print >> sys.stderr, ' ' + dep
-  if results.bad_dep_urls:
-    print >> sys.stderr, '\nNo mappings found for the following urls:\n'
-    for bad in results.bad_dep_urls:
-      print >> sys.stderr, ' ' + bad
-  if results.bad_git_hash:
-    print >> sys.stderr, '\nsvn rev to git hash failures:\n'
-    for bad in results.bad_git_hash:
-      print >> sys.stderr, ' ' + str(bad)
-
-  if (results.bad_git_urls or results.bad_dep_urls or results.bad_git_hash):
+  if ReportErrors(results):
     return 2
 
   if options.verify:
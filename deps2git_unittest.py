@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import optparse
+import os
+import Queue
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import conversion_cache
+import deps2git
+import git_tools
+import svn_to_git_public
+import url_mapper
+
+
+GIT_URL = 'https://chromium.googlesource.com/chromium/cdm.git'
+
+
+def _Found(svn_revs):
+  """Return what SvnRevsToGitHashes() finds in an up to date mirror."""
+  return dict((rev, git_tools.SearchResult('xxx-r%s' % rev[0], int(rev[0]),
+                                           int(rev[0])))
+              for rev in svn_revs)
+
+
+def _Jobs(git_url, count=1):
+  return [deps2git.Job('src/%d' % i, git_url, None, None, None, str(i),
+                       None, None, None) for i in xrange(count)]
+
+
+def _Options(**kwargs):
+  options = dict(repos=None, workspace=None, cache_dir=None, verify=False,
+                 no_fail_fast=False, num_threads=4, search_mode='index',
+                 jobs_per_host=None, verify_jobs_per_host=4, verify_ttl=0)
+  options.update(kwargs)
+  return optparse.Values(options)
+
+
+class ConvertDepsToGitTest(unittest.TestCase):
+  def setUp(self):
+    self._mocks = []
+
+  def tearDown(self):
+    for obj, name, value in reversed(self._mocks):
+      setattr(obj, name, value)
+
+  def mock(self, obj, name, value):
+    self._mocks.append((obj, name, getattr(obj, name)))
+    setattr(obj, name, value)
+
+  def testIncremental(self):
+    previous_deps = {
+        'src/third_party/cdm': '/trunk/deps/cdm@1000',
+        'src/third_party/cdm2': '/trunk/deps/cdm@1001',
+        'src/third_party/cdm3': '/trunk/deps/cdm@1002',
+    }
+    previous_git_deps = {
+        'src/third_party/cdm': GIT_URL + '@' + 'a' * 40,
+        'src/third_party/cdm2': GIT_URL + '@' + 'b' * 40,
+        'src/third_party/cdm3': 'https://example.com/cdm.git@' + 'c' * 40,
+    }
+    deps = dict(previous_deps)
+    deps['src/third_party/cdm2'] = '/trunk/deps/cdm@1005'
+    results = deps2git.ConvertDepsToGit(
+        deps, _Options(), {}, [svn_to_git_public],
+        previous=((previous_deps, {}), (previous_git_deps, {})))
+    self.assertEqual({
+        'src/third_party/cdm': GIT_URL + '@' + 'a' * 40,
+        'src/third_party/cdm2': GIT_URL + '@xxx-r1005',
+        'src/third_party/cdm3': GIT_URL + '@xxx-r1002',
+    }, results.new_deps)
+
+  def testDepsOs(self):
+    looked_up = []
+    def _SvnRevsToGitHashes(svn_revs, *_args, **_kwargs):
+      looked_up.append(svn_revs)
+      return _Found(svn_revs)
+    self.mock(deps2git, 'SvnRevsToGitHashes', _SvnRevsToGitHashes)
+    deps = {'src/third_party/cdm': '/trunk/deps/cdm@1000'}
+    deps_os = {
+        'win': {'src/third_party/cdm_win': '/trunk/deps/cdm@1001',
+                'src/third_party/none': None},
+        'mac': {'src/third_party/cdm_mac': '/trunk/deps/cdm@1001'},
+        'unix': {},
+    }
+    results = deps2git.ConvertDepsToGit(
+        deps, _Options(), {}, [svn_to_git_public], deps_os=deps_os)
+    self.assertEqual([[('1000', None), ('1001', None)]], looked_up)
+    self.assertEqual({'src/third_party/cdm': GIT_URL + '@xxx-r1000'},
+                     results.new_deps)
+    self.assertEqual({
+        'win': {'src/third_party/cdm_win': GIT_URL + '@xxx-r1001',
+                'src/third_party/none': None},
+        'mac': {'src/third_party/cdm_mac': GIT_URL + '@xxx-r1001'},
+        'unix': {},
+    }, results.new_deps_os)
+
+  def testJobsPerHost(self):
+    running = []
+    most_running = []
+    lock = threading.Lock()
+    def _SvnRevsToGitHashes(svn_revs, *_args, **_kwargs):
+      with lock:
+        running.append(1)
+        most_running.append(len(running))
+      time.sleep(0.1)
+      with lock:
+        running.pop()
+      return _Found(svn_revs)
+    self.mock(deps2git, 'SvnRevsToGitHashes', _SvnRevsToGitHashes)
+    deps = {
+        'src/third_party/cdm': '/trunk/deps/cdm@1000',
+        'src/third_party/support': '/trunk/deps/support@1000',
+        'src/third_party/acid3': '/trunk/deps/page_cycler/acid3@1000',
+    }
+    deps2git.ConvertDepsToGit(deps, _Options(jobs_per_host=1), {},
+                              [svn_to_git_public])
+    self.assertEqual(1, max(most_running))
+
+  def testFatalError(self):
+    looked_up = []
+    def _SvnRevsToGitHashes(svn_revs, git_url, *_args, **_kwargs):
+      looked_up.append(git_url)
+      raise RuntimeError('failed %s' % git_url)
+    self.mock(deps2git, 'SvnRevsToGitHashes', _SvnRevsToGitHashes)
+    deps = {
+        'src/third_party/cdm': '/trunk/deps/cdm@1000',
+        'src/third_party/support': '/trunk/deps/support@1000',
+    }
+    self.assertRaises(RuntimeError, deps2git.ConvertDepsToGit, deps,
+                      _Options(num_threads=1), {}, [svn_to_git_public])
+    # The other repository isn't converted after the error.
+    self.assertEqual(1, len(looked_up))
+
+  def testLaggingMirror(self):
+    mirror_revs = [100, 105]
+    looked_up = []
+    def _SvnRevsToGitHashes(svn_revs, *_args, **_kwargs):
+      looked_up.append(sorted(svn_revs))
+      found = {}
+      for rev in svn_revs:
+        found_rev = max(r for r in mirror_revs if r <= int(rev[0]))
+        found[rev] = git_tools.SearchResult('xxx-r%d' % found_rev, found_rev,
+                                            mirror_revs[-1])
+      return found
+    self.mock(deps2git, 'SvnRevsToGitHashes', _SvnRevsToGitHashes)
+    deps = {
+        'src/third_party/cdm': '/trunk/deps/cdm@107',
+        'src/third_party/cdm2': '/trunk/deps/cdm@106',
+    }
+    tmp_dir = tempfile.mkdtemp()
+    conv_cache = conversion_cache.Open(tmp_dir)
+    def _Convert():
+      return deps2git.ConvertDepsToGit(deps, _Options(), {},
+                                       [svn_to_git_public],
+                                       conv_cache=conv_cache).new_deps
+    try:
+      self.assertEqual({
+          'src/third_party/cdm': GIT_URL + '@xxx-r105',
+          'src/third_party/cdm2': GIT_URL + '@xxx-r105',
+      }, _Convert())
+      # r107 reaches the mirror: the fuzzy matches weren't cached, so both are
+      # looked up again.  r106 is final now that the mirror is past it.
+      mirror_revs.append(107)
+      self.assertEqual({
+          'src/third_party/cdm': GIT_URL + '@xxx-r107',
+          'src/third_party/cdm2': GIT_URL + '@xxx-r105',
+      }, _Convert())
+      self.assertEqual(2, len(looked_up))
+      self.assertEqual(looked_up[0], looked_up[1])
+      _Convert()
+      self.assertEqual(2, len(looked_up))
+    finally:
+      conv_cache.Close()
+      shutil.rmtree(tmp_dir)
+
+  def testBatch(self):
+    looked_up = []
+    def _SvnRevsToGitHashes(svn_revs, git_url, *_args, **_kwargs):
+      looked_up.append((git_url, sorted(svn_revs)))
+      return _Found(svn_revs)
+    self.mock(deps2git, 'SvnRevsToGitHashes', _SvnRevsToGitHashes)
+    mapper = url_mapper.UrlMapper([svn_to_git_public])
+    batch = [
+        ({'src/third_party/cdm': '/trunk/deps/cdm@1000'}, {}, {}, mapper, {}),
+        ({'src/third_party/cdm': '/trunk/deps/cdm@1001'},
+         {'win': {'src/third_party/cdm_win': '/trunk/deps/cdm@1000'}}, {},
+         mapper, {}),
+    ]
+    first, second = deps2git.ConvertDepsBatch(batch, _Options())
+    # Both DEPS files are converted with a single pass over the repository.
+    self.assertEqual([(GIT_URL, [('1000', None), ('1001', None)])], looked_up)
+    self.assertEqual({'src/third_party/cdm': GIT_URL + '@xxx-r1000'},
+                     first.new_deps)
+    self.assertEqual({}, first.new_deps_os)
+    self.assertEqual({'src/third_party/cdm': GIT_URL + '@xxx-r1001'},
+                     second.new_deps)
+    self.assertEqual(
+        {'win': {'src/third_party/cdm_win': GIT_URL + '@xxx-r1000'}},
+        second.new_deps_os)
+    self.assertEqual((1, 2), (mapper.hits, mapper.misses))
+
+  def testReadManifest(self):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      manifest = os.path.join(tmp_dir, 'manifest')
+      with open(manifest, 'w') as f:
+        f.write('# Release branches.\n'
+                '\n'
+                '1750/DEPS 1750/.DEPS.git\n'
+                '"internal DEPS" /out/DEPS.git rules/a.py rules/b.py # a\n')
+      self.assertEqual([
+          (os.path.join(tmp_dir, '1750/DEPS'),
+           os.path.join(tmp_dir, '1750/.DEPS.git'), []),
+          (os.path.join(tmp_dir, 'internal DEPS'), '/out/DEPS.git',
+           [os.path.join(tmp_dir, 'rules/a.py'),
+            os.path.join(tmp_dir, 'rules/b.py')]),
+      ], deps2git.ReadManifest(manifest))
+
+      with open(manifest, 'a') as f:
+        f.write('DEPS\n')
+      self.assertRaises(RuntimeError, deps2git.ReadManifest, manifest)
+    finally:
+      shutil.rmtree(tmp_dir)
+
+  def testScheduleRepos(self):
+    jobs_by_repo = {
+        'fast': _Jobs('fast', 3),
+        'slow': _Jobs('slow', 1),
+        'new': _Jobs('new', 1),
+        'newer': _Jobs('newer', 2),
+    }
+    self.assertEqual(
+        ['newer', 'new', 'slow', 'fast'],
+        [jobs[0].git_url for jobs in deps2git.ScheduleRepos(
+            jobs_by_repo, {'fast': 0.5, 'slow': 30})])
+
+  def testRepoQueue(self):
+    a1, a2 = _Jobs('https://a/1'), _Jobs('https://a/2')
+    b1 = _Jobs('https://b/1')
+    dep_q = deps2git.RepoQueue([a1, a2, b1], jobs_per_host=1)
+    self.assertEqual(a1, dep_q.Get())
+    # Host a is busy, so the repository of host b goes first.
+    self.assertEqual(b1, dep_q.Get())
+    got = []
+    th = threading.Thread(target=lambda: got.append(dep_q.Get()))
+    th.start()
+    time.sleep(0.1)
+    self.assertEqual([], got)
+    dep_q.Done(a1)
+    th.join()
+    self.assertEqual([a2], got)
+    dep_q.Done(b1)
+    dep_q.Done(a2)
+    self.assertEqual(None, dep_q.Get())
+
+  def testPreviousGitHash(self):
+    self.assertEqual('@abc', deps2git.PreviousGitHash(
+        GIT_URL + '@abc', GIT_URL, '1000'))
+    self.assertEqual(None, deps2git.PreviousGitHash(
+        GIT_URL, GIT_URL, '1000'))
+    self.assertEqual('', deps2git.PreviousGitHash(GIT_URL, GIT_URL, 'HEAD'))
+    self.assertEqual(None, deps2git.PreviousGitHash(None, GIT_URL, '1000'))
+
+
+class VerifierTest(unittest.TestCase):
+  def setUp(self):
+    self._ping = git_tools.Ping
+    git_tools.Ping = self._Ping
+    self.lock = threading.Lock()
+    self.pings = []
+    self.running = 0
+    self.most_running = 0
+
+  def tearDown(self):
+    git_tools.Ping = self._ping
+
+  def _Ping(self, git_url, verbose=False):
+    with self.lock:
+      self.pings.append(git_url)
+      self.running += 1
+      self.most_running = max(self.most_running, self.running)
+    time.sleep(0.05)
+    with self.lock:
+      self.running -= 1
+    if git_url.endswith('/broken'):
+      raise ValueError('broken URL')
+    # 'flaky' works on its second try.
+    return (git_url.endswith('/good') or
+            (git_url.endswith('/flaky') and self.pings.count(git_url) > 1))
+
+  def testRetries(self):
+    message_q = Queue.Queue()
+    verifier = deps2git.Verifier(message_q, 2, tries=3, delay=0.01)
+    deps_by_url = dict(('https://host/%s' % name, 'src/%s' % name)
+                       for name in ('good', 'flaky', 'bad', 'gone'))
+    verifier.Start(deps_by_url)
+    self.assertEqual(set(['https://host/bad', 'https://host/gone']),
+                     verifier.Wait())
+    self.assertEqual(2, self.pings.count('https://host/flaky'))
+    self.assertEqual(3, self.pings.count('https://host/bad'))
+    self.assertEqual(2, self.most_running)
+
+  def testErrors(self):
+    class _BrokenCache(object):
+      def AddVerified(self, git_url):
+        raise IOError('disk full')
+
+    message_q = Queue.Queue()
+    verifier = deps2git.Verifier(message_q, 1, _BrokenCache(), tries=2,
+                                 delay=0.01)
+    verifier.Start(dict(('https://host/%s' % name, 'src/%s' % name)
+                        for name in ('good', 'broken', 'flaky')))
+    # A ping raising is a failed try, and doesn't keep the host busy.
+    waiter = threading.Thread(target=verifier.Wait)
+    waiter.start()
+    waiter.join(10)
+    self.assertFalse(waiter.is_alive())
+    self.assertEqual(set(['https://host/broken']), verifier.bad_git_urls)
+    self.assertEqual(2, self.pings.count('https://host/broken'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""A minimal smart-HTTP client for checking that git repositories exist.
+
+It fetches the ref advertisement ('info/refs?service=git-upload-pack') that
+'git ls-remote' starts with, over keep-alive connections pooled per host, so
+pinging many repositories on the same host costs neither a process nor a TLS
+handshake each."""
+
+import httplib
+import threading
+import urlparse
+
+
+SERVICE = 'git-upload-pack'
+ADVERTISEMENT_TYPE = 'application/x-%s-advertisement' % SERVICE
+
+
+class RefAdvertisementClient(object):
+  """Fetches ref advertisements over pooled keep-alive connections.
+
+  Safe to use from several threads; each request takes a connection to the
+  host from the pool, or opens a new one if they're all busy."""
+
+  def __init__(self, timeout=None):
+    self.timeout = timeout
+    self.lock = threading.Lock()
+    # (scheme, netloc) -> idle connections.
+    self.idle = {}
+    self.connections_opened = 0
+
+  def _GetConnection(self, scheme, netloc):
+    with self.lock:
+      idle = self.idle.get((scheme, netloc))
+      if idle:
+        return idle.pop(), True
+      self.connections_opened += 1
+    if scheme == 'https':
+      conn = httplib.HTTPSConnection(netloc, timeout=self.timeout)
+    else:
+      conn = httplib.HTTPConnection(netloc, timeout=self.timeout)
+    return conn, False
+
+  def _PutConnection(self, scheme, netloc, conn):
+    with self.lock:
+      self.idle.setdefault((scheme, netloc), []).append(conn)
+
+  def _Get(self, scheme, netloc, path):
+    """Return (status, content_type, body) of GET path, or None on error."""
+    # An idle connection may have been closed by the server in the meantime,
+    # so a request on one gets a second chance on a new connection.
+    for _ in xrange(2):
+      conn, reused = None, False
+      try:
+        conn, reused = self._GetConnection(scheme, netloc)
+        conn.request('GET', path, headers={'User-Agent': 'git/deps2git',
+                                           'Pragma': 'no-cache'})
+        response = conn.getresponse()
+        body = response.read()
+      except Exception:
+        # Not only httplib and socket errors: a bad port raises InvalidURL
+        # and a certificate mismatch ssl.CertificateError, a ValueError.
+        # Either way, 'git ls-remote' gets to decide.
+        if conn:
+          conn.close()
+        if reused:
+          continue
+        return None
+      if response.will_close:
+        conn.close()
+      else:
+        self._PutConnection(scheme, netloc, conn)
+      return response.status, response.getheader('content-type'), body
+    return None
+
+  def HasRefs(self, url):
+    """Return True if url is a git repository served over smart HTTP.
+
+    Return None if that couldn't be established, e.g. the repository doesn't
+    exist, needs authentication or isn't served over smart HTTP, in which
+    case 'git ls-remote' should be asked."""
+    try:
+      parsed = urlparse.urlsplit(url)
+    except ValueError:  # E.g. an unterminated IPv6 address.
+      return None
+    if parsed.scheme not in ('http', 'https') or parsed.query:
+      return None
+    path = '%s/info/refs?service=%s' % (parsed.path.rstrip('/'), SERVICE)
+    result = self._Get(parsed.scheme, parsed.netloc, path)
+    if not result:
+      return None
+    status, content_type, body = result
+    # A smart server starts with a '# service=git-upload-pack' pkt-line.
+    if (status == 200 and content_type == ADVERTISEMENT_TYPE and
+        body[4:].startswith('# service=%s\n' % SERVICE)):
+      return True
+    return None
+
+  def Close(self):
+    with self.lock:
+      for conns in self.idle.itervalues():
+        for conn in conns:
+          conn.close()
+      self.idle = {}
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import BaseHTTPServer
+import os
+import shutil
+import SocketServer
+import ssl
+import subprocess
+import tempfile
+import threading
+import unittest
+
+import git_http
+import git_tools
+
+
+def _PktLine(data):
+  return '%04x%s' % (len(data) + 4, data)
+
+
+class _SmartHTTPHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Serves the ref advertisement of the bare repos in server.root."""
+  protocol_version = 'HTTP/1.1'
+
+  def setup(self):
+    BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+    self.server.connections += 1
+
+  def do_GET(self):
+    path, _, query = self.path.partition('?')
+    repo = os.path.join(self.server.root, path.lstrip('/'))
+    if repo.endswith('/info/refs'):
+      repo = repo[:-len('/info/refs')]
+    if (query != 'service=git-upload-pack' or
+        not os.path.isdir(os.path.join(repo, 'objects'))):
+      self.send_response(404)
+      self.send_header('Content-Length', '0')
+      self.end_headers()
+      return
+    refs = subprocess.check_output(
+        ['git', 'upload-pack', '--stateless-rpc', '--advertise-refs', repo])
+    body = _PktLine('# service=git-upload-pack\n') + '0000' + refs
+    self.send_response(200)
+    self.send_header('Content-Type', git_http.ADVERTISEMENT_TYPE)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *_args):
+    pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+
+
+class RefAdvertisementClientTest(unittest.TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    for name in ('one.git', 'two.git'):
+      subprocess.check_call(['git', 'init', '-q', '--bare',
+                             os.path.join(self.root, name)])
+    self.server = _Server(('127.0.0.1', 0), _SmartHTTPHandler)
+    self.server.root = self.root
+    self.server.connections = 0
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.start()
+    self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+    self.client = git_http.RefAdvertisementClient(timeout=10)
+
+  def tearDown(self):
+    self.client.Close()
+    self.server.shutdown()
+    self.thread.join()
+    self.server.server_close()
+    shutil.rmtree(self.root)
+
+  def testHasRefs(self):
+    self.assertTrue(self.client.HasRefs(self.url + 'one.git'))
+    self.assertTrue(self.client.HasRefs(self.url + 'two.git/'))
+    self.assertEqual(None, self.client.HasRefs(self.url + 'missing.git'))
+    self.assertEqual(None, self.client.HasRefs('file://' + self.root))
+    # All the requests went over one keep-alive connection.
+    self.assertEqual(1, self.client.connections_opened)
+    self.assertEqual(1, self.server.connections)
+
+  def testPing(self):
+    git_tools.CloseHttpClient()
+    spawned = git_tools.SpawnCount()
+    self.assertTrue(git_tools.Ping(self.url + 'one.git'))
+    self.assertTrue(git_tools.Ping(self.url + 'two.git'))
+    # At most one process, reading the git config.
+    self.assertTrue(git_tools.SpawnCount() - spawned <= 1)
+    # git ls-remote confirms a missing repository.
+    spawned = git_tools.SpawnCount()
+    self.assertFalse(git_tools.Ping(self.url + 'missing.git'))
+    self.assertEqual(spawned + 1, git_tools.SpawnCount())
+    git_tools.CloseHttpClient()
+
+  def _CertificateMismatch(self, scheme, netloc):
+    raise ssl.CertificateError('hostname %r doesn\'t match' % netloc)
+
+  def testErrors(self):
+    self.assertEqual(None, self.client.HasRefs('http://127.0.0.1:x/one.git'))
+    self.assertEqual(None, self.client.HasRefs('http://[::1/one.git'))
+    self.client._GetConnection = self._CertificateMismatch
+    self.assertEqual(None, self.client.HasRefs(self.url + 'one.git'))
+
+  def testPingFallback(self):
+    # git ls-remote is asked when the HTTP client fails in any way.
+    git_tools.CloseHttpClient()
+    git_tools._GetHttpClient()._GetConnection = self._CertificateMismatch
+    self.assertTrue(git_tools._HttpPingable(self.url))  # Reads the git config.
+    spawned = git_tools.SpawnCount()
+    self.assertTrue(git_tools.Ping(self.url + 'one.git'))
+    self.assertFalse(git_tools.Ping(self.url + 'missing.git'))
+    self.assertEqual(spawned + 2, git_tools.SpawnCount())
+    git_tools.CloseHttpClient()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -3,12 +3,33 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import atexit
+import bisect
+import collections
+import contextlib
 import cStringIO
+import json
 import os
+import Queue
 import re
+import select
+import signal
 import subprocess
 import sys
 import threading
+import time
+import urllib
+
+import git_http
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
+try:
+  import msvcrt
+except ImportError:
+  msvcrt = None
 
 try:
   import git_cache
@@ -23,9 +44,72 @@ except ImportError:
 # Show more information about the commands being executed.
 VERBOSE = False
 
+# git is run without a shell, so the depot_tools wrapper has to be named in
+# full on Windows.
+GIT_EXE = 'git.bat' if sys.platform == 'win32' else 'git'
+
 # The longest any single subprocess will be allowed to run.
 TIMEOUT = 40 * 60
 
+# Let Ping() check http(s) URLs in-process over keep-alive connections, only
+# running 'git ls-remote' when that doesn't confirm the repository exists.
+HTTP_PING = True
+
+# The longest the subprocesses of each kind of operation may run, overriding
+# TIMEOUT when set.  Searches include reading the history for the SVN
+# revision index.
+PING_TIMEOUT = None
+FETCH_TIMEOUT = None
+SEARCH_TIMEOUT = None
+CLONE_TIMEOUT = None
+
+# Skip fetching a mirror when a deps2git run fetched it for the same or a newer
+# SVN revision at most this many seconds ago.  None always fetches.
+MAX_FETCH_AGE = None
+
+# Fetch every ref from origin, rather than just the one a lookup needs.
+FULL_FETCH = False
+
+# A 'git clone --filter' spec, e.g. 'blob:none' or 'tree:0', for partial
+# mirrors.  Revision lookups only read commits, so mirrors don't need the rest.
+PARTIAL_CLONE_FILTER = None
+PARTIAL_CLONE_FILTERS = ('blob:none', 'tree:0')
+
+# Refresh the commit-graph file of mirrors in the background after they are
+# cloned or fetched, and also rewrite their packs with reachability bitmaps if
+# WRITE_BITMAPS is set.
+WRITE_COMMIT_GRAPH = False
+WRITE_BITMAPS = False
+
+# How GetStatusOutput() streams a child's output into an out_buffer:
+#   read: loop on os.read() until EOF.
+#   select: wait for the pipe to become readable with select() before each
+#           os.read() (not available for pipes on Windows).
+READ_MODE = 'read'
+READ_MODES = ('read', 'select')
+
+# The most GetStatusOutput() will read from a child's output at once.
+READ_CHUNK_SIZE = 64 * 1024
+
+# Ways Search(), SearchExact() and SearchBatch() can map an SVN revision to a
+# git commit.
+#   regex: no index.  Search() and SearchExact() run 'git log --grep' over the
+#          whole history on every lookup; SearchBatch() reads the git-svn-id of
+#          every commit from a single streamed 'git log' per refspec instead.
+#   index: bisect a per-repository SVN revision index (see SvnRevIndex).
+#   bisect: bisect the first-parent history, reading the git-svn-id of only
+#           O(log n) commits, plus those added since the previous search.
+#           Falls back to regex for histories that are non-linear or whose
+#           revisions are not in order.
+SEARCH_REGEX = 'regex'
+SEARCH_INDEX = 'index'
+SEARCH_BISECT = 'bisect'
+SEARCH_MODES = (SEARCH_REGEX, SEARCH_INDEX, SEARCH_BISECT)
+
+# Matches the same git-svn-id lines as the 'git log --grep' used by
+# _SearchImpl, capturing the SVN revision.
+GIT_SVN_ID_RE = re.compile(r'^git-svn-id: [^@\n]*@(\d+) [A-Za-z0-9-]*$', re.M)
+
 class AbnormalExit(Exception):
   pass
 
@@ -59,94 +143,527 @@ class StdioBuffer(object):
     self.closed = True
 
 
-def GetStatusOutput(cmd, cwd=None, out_buffer=None):
-  """Return (status, output) of executing cmd in a shell."""
+def _ReadChunks(fd, read_mode):
+  """Yield blocks of data read from the file descriptor fd until EOF."""
+  if read_mode not in READ_MODES:
+    raise ValueError('Unknown read mode %s' % read_mode)
+  use_select = read_mode == 'select' and sys.platform != 'win32'
+  while True:
+    if use_select:
+      select.select([fd], [], [])
+    buf = os.read(fd, READ_CHUNK_SIZE)
+    if not buf:
+      return
+    yield buf
+
+
+_spawn_count_lock = threading.Lock()
+_spawn_count = 0
+
+
+def SpawnCount():
+  """Return the number of subprocesses started so far."""
+  return _spawn_count
+
+
+def _CommandString(cmd):
+  """Return cmd, a shell command or an argv list, as a string for messages."""
+  if isinstance(cmd, basestring):
+    return cmd
+  return ' '.join(cmd)
+
+
+def _Popen(cmd, **kwargs):
+  """subprocess.Popen() cmd in a new process group, see _KillProcessGroup().
+
+  cmd is run through the shell if it's a string, or directly if it's an argv
+  list."""
+  global _spawn_count
+  if sys.platform == 'win32':
+    kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+  else:
+    kwargs['preexec_fn'] = os.setsid
+  with _spawn_count_lock:
+    _spawn_count += 1
+  return subprocess.Popen(cmd, shell=isinstance(cmd, basestring), **kwargs)
+
+
+def _KillProcessGroup(proc):
+  """Kill a process started by _Popen() and all the processes it started.
+
+  Commands run through the shell, so killing just proc would leave git
+  running."""
+  try:
+    if sys.platform == 'win32':
+      with open(os.devnull, 'w') as devnull:
+        subprocess.call(['taskkill', '/F', '/T', '/PID', str(proc.pid)],
+                        stdout=devnull, stderr=devnull)
+    else:
+      os.killpg(proc.pid, signal.SIGKILL)
+  except OSError:
+    pass  # It already exited.
+
+
+class _Watchdog(object):
+  """Kills the subprocesses that run past their deadline.
+
+  A single thread watches every running subprocess, rather than one helper
+  thread per subprocess.  It only runs while there are subprocesses to watch,
+  so it is never left waiting when the interpreter exits."""
+
+  def __init__(self):
+    self.cond = threading.Condition()
+    self.deadlines = {}
+    self.timed_out = set()
+    self.thread = None
+    self.stopping = False
+    self.killing = False
+
+  def Watch(self, proc, cmd, timeout):
+    with self.cond:
+      self.deadlines[proc] = (time.time() + timeout, cmd, timeout)
+      if self.killing:
+        _KillProcessGroup(proc)
+      if not self.thread:
+        self.thread = threading.Thread(target=self._Main)
+        self.thread.daemon = True
+        self.thread.start()
+      self.cond.notify()
+
+  def Unwatch(self, proc):
+    """Stop watching proc; return whether it was killed for timing out."""
+    with self.cond:
+      self.deadlines.pop(proc, None)
+      if not self.deadlines:
+        # Let the thread exit rather than sleep until a stale deadline.
+        self.cond.notify()
+      if proc in self.timed_out:
+        self.timed_out.remove(proc)
+        return True
+      return False
+
+  def KillAll(self):
+    """Kill the subprocesses being watched, and any started from now on."""
+    with self.cond:
+      self.killing = True
+      for proc in self.deadlines:
+        _KillProcessGroup(proc)
+
+  def Stop(self):
+    """Stop the thread, killing the subprocesses still left."""
+    self.KillAll()
+    with self.cond:
+      self.stopping = True
+      self.cond.notify()
+      thread = self.thread
+    if thread:
+      thread.join()
+
+  def _Main(self):
+    with self.cond:
+      while self.deadlines and not self.stopping:
+        now = time.time()
+        for proc, (deadline, cmd, timeout) in self.deadlines.items():
+          if deadline <= now:
+            del self.deadlines[proc]
+            self.timed_out.add(proc)
+            print >> sys.stderr, (
+                'Killing "%s" (pid %d), it ran for more than %s seconds.' %
+                (_CommandString(cmd), proc.pid, timeout))
+            _KillProcessGroup(proc)
+        if self.deadlines:
+          self.cond.wait(min(deadline for deadline, _, _ in
+                             self.deadlines.itervalues()) - now)
+      self.thread = None
+
+
+_watchdog = _Watchdog()
+atexit.register(_watchdog.Stop)
+
+
+def KillAll():
+  """Kill the commands still running, and any started from now on.
+
+  Commands run in process groups of their own (see _Popen()), so signals sent
+  to the terminal's process group, like Ctrl-C, don't reach them.  Call this
+  when interrupted, so they don't outlive deps2git."""
+  _watchdog.KillAll()
+
+
+def GetStatusOutput(cmd, cwd=None, out_buffer=None, read_mode=None,
+                    timeout=None):
+  """Return (status, output) of executing cmd.
+
+  cmd is either an argv list, or a string run through the shell.  If
+  out_buffer is given, the output is streamed into it as it's produced, in
+  blocks read according to read_mode (default: READ_MODE), and the returned
+  output is empty.  cmd and everything it started are killed if it runs for
+  more than timeout (default: TIMEOUT) seconds, and status is -1."""
+  read_mode = read_mode or READ_MODE
+  timeout = timeout or TIMEOUT
   if VERBOSE:
     print >> sys.stderr, ''
-    print >> sys.stderr, '[DEBUG] Running "%s"' % cmd
+    print >> sys.stderr, '[DEBUG] Running "%s"' % _CommandString(cmd)
 
-  def _thread_main():
-    thr = threading.current_thread()
-    thr.status = -1
-    thr.stdout = ''
-    thr.stderr = '<timeout>'
+  status = -1
+  stdout = ''
+  try:
+    proc = _Popen(cmd, cwd=cwd, stdout=subprocess.PIPE,
+                  stderr=subprocess.STDOUT)
+  except Exception:
+    proc = None
+  if proc:
+    _watchdog.Watch(proc, cmd, timeout)
     try:
+      chunks = []
+      for buf in _ReadChunks(proc.stdout.fileno(), read_mode):
+        if out_buffer:
+          # We want carriage returns in Linux to be newlines.
+          out_buffer.write(buf.replace('\r', '\n'))
+        else:
+          chunks.append(buf)
+      proc.wait()
+    finally:
+      proc.stdout.close()
+      timed_out = _watchdog.Unwatch(proc)
       if out_buffer:
-        proc = subprocess.Popen(cmd, shell=True,
-                                cwd=cwd, stdout=subprocess.PIPE,
-                                stderr=subprocess.STDOUT)
-        while True:
-          buf = proc.stdout.read(1)
-          if buf == '\r':  # We want carriage returns in Linux to be newlines.
-            buf = '\n'
-          if not buf:
-            break
-          out_buffer.write(buf)
-        stdout = ''
-        proc.wait()
         out_buffer.close()
-      else:
-        proc = subprocess.Popen(cmd, shell=True, universal_newlines=True,
-                                cwd=cwd, stdout=subprocess.PIPE,
-                                stderr=subprocess.STDOUT)
-        (stdout, _) = proc.communicate()
-    except Exception, e:
-      thr.status = -1
-      thr.stdout = ''
-      thr.stderr = repr(e)
+    if timed_out:
+      stdout = 'Killed after %s seconds.' % timeout
     else:
-      thr.status = proc.returncode
-      thr.stdout = stdout
-      thr.stderr = ''
-
-  thr = threading.Thread(target=_thread_main)
-  thr.daemon = True
-  thr.start()
-  thr.join(TIMEOUT)
+      status = proc.returncode
+      # Same as universal_newlines=True.
+      stdout = ''.join(chunks).replace('\r\n', '\n').replace('\r', '\n')
 
-  # pylint: disable=E1101
   if VERBOSE:
-    short_output = ' '.join(thr.stdout.splitlines())
+    short_output = ' '.join(stdout.splitlines())
     short_output = short_output.strip(' \t\n\r')
     print >> sys.stderr, (
-        '[DEBUG] Output: %d, %-60s' % (thr.status, short_output))
+        '[DEBUG] Output: %d, %-60s' % (status, short_output))
 
-  return (thr.status, thr.stdout)
+  return (status, stdout)
 
 
-def Git(git_repo, command, is_mirror=False, out_buffer=None):
-  """Execute a git command within a local git repo."""
+def _GitCommand(git_repo, args, is_mirror):
+  """Return the (argv, cwd) pair used to run 'git <args>' in git_repo."""
   if is_mirror:
     if git_repo:
-      cmd = 'git --git-dir=%s %s' % (git_repo, command)
+      cmd = [GIT_EXE, '--git-dir=%s' % git_repo] + args
     else:
-      cmd = 'git %s' % command
+      cmd = [GIT_EXE] + args
     cwd = None
   else:
-    cmd = 'git %s' % command
+    cmd = [GIT_EXE] + args
     cwd = git_repo
-  (status, output) = GetStatusOutput(cmd, cwd, out_buffer)
+  return (cmd, cwd)
+
+
+def Git(git_repo, args, is_mirror=False, out_buffer=None, timeout=None):
+  """Execute a git command, given as a list of arguments, within a local repo.
+
+  The arguments are passed to git as they are, without a shell."""
+  cmd, cwd = _GitCommand(git_repo, args, is_mirror)
+  (status, output) = GetStatusOutput(cmd, cwd, out_buffer, timeout=timeout)
   # For Abnormal Exit, Windows returns -1, Posix returns 128.
   if status in [-1, 128]:
     raise AbnormalExit('Failed to run %s. Exited Abnormally. output %s' %
-                       (cmd, output))
+                       (_CommandString(cmd), output))
   elif status != 0:
-    raise Exception('Failed to run %s. error %d. output %s' % (cmd, status,
-                                                               output))
+    raise Exception('Failed to run %s. error %d. output %s' % (
+        _CommandString(cmd), status, output))
   return (status, output)
 
 
+def _GitDir(git_repo, is_mirror):
+  """Return the directory holding the git metadata for git_repo."""
+  if is_mirror:
+    return git_repo
+  return os.path.join(git_repo, '.git')
+
+
+def _WriteFileAtomically(path, contents):
+  """Replace path with contents without readers ever seeing a partial file."""
+  file_dir = os.path.dirname(path)
+  if not os.path.exists(file_dir):
+    os.makedirs(file_dir)
+  tmp_path = '%s.tmp%d' % (path, os.getpid())
+  with open(tmp_path, 'w') as f:
+    f.write(contents)
+  if sys.platform == 'win32' and os.path.exists(path):
+    os.remove(path)
+  os.rename(tmp_path, path)
+
+
+class CatFileBatch(object):
+  """A long-lived 'git cat-file --batch' process for one repository.
+
+  Reading objects over a pipe saves a shell and a git process per lookup.  The
+  process is started on first use and restarted after Close(), which Fetch
+  calls so that refs are never read from a stale process."""
+
+  def __init__(self, git_repo, is_mirror):
+    if is_mirror:
+      self.cmd = [GIT_EXE, '--git-dir=%s' % git_repo, 'cat-file', '--batch']
+      self.cwd = None
+    else:
+      self.cmd = [GIT_EXE, 'cat-file', '--batch']
+      self.cwd = git_repo
+    self.lock = threading.Lock()
+    self.proc = None
+
+  def Read(self, name):
+    """Return (git_hash, object_type, contents) for the object called name.
+
+    Raise AbnormalExit if there is no such object, like 'git cat-file' does."""
+    with self.lock:
+      if not self.proc:
+        if VERBOSE:
+          print >> sys.stderr, ''
+          print >> sys.stderr, '[DEBUG] Starting "%s"' % ' '.join(self.cmd)
+        self.proc = _Popen(self.cmd, cwd=self.cwd, stdin=subprocess.PIPE,
+                           stdout=subprocess.PIPE)
+      self.proc.stdin.write(name + '\n')
+      self.proc.stdin.flush()
+      header = self.proc.stdout.readline()
+      fields = header.split()
+      if len(fields) != 3:
+        if not header:
+          self._Stop()
+        raise AbnormalExit('Failed to read %s with %s. output %s' %
+                           (name, ' '.join(self.cmd), header.strip()))
+      git_hash, object_type, size = fields
+      contents = self.proc.stdout.read(int(size))
+      # Each object is followed by a newline.
+      self.proc.stdout.read(1)
+      return (git_hash, object_type, contents)
+
+  def _Stop(self):
+    if self.proc:
+      self.proc.stdin.close()
+      self.proc.wait()
+      self.proc = None
+
+  def Close(self):
+    with self.lock:
+      self._Stop()
+
+
+_cat_files = {}
+_cat_files_lock = threading.Lock()
+
+
+def GetCatFile(git_repo, is_mirror):
+  """Return the shared CatFileBatch for git_repo."""
+  key = os.path.abspath(_GitDir(git_repo, is_mirror))
+  with _cat_files_lock:
+    if key not in _cat_files:
+      _cat_files[key] = CatFileBatch(git_repo, is_mirror)
+    return _cat_files[key]
+
+
+@atexit.register
+def CloseCatFiles():
+  """Shut down all the 'git cat-file --batch' processes."""
+  with _cat_files_lock:
+    cat_files = _cat_files.values()
+  for cat_file in cat_files:
+    cat_file.Close()
+
+
 def Clone(git_url, git_repo, is_mirror, out_buffer=None):
-  """Clone a repository."""
-  cmd = 'clone'
+  """Clone a repository.
+
+  Mirrors are partial clones if PARTIAL_CLONE_FILTER is set."""
+  args = ['clone']
   if is_mirror:
-    cmd += ' --mirror'
-  cmd += ' %s %s'  % (git_url, git_repo)
+    args.append('--mirror')
+    if PARTIAL_CLONE_FILTER:
+      args.append('--filter=%s' % PARTIAL_CLONE_FILTER)
+  args += [git_url, git_repo]
 
   if not is_mirror and not os.path.exists(git_repo):
     os.makedirs(git_repo)
 
-  return Git(None, cmd, is_mirror=is_mirror, out_buffer=out_buffer)
+  result = Git(None, args, is_mirror=is_mirror, out_buffer=out_buffer,
+               timeout=CLONE_TIMEOUT)
+  if is_mirror:
+    ScheduleCommitGraph(git_repo)
+  return result
+
+
+def _ReadTips(git_repo, is_mirror):
+  """Return a dict mapping every ref in git_repo to its commit id."""
+  _, output = Git(
+      git_repo, ['for-each-ref', '--format=%(objectname) %(refname)'],
+      is_mirror)
+  tips = {}
+  for line in output.splitlines():
+    git_hash, ref = line.split(' ', 1)
+    tips[ref] = git_hash
+  return tips
+
+
+def _HasCommitGraph(git_repo, is_mirror):
+  info_dir = os.path.join(_GitDir(git_repo, is_mirror), 'objects', 'info')
+  return (os.path.exists(os.path.join(info_dir, 'commit-graph')) or
+          os.path.exists(os.path.join(info_dir, 'commit-graphs')))
+
+
+class _CommitGraphWriter(object):
+  """Background thread that writes commit-graphs (and bitmaps) for mirrors.
+
+  Writing doesn't take the RepoLock, so it never holds up lookups, fetches or
+  index updates: git replaces commit-graph files and packs atomically.  Only
+  one process writes for a mirror at a time; the others skip it."""
+
+  def __init__(self):
+    self.queue = Queue.Queue()
+    self.pending = set()
+    self.lock = threading.Lock()
+    self.thread = None
+
+  def Schedule(self, git_repo):
+    key = os.path.abspath(git_repo)
+    with self.lock:
+      if key in self.pending:
+        return
+      self.pending.add(key)
+      if not self.thread:
+        self.thread = threading.Thread(target=self._Main)
+        self.thread.daemon = True
+        self.thread.start()
+    self.queue.put(git_repo)
+
+  def _Main(self):
+    while True:
+      git_repo = self.queue.get()
+      with self.lock:
+        self.pending.discard(os.path.abspath(git_repo))
+      try:
+        self._Write(git_repo)
+      except Exception as e:
+        print >> sys.stderr, 'Failed to write commit-graph for %s: %s' % (
+            git_repo, e)
+      finally:
+        self.queue.task_done()
+
+  def _Write(self, git_repo):
+    start = time.time()
+    lock_path = os.path.abspath(git_repo).rstrip(os.sep)
+    with _TryLock(lock_path + '.deps2git.graph.lock') as locked:
+      if not locked:
+        print >> sys.stderr, (
+            '%s: commit-graph being written by another run' % git_repo)
+        return
+      Git(git_repo, ['commit-graph', 'write', '--reachable', '--split'], True)
+      graph_time = time.time() - start
+      msg = '%s: commit-graph written in %.2fs' % (git_repo, graph_time)
+      if WRITE_BITMAPS:
+        Git(git_repo, ['repack', '-a', '-d', '-b', '-q'], True)
+        msg += ', bitmaps in %.2fs' % (time.time() - start - graph_time)
+    print >> sys.stderr, msg
+
+  def Wait(self):
+    self.queue.join()
+
+
+_commit_graph_writer = _CommitGraphWriter()
+
+
+def ScheduleCommitGraph(git_repo):
+  """Refresh the commit-graph of the mirror git_repo in the background."""
+  if WRITE_COMMIT_GRAPH:
+    _commit_graph_writer.Schedule(git_repo)
+
+
+@atexit.register
+def WaitForCommitGraphs():
+  """Wait until all the scheduled commit-graphs have been written."""
+  _commit_graph_writer.Wait()
+
+
+@contextlib.contextmanager
+def RepoLock(git_repo, is_mirror, exclusive=False):
+  """Hold an advisory lock on the mirror git_repo while in the block.
+
+  Every deps2git process and thread sharing a --repos or --cache_dir directory
+  locks a mirror exclusively to clone, fetch or index it, and shared to search
+  it.  Workspace checkouts aren't shared, so they aren't locked.  The lock is
+  taken on a separate file next to the mirror, so it can be held before the
+  mirror exists."""
+  if not is_mirror:
+    yield
+    return
+  lock_path = os.path.abspath(git_repo).rstrip(os.sep) + '.deps2git.lock'
+  lock_dir = os.path.dirname(lock_path)
+  if not os.path.isdir(lock_dir):
+    try:
+      os.makedirs(lock_dir)
+    except OSError:
+      # Another process may have just created it.
+      if not os.path.isdir(lock_dir):
+        raise
+  with open(lock_path, 'a') as lock_file:
+    if fcntl:
+      fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    elif msvcrt:
+      # Windows has no shared locks, so every lock is exclusive there.
+      while True:
+        try:
+          msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+          break
+        except IOError:
+          # LK_LOCK gives up after 10 seconds; keep waiting.
+          pass
+    try:
+      yield
+    finally:
+      _Unlock(lock_file)
+
+
+@contextlib.contextmanager
+def _TryLock(lock_path):
+  """Lock the file lock_path exclusively while in the block, if it's free.
+
+  Yield whether the lock was taken; unlike RepoLock, never wait for it."""
+  with open(lock_path, 'a') as lock_file:
+    try:
+      if fcntl:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+      elif msvcrt:
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except IOError:
+      yield False
+      return
+    try:
+      yield True
+    finally:
+      _Unlock(lock_file)
+
+
+def _Unlock(lock_file):
+  if fcntl:
+    fcntl.flock(lock_file, fcntl.LOCK_UN)
+  elif msvcrt:
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _ConfigurePartialClone(git_repo):
+  """Make later fetches into the mirror git_repo use PARTIAL_CLONE_FILTER.
+
+  This turns an existing full mirror into a partial one, so that only the
+  objects it already has are kept in full."""
+  if not PARTIAL_CLONE_FILTER:
+    return
+  status, output = GetStatusOutput(_GitCommand(
+      git_repo, ['config', 'remote.origin.partialclonefilter'], True)[0])
+  if status == 0 and output.strip() == PARTIAL_CLONE_FILTER:
+    return
+  Git(git_repo, ['config', 'remote.origin.promisor', 'true'], True)
+  Git(git_repo, ['config', 'remote.origin.partialclonefilter',
+                 PARTIAL_CLONE_FILTER], True)
+  Git(git_repo, ['config', 'extensions.partialclone', 'origin'], True)
 
 
 def PopulateCache(git_url, shallow=False):
@@ -156,20 +673,265 @@ def PopulateCache(git_url, shallow=False):
   if shallow and 'adobe' in git_url:
     depth = 10
   mirror = git_cache.Mirror(git_url, print_func=lambda *args: None)
-  mirror.populate(depth=depth, shallow=shallow, ignore_lock=True)
+  # git_cache's own lock fails rather than waits when the mirror is busy, so
+  # deps2git processes sharing the cache serialize on RepoLock instead.
+  with RepoLock(mirror.mirror_path, True, exclusive=True):
+    exists = os.path.exists(os.path.join(mirror.mirror_path, 'config'))
+    if PARTIAL_CLONE_FILTER:
+      # git_cache can't make partial clones, so create (or convert) the
+      # mirror first and let populate() fetch into it.
+      if not exists:
+        Clone(git_url, mirror.mirror_path, True)
+      else:
+        _ConfigurePartialClone(mirror.mirror_path)
+    old_tips = None
+    if exists and WRITE_COMMIT_GRAPH:
+      old_tips = _ReadTips(mirror.mirror_path, True)
+    mirror.populate(depth=depth, shallow=shallow, ignore_lock=True)
+    if not exists or (old_tips is not None and
+                      old_tips != _ReadTips(mirror.mirror_path, True)):
+      ScheduleCommitGraph(mirror.mirror_path)
   return mirror.mirror_path
 
 
-def Fetch(git_repo, git_url, is_mirror):
-  """Fetch the latest objects for a given git repository."""
-  # Always update the upstream url
-  Git(git_repo, 'config remote.origin.url %s' % git_url)
-  Git(git_repo, 'fetch origin', is_mirror)
+def _FetchRefspec(refspec, is_mirror):
+  """Return the 'git fetch' refspec that updates just refspec, or None.
+
+  None means the whole repository has to be fetched, because FULL_FETCH is set
+  or refspec isn't a ref the remote has (FETCH_HEAD, local branches)."""
+  if FULL_FETCH or not refspec:
+    return None
+  if is_mirror:
+    if refspec.startswith('refs/') and not refspec.startswith('refs/remotes/'):
+      return '+%s:%s' % (refspec, refspec)
+    return None
+  # Checkouts keep origin's branches under refs/remotes; see SvnRevToGitHash.
+  for remote_prefix, local_prefix in (
+      ('refs/heads/', 'refs/remotes/origin/'),
+      ('refs/branch-heads/', 'refs/remotes/branch-heads/')):
+    if refspec.startswith(local_prefix):
+      return '+%s%s:%s' % (remote_prefix, refspec[len(local_prefix):], refspec)
+  return None
+
+
+def Fetch(git_repo, git_url, is_mirror, refspec=None):
+  """Fetch the latest objects for a given git repository.
+
+  If refspec is given, only that ref is fetched when possible."""
+  fetch_refspec = _FetchRefspec(refspec, is_mirror)
+  with RepoLock(git_repo, is_mirror, exclusive=True):
+    # Always update the upstream url
+    Git(git_repo, ['config', 'remote.origin.url', git_url])
+    if is_mirror:
+      _ConfigurePartialClone(git_repo)
+    if fetch_refspec:
+      Git(git_repo, ['fetch', 'origin', fetch_refspec], is_mirror,
+          timeout=FETCH_TIMEOUT)
+    else:
+      Git(git_repo, ['fetch', 'origin'], is_mirror, timeout=FETCH_TIMEOUT)
+  GetCatFile(git_repo, is_mirror).Close()
+
+
+# The FetchCoordinator key for fetches of every ref.
+_ALL_REFS = '*'
+
+
+class FetchCoordinator(object):
+  """Coalesces the fetches of one repository across threads.
+
+  Fetches of a repository run one at a time.  The first thread that needs a
+  fetch runs it, and threads that need the same ref (or any ref, for a full
+  fetch) while it's running wait for it and share its result instead of
+  starting their own.  A finished fetch covers the highest SVN revision it was
+  run (or waited on) for, so later requests for that revision or older ones
+  don't fetch again.
+
+  Each fetch also leaves a stamp in the git dir with its start time, that
+  revision and a snapshot of the ref tips.  With MAX_FETCH_AGE set, a stamp
+  left by any deps2git run lets later runs skip the fetch too, as long as the
+  stamp is recent and the ref still points where the fetch left it."""
+
+  def __init__(self, git_repo, fetch_url, is_mirror):
+    self.git_repo = git_repo
+    self.fetch_url = fetch_url
+    self.is_mirror = is_mirror
+    self.stamp_path = os.path.join(_GitDir(git_repo, is_mirror), 'deps2git',
+                                   'fetch-stamp')
+    self.cond = threading.Condition()
+    self.fetching = None
+    self.generation = 0
+    self.error = None
+    # Highest SVN revision covered by a fetch, keyed by refspec or _ALL_REFS.
+    self.covered_revs = {}
+
+  def _FetchKey(self, refspec):
+    if _FetchRefspec(refspec, self.is_mirror):
+      return refspec
+    return _ALL_REFS
+
+  def _Covers(self, svn_rev, refspec):
+    return svn_rev <= max(self.covered_revs.get(_ALL_REFS),
+                          self.covered_revs.get(refspec))
+
+  def _ReadStamp(self):
+    try:
+      with open(self.stamp_path) as f:
+        return json.load(f)
+    except (IOError, ValueError):
+      return None
+
+  def _WriteStamp(self, fetch_key, start_time, covered_rev):
+    with RepoLock(self.git_repo, self.is_mirror, exclusive=True):
+      tips = _ReadTips(self.git_repo, self.is_mirror)
+      stamp = self._ReadStamp() or {}
+      fetches = stamp.get('fetches', {})
+      fetches[fetch_key] = {'time': start_time, 'covered_rev': covered_rev}
+      _WriteFileAtomically(self.stamp_path, json.dumps(
+          {'fetches': fetches, 'tips': tips}, sort_keys=True))
+    if self.is_mirror and tips != stamp.get('tips'):
+      ScheduleCommitGraph(self.git_repo)
+
+  def _IsFresh(self, svn_rev, refspec):
+    """Return True if a recent fetch by any run covers svn_rev on refspec."""
+    if MAX_FETCH_AGE is None:
+      return False
+    stamp = self._ReadStamp()
+    if not stamp:
+      return False
+    for fetch_key in (_ALL_REFS, refspec):
+      fetch = stamp['fetches'].get(fetch_key)
+      if (fetch and time.time() - fetch['time'] <= MAX_FETCH_AGE and
+          svn_rev <= fetch['covered_rev']):
+        break
+    else:
+      return False
+    try:
+      with RepoLock(self.git_repo, self.is_mirror):
+        tip = GetCatFile(self.git_repo, self.is_mirror).Read(
+            '%s^{commit}' % refspec)[0]
+    except AbnormalExit:
+      return False
+    return stamp['tips'].get(refspec) == tip
+
+  def Fetch(self, svn_rev, refspec):
+    """Make sure a fetch covering svn_rev on refspec has run.
+
+    Return True if this call ran a fetch itself."""
+    svn_rev = int(svn_rev)
+    fetch_key = self._FetchKey(refspec)
+    with self.cond:
+      while True:
+        if self._Covers(svn_rev, refspec):
+          return False
+        if not self.fetching:
+          break
+        shared = self.fetching in (_ALL_REFS, fetch_key)
+        if VERBOSE and shared:
+          print >> sys.stderr, 'Waiting for fetch of %s' % self.git_repo
+        generation = self.generation
+        while self.generation == generation:
+          self.cond.wait()
+        if shared:
+          if self.error:
+            raise self.error
+          self.covered_revs[fetch_key] = max(
+              self.covered_revs.get(fetch_key), svn_rev)
+          return False
+      if self._IsFresh(svn_rev, refspec):
+        if VERBOSE:
+          print >> sys.stderr, 'Skipping fetch of fresh %s' % self.git_repo
+        return False
+      self.fetching = fetch_key
+
+    error = None
+    start_time = time.time()
+    covered_rev = max(self.covered_revs.get(fetch_key), svn_rev)
+    try:
+      Fetch(self.git_repo, self.fetch_url, self.is_mirror, refspec)
+      self._WriteStamp(fetch_key, start_time, covered_rev)
+    except Exception as e:
+      error = e
+      raise
+    finally:
+      with self.cond:
+        self.fetching = None
+        self.error = error
+        if not error:
+          self.covered_revs[fetch_key] = covered_rev
+        self.generation += 1
+        self.cond.notify_all()
+    return True
+
+
+_fetch_coordinators = {}
+_fetch_coordinators_lock = threading.Lock()
+
+
+def GetFetchCoordinator(git_repo, fetch_url, is_mirror):
+  """Return the shared FetchCoordinator for git_repo."""
+  key = os.path.abspath(_GitDir(git_repo, is_mirror))
+  with _fetch_coordinators_lock:
+    if key not in _fetch_coordinators:
+      _fetch_coordinators[key] = FetchCoordinator(git_repo, fetch_url,
+                                                  is_mirror)
+    return _fetch_coordinators[key]
+
+
+_http_lock = threading.Lock()
+_http_client = None
+_url_config = None
+
+
+def _HttpPingable(git_url):
+  """Return whether git would fetch git_url itself over plain HTTP(S).
+
+  URLs git would rewrite ('url.<base>.insteadOf') or reach through a proxy
+  are left to git."""
+  global _url_config
+  with _http_lock:
+    if _url_config is None:
+      status, output = GetStatusOutput(
+          [GIT_EXE, 'config', '--get-regexp', r'^(url|http)\.'])
+      _url_config = output.splitlines() if status == 0 else []
+  if urllib.getproxies():
+    return False
+  for line in _url_config:
+    key, _, value = line.partition(' ')
+    key = key.lower()
+    if key.startswith('http.') and key.endswith('proxy') and value:
+      return False
+    if key.startswith('url.') and key.endswith('.insteadof'):
+      if git_url.startswith(value):
+        return False
+  return True
+
+
+def _GetHttpClient():
+  global _http_client
+  with _http_lock:
+    if not _http_client:
+      _http_client = git_http.RefAdvertisementClient(
+          timeout=PING_TIMEOUT or TIMEOUT)
+    return _http_client
+
+
+@atexit.register
+def CloseHttpClient():
+  global _http_client
+  with _http_lock:
+    if _http_client:
+      _http_client.Close()
+      _http_client = None
 
 
 def Ping(git_repo, verbose=False):
   """Confirm that a remote repository URL is valid."""
-  status, stdout = GetStatusOutput('git ls-remote ' + git_repo)
+  if (HTTP_PING and git_repo.startswith(('http://', 'https://')) and
+      _HttpPingable(git_repo)):
+    if _GetHttpClient().HasRefs(git_repo):
+      return True
+  status, stdout = GetStatusOutput([GIT_EXE, 'ls-remote', git_repo],
+                                   timeout=PING_TIMEOUT)
   if status != 0 and verbose:
     print >> sys.stderr, stdout
   return status == 0
@@ -240,25 +1002,235 @@ def CreateLessThanOrEqualRegex(number):
   return regex
 
 
+def IterSvnCommits(git_repo, revision_range, is_mirror):
+  """Yield (git_hash, svn_rev) for each git-svn commit in revision_range.
+
+  Commits are produced in 'git log' order (newest first) while a single
+  'git log' process is still streaming, so callers that stop iterating early
+  don't pay for the rest of the history walk."""
+  cmd, cwd = _GitCommand(
+      git_repo, ['log', '--format=%x00%H%n%B', revision_range], is_mirror)
+  if VERBOSE:
+    print >> sys.stderr, ''
+    print >> sys.stderr, '[DEBUG] Streaming "%s"' % _CommandString(cmd)
+  proc = _Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  _watchdog.Watch(proc, cmd, SEARCH_TIMEOUT or TIMEOUT)
+  finished = False
+  try:
+    pending = ''
+    while True:
+      buf = proc.stdout.read(64 * 1024)
+      if not buf:
+        break
+      records = (pending + buf).split('\0')
+      pending = records.pop()
+      for record in records:
+        commit = _ParseSvnCommit(record)
+        if commit:
+          yield commit
+    commit = _ParseSvnCommit(pending)
+    if commit:
+      yield commit
+    finished = True
+  finally:
+    if not finished and proc.poll() is None:
+      _KillProcessGroup(proc)
+    stderr = proc.communicate()[1]
+    if _watchdog.Unwatch(proc):
+      stderr = 'Killed after %s seconds.' % (SEARCH_TIMEOUT or TIMEOUT)
+  if proc.returncode != 0:
+    raise AbnormalExit('Failed to run %s. error %d. output %s' %
+                       (_CommandString(cmd), proc.returncode, stderr))
+
+
+def _ParseSvnCommit(record):
+  """Return (git_hash, svn_rev) for a '%H%n%B' log record, or None."""
+  if not record:
+    return None
+  git_hash, _, body = record.partition('\n')
+  revs = GIT_SVN_ID_RE.findall(body)
+  if not revs:
+    return None
+  return (git_hash, int(revs[-1]))
+
+
+class SvnRevIndex(object):
+  """Map of SVN revisions to git commits for one refspec of a repo.
+
+  The index is stored inside the repository's git dir and remembers the ref tip
+  it was built from, so Update() only has to walk the commits added since the
+  previous run (usually by a Fetch).  Commits are kept in history order, oldest
+  first, since SVN revisions are not always monotone along it (e.g. after a
+  branch was reset to an older revision).  Lookups are a binary search over
+  the smallest revision of each suffix of the history, which is sorted.
+
+  Callers must hold self.lock around Update() and Lookup()."""
+
+  def __init__(self, git_repo, is_mirror, refspec):
+    self.git_repo = git_repo
+    self.is_mirror = is_mirror
+    self.refspec = refspec
+    self.path = os.path.join(_GitDir(git_repo, is_mirror), 'deps2git',
+                             'svn-index', refspec.replace('/', '%2F'))
+    self.lock = threading.Lock()
+    self.tip = None
+    self.revs = []
+    self.hashes = []
+    # floors[i] is min(revs[i:]); exact maps revisions to their newest commit.
+    self.floors = []
+    self.exact = {}
+    self.mtime = None
+    self._Load()
+
+  def _GetMtime(self):
+    try:
+      return os.stat(self.path).st_mtime
+    except OSError:
+      return None
+
+  def _Load(self):
+    self.mtime = self._GetMtime()
+    if self.mtime is None:
+      return
+    with open(self.path) as f:
+      lines = f.read().splitlines()
+    if not lines or not lines[0].startswith('tip '):
+      return
+    revs = []
+    hashes = []
+    for line in lines[1:]:
+      rev, git_hash = line.split()
+      revs.append(int(rev))
+      hashes.append(git_hash)
+    self.tip = lines[0][len('tip '):]
+    self.revs = revs
+    self.hashes = hashes
+    self._Reindex()
+
+  def _Reindex(self):
+    floors = []
+    floor = None
+    for rev in reversed(self.revs):
+      floor = rev if floor is None else min(floor, rev)
+      floors.append(floor)
+    floors.reverse()
+    self.floors = floors
+    self.exact = dict(zip(self.revs, self.hashes))
+
+  def _Save(self):
+    lines = ['tip %s\n' % self.tip]
+    lines.extend('%d %s\n' % entry for entry in zip(self.revs, self.hashes))
+    _WriteFileAtomically(self.path, ''.join(lines))
+    self.mtime = self._GetMtime()
+
+  def _ReadTip(self):
+    return GetCatFile(self.git_repo, self.is_mirror).Read(
+        '%s^{commit}' % self.refspec)[0]
+
+  def Update(self):
+    """Bring the index up to date with the refspec's current tip.
+
+    Another process sharing the repository may have updated the index file, in
+    which case it is reloaded first.  Return True if the index changed."""
+    with RepoLock(self.git_repo, self.is_mirror):
+      if self._ReadTip() == self.tip and self._GetMtime() == self.mtime:
+        return False
+    with RepoLock(self.git_repo, self.is_mirror, exclusive=True):
+      if self._GetMtime() != self.mtime:
+        self._Load()
+      return self._UpdateTo(self._ReadTip())
+
+  def _UpdateTo(self, tip):
+    if tip == self.tip:
+      return False
+    revision_range = tip
+    if self.tip:
+      cmd, cwd = _GitCommand(
+          self.git_repo, ['merge-base', '--is-ancestor', self.tip, tip],
+          self.is_mirror)
+      status, _ = GetStatusOutput(cmd, cwd)
+      if status == 0:
+        revision_range = '%s..%s' % (self.tip, tip)
+      else:
+        # History was rewritten; start over.
+        self.revs = []
+        self.hashes = []
+    if VERBOSE:
+      print >> sys.stderr, 'Indexing %s %s' % (self.git_repo, revision_range)
+    new_commits = list(IterSvnCommits(self.git_repo, revision_range,
+                                      self.is_mirror))
+    new_commits.reverse()
+    self.revs.extend(rev for _, rev in new_commits)
+    self.hashes.extend(git_hash for git_hash, _ in new_commits)
+    self._Reindex()
+    self.tip = tip
+    self._Save()
+    return True
+
+  def Lookup(self, svn_rev, exact=False):
+    """Return (git_hash, found_rev) for the newest commit <= svn_rev.
+
+    Like 'git log --grep -1', that is the first commit in log order whose
+    revision is not larger than svn_rev, whether or not it is the largest.
+    If exact, only the newest commit of svn_rev itself is returned."""
+    svn_rev = int(svn_rev)
+    if exact:
+      git_hash = self.exact.get(svn_rev)
+      return (git_hash, svn_rev if git_hash else None)
+    # The newest such commit is the last one starting a suffix of the history
+    # with a revision <= svn_rev.
+    pos = bisect.bisect_right(self.floors, svn_rev)
+    if not pos:
+      return (None, None)
+    return (self.hashes[pos - 1], self.revs[pos - 1])
+
+
+_svn_indexes = {}
+_svn_indexes_lock = threading.Lock()
+
+
+def GetSvnRevIndex(git_repo, is_mirror, refspec):
+  """Return the shared SvnRevIndex for (git_repo, refspec)."""
+  key = (os.path.abspath(git_repo), refspec)
+  with _svn_indexes_lock:
+    if key not in _svn_indexes:
+      _svn_indexes[key] = SvnRevIndex(git_repo, is_mirror, refspec)
+    return _svn_indexes[key]
+
+
 class SearchError(Exception):
   pass
 
 
-def _SearchImpl(git_repo, svn_rev, is_mirror, refspec, fetch_url, regex):
-  def _FindRevForCommitish(git_repo, commitish, is_mirror):
-    _, output = Git(git_repo, 'cat-file commit %s' % commitish, is_mirror)
-    match = re.match(r'git-svn-id: [^\s@]+@(\d+) \S+$', output.splitlines()[-1])
+# What SearchBatch() found for a revision: the Git commit id, the SVN revision
+# of that commit (smaller than the one requested for a fuzzy match), and the
+# SVN revision of the tip of the ref searched, or None if it has none.
+SearchResult = collections.namedtuple('SearchResult',
+                                      ['git_hash', 'found_rev', 'tip_rev'])
+
+
+def _FindRevForCommitish(git_repo, commitish, is_mirror):
+  with RepoLock(git_repo, is_mirror):
+    _, _, output = GetCatFile(git_repo, is_mirror).Read(
+        '%s^{commit}' % commitish)
+    match = re.match(r'git-svn-id: [^\s@]+@(\d+) \S+$',
+                     output.splitlines()[-1])
     if match:
       return int(match.group(1))
     else:
-      # The last commit isn't from svn, but maybe the repo was converted to pure
-      # git at some point, so the last svn commit is somewhere farther back.
+      # The last commit isn't from svn, but maybe the repo was converted to
+      # pure git at some point, so the last svn commit is somewhere farther
+      # back.
       _, output = Git(
-          git_repo, ('log -E --grep="^git-svn-id: [^@]*@[0-9]* [A-Za-z0-9-]*$" '
-                     '-1 --format="%%H" %s') % commitish, is_mirror)
+          git_repo, ['log', '-E',
+                     '--grep=^git-svn-id: [^@]*@[0-9]* [A-Za-z0-9-]*$',
+                     '-1', '--format=%H', commitish], is_mirror,
+          timeout=SEARCH_TIMEOUT)
       assert output, 'no match on %s' % commitish
 
-  # Check if svn_rev is newer than the current refspec revision.
+
+def _FetchIfNeeded(git_repo, svn_rev, is_mirror, refspec, fetch_url):
+  """Fetch git_repo if svn_rev is newer than the current refspec revision."""
   try:
     found_rev = _FindRevForCommitish(git_repo, refspec, is_mirror)
   # Sometimes this fails because it's looking in a branch that hasn't been
@@ -269,41 +1241,265 @@ def _SearchImpl(git_repo, svn_rev, is_mirror, refspec, fetch_url, regex):
     if VERBOSE:
       print >> sys.stderr, (
           'Fetching %s %s [%s < %s]' % (git_repo, refspec, found_rev, svn_rev))
-    Fetch(git_repo, fetch_url, is_mirror)
-    found_rev = _FindRevForCommitish(git_repo, refspec, is_mirror)
+    GetFetchCoordinator(git_repo, fetch_url, is_mirror).Fetch(svn_rev,
+                                                              refspec)
 
-  # Find the first commit matching the given git-svn-id regex.
-  _, output = Git(
-      git_repo,
-      ('log -E --grep="^git-svn-id: [^@]*@%s [A-Za-z0-9-]*$" '
-       '-1 --format="%%H" %s') % (regex, refspec),
-      is_mirror)
-  output = output.strip()
+
+def _ReportFound(git_repo, git_hash, svn_rev, found_rev):
+  found_msg = svn_rev
+  if found_rev != int(svn_rev):
+    found_msg = '%s [actual: %s]' % (svn_rev, found_rev)
+  print >> sys.stderr, '%s: %s <-> %s' % (git_repo, git_hash, found_msg)
+
+
+def _ResolveFromLog(git_repo, svn_revs, is_mirror, refspec):
+  """Map each of svn_revs to (git_hash, found_rev) in a single history walk.
+
+  Like 'git log --grep -1', each revision resolves to the first commit in log
+  order whose SVN revision is not larger.  Revisions without a match are left
+  out of the result."""
+  pending = sorted(set(int(svn_rev) for svn_rev in svn_revs))
+  found = {}
+  with RepoLock(git_repo, is_mirror):
+    commits = IterSvnCommits(git_repo, refspec, is_mirror)
+    try:
+      for git_hash, rev in commits:
+        pos = bisect.bisect_left(pending, rev)
+        for svn_rev in pending[pos:]:
+          found[svn_rev] = (git_hash, rev)
+        del pending[pos:]
+        if not pending:
+          break
+    finally:
+      commits.close()
+  return found
+
+
+def _BisectStampPath(git_repo, is_mirror, refspec):
+  return os.path.join(_GitDir(git_repo, is_mirror), 'deps2git',
+                      'bisect-checked', refspec.replace('/', '%2F'))
+
+
+def _ResolveByBisect(git_repo, svn_revs, is_mirror, refspec):
+  """Map each of svn_revs to (git_hash, found_rev) by bisecting history.
+
+  SVN revisions only ever decrease along the first-parent history of a git-svn
+  mirror, so the newest commit whose revision is not larger than svn_rev can be
+  found by reading the git-svn-id of O(log n) commits.  Return None if the
+  history has merges, commits without a git-svn-id or revisions that increase
+  along it, which the bisection can't handle.  Revisions without a match are
+  left out of the result.
+
+  The revisions of all the commits are read to check their order the first
+  time, but the last tip checked is kept in the repository, so later searches
+  only read the commits added since."""
+  stamp_path = _BisectStampPath(git_repo, is_mirror, refspec)
+  with RepoLock(git_repo, is_mirror):
+    _, output = Git(git_repo,
+                    ['rev-list', '--first-parent', '--parents', refspec],
+                    is_mirror, timeout=SEARCH_TIMEOUT)
+    commits = []
+    for line in output.splitlines():
+      fields = line.split()
+      if len(fields) > 2:
+        # A merge; 'git log --grep' could find a match on its other parents.
+        return None
+      commits.append(fields[0])
+
+    cat_file = GetCatFile(git_repo, is_mirror)
+    probed_revs = {}
+    def _RevAt(pos):
+      if pos not in probed_revs:
+        revs = GIT_SVN_ID_RE.findall(cat_file.Read(commits[pos])[2])
+        probed_revs[pos] = int(revs[-1]) if revs else None
+      return probed_revs[pos]
+
+    # The stamp holds the last tip checked, and whether its history could be
+    # bisected.  History only grows at the tip, so once it can't, it never
+    # can again.
+    try:
+      with open(stamp_path) as f:
+        checked_tip, checked = f.read().split()
+    except (IOError, ValueError):
+      checked_tip, checked = None, None
+    if checked_tip in commits:
+      if checked != 'ordered':
+        return None
+      # Check the new commits, and that the old tip is older than them.
+      unchecked = commits.index(checked_tip) + 1
+    else:
+      unchecked = len(commits)
+    ordered = True
+    for pos in xrange(unchecked):
+      if _RevAt(pos) is None or (pos and _RevAt(pos) > _RevAt(pos - 1)):
+        ordered = False
+        break
+
+    found = None
+    if ordered:
+      found = {}
+      for svn_rev in set(int(svn_rev) for svn_rev in svn_revs):
+        # Find the first commit, newest first, at or below svn_rev.
+        lo, hi = 0, len(commits)
+        while lo < hi:
+          mid = (lo + hi) // 2
+          if _RevAt(mid) <= svn_rev:
+            hi = mid
+          else:
+            lo = mid + 1
+        if lo < len(commits):
+          found[svn_rev] = (commits[lo], _RevAt(lo))
+
+  if commits and commits[0] != checked_tip:
+    with RepoLock(git_repo, is_mirror, exclusive=True):
+      _WriteFileAtomically(stamp_path, '%s %s\n' % (
+          commits[0], 'ordered' if ordered else 'unordered'))
+  return found
+
+
+def _SearchImpl(git_repo, svn_rev, is_mirror, refspec, fetch_url, exact,
+                mode):
+  if mode not in SEARCH_MODES:
+    raise ValueError('Unknown search mode %s' % mode)
+
+  _FetchIfNeeded(git_repo, svn_rev, is_mirror, refspec, fetch_url)
+
+  if mode == SEARCH_BISECT:
+    found = _ResolveByBisect(git_repo, [svn_rev], is_mirror, refspec)
+    if found is None:
+      if VERBOSE:
+        print >> sys.stderr, 'Cannot bisect %s:%s, using regex' % (git_repo,
+                                                                   refspec)
+      mode = SEARCH_REGEX
+
+  if mode == SEARCH_INDEX:
+    index = GetSvnRevIndex(git_repo, is_mirror, refspec)
+    with index.lock:
+      index.Update()
+      output, found_rev = index.Lookup(svn_rev, exact)
+    output = output or ''
+  elif mode == SEARCH_BISECT:
+    output, found_rev = found.get(int(svn_rev), (None, None))
+    if exact and found_rev != int(svn_rev):
+      output = None
+    output = output or ''
+  else:
+    if exact:
+      regex = str(svn_rev)
+    else:
+      regex = CreateLessThanOrEqualRegex(svn_rev)
+    # Find the first commit matching the given git-svn-id regex.
+    with RepoLock(git_repo, is_mirror):
+      _, output = Git(
+          git_repo,
+          ['log', '-E',
+           '--grep=^git-svn-id: [^@]*@%s [A-Za-z0-9-]*$' % regex,
+           '-1', '--format=%H', refspec],
+          is_mirror, timeout=SEARCH_TIMEOUT)
+    output = output.strip()
   if not re.match('^[0-9a-fA-F]{40}$', output):
     raise SearchError('Cannot find revision %s in %s:%s' % (svn_rev, git_repo,
                                                             refspec))
 
   # Check if it actually matched the svn_rev that was requested.
-  found_rev = _FindRevForCommitish(git_repo, output, is_mirror)
-  found_msg = svn_rev
-  if found_rev != int(svn_rev):
-    found_msg = '%s [actual: %s]' % (svn_rev, found_rev)
-  print >> sys.stderr, '%s: %s <-> %s' % (git_repo, output, found_msg)
+  if mode == SEARCH_REGEX:
+    found_rev = _FindRevForCommitish(git_repo, output, is_mirror)
+  _ReportFound(git_repo, output, svn_rev, found_rev)
   return output
 
 
 def SearchExact(git_repo, svn_rev, is_mirror, refspec='FETCH_HEAD',
-    fetch_url=None):
+    fetch_url=None, mode=SEARCH_REGEX):
   """Return the Git commit id exactly matching the given SVN revision.
 
   If fetch_url is not None, will update repo if revision is newer."""
-  regex = str(svn_rev)
-  return _SearchImpl(git_repo, svn_rev, is_mirror, refspec, fetch_url, regex)
+  return _SearchImpl(git_repo, svn_rev, is_mirror, refspec, fetch_url, True,
+                     mode)
 
 
-def Search(git_repo, svn_rev, is_mirror, refspec='FETCH_HEAD', fetch_url=None):
+def Search(git_repo, svn_rev, is_mirror, refspec='FETCH_HEAD', fetch_url=None,
+           mode=SEARCH_REGEX):
   """Return the Git commit id fuzzy matching the given SVN revision.
 
   If fetch_url is not None, will update repo if revision is newer."""
-  regex = CreateLessThanOrEqualRegex(svn_rev)
-  return _SearchImpl(git_repo, svn_rev, is_mirror, refspec, fetch_url, regex)
+  return _SearchImpl(git_repo, svn_rev, is_mirror, refspec, fetch_url, False,
+                     mode)
+
+
+def _SearchRefspec(git_repo, svn_revs, is_mirror, refspec, fetch_url, mode):
+  """Fuzzy match the set svn_revs on refspec, for SearchBatch().
+
+  Return ({svn_rev: (git_hash, found_rev)}, the SVN revision of the tip of
+  refspec or None).  Raise AbnormalExit if refspec can't be searched."""
+  _FetchIfNeeded(git_repo, max(svn_revs), is_mirror, refspec, fetch_url)
+  try:
+    tip_rev = _FindRevForCommitish(git_repo, refspec, is_mirror)
+  except AbnormalExit:
+    tip_rev = None
+  start = time.time()
+  if mode == SEARCH_INDEX:
+    index = GetSvnRevIndex(git_repo, is_mirror, refspec)
+    with index.lock:
+      index.Update()
+      found = dict((svn_rev, index.Lookup(svn_rev)) for svn_rev in svn_revs)
+  else:
+    found = None
+    if mode == SEARCH_BISECT:
+      found = _ResolveByBisect(git_repo, svn_revs, is_mirror, refspec)
+    if found is None:
+      found = _ResolveFromLog(git_repo, svn_revs, is_mirror, refspec)
+  if VERBOSE or WRITE_COMMIT_GRAPH:
+    print >> sys.stderr, '%s: searched %s for %d revisions in %.2fs%s' % (
+        git_repo, refspec, len(svn_revs), time.time() - start,
+        ' [commit-graph]' if _HasCommitGraph(git_repo, is_mirror) else '')
+  return found, tip_rev
+
+
+def SearchBatch(git_repo, requests, is_mirror, fetch_url=None,
+                mode=SEARCH_REGEX):
+  """Fuzzy match many SVN revisions of one repository in a single pass.
+
+  requests is a list of (svn_rev, refspec) pairs.  Each refspec is fetched at
+  most once and its history walked at most once, however many revisions are
+  requested on it.  In regex mode, that walk streams the whole history
+  through _ResolveFromLog() rather than running 'git log --grep' per
+  revision.  Return a dict mapping every request to a SearchResult, or to the
+  SearchError describing why it couldn't be found.
+
+  If fetch_url is not None, will update repo if a revision is newer."""
+  if mode not in SEARCH_MODES:
+    raise ValueError('Unknown search mode %s' % mode)
+
+  svn_revs_by_refspec = {}
+  for svn_rev, refspec in requests:
+    svn_revs_by_refspec.setdefault(refspec, set()).add(int(svn_rev))
+
+  found_by_refspec = {}
+  tip_revs = {}
+  errors_by_refspec = {}
+  for refspec, svn_revs in sorted(svn_revs_by_refspec.iteritems()):
+    try:
+      found_by_refspec[refspec], tip_revs[refspec] = _SearchRefspec(
+          git_repo, svn_revs, is_mirror, refspec, fetch_url, mode)
+    except AbnormalExit as e:
+      # E.g. the refspec doesn't exist; only its own requests fail.
+      errors_by_refspec[refspec] = SearchError(
+          'Cannot search %s:%s: %s' % (git_repo, refspec, e))
+
+  results = {}
+  for svn_rev, refspec in requests:
+    if (svn_rev, refspec) in results:
+      continue
+    if refspec in errors_by_refspec:
+      results[(svn_rev, refspec)] = errors_by_refspec[refspec]
+      continue
+    git_hash, found_rev = found_by_refspec[refspec].get(int(svn_rev),
+                                                        (None, None))
+    if git_hash:
+      _ReportFound(git_repo, git_hash, svn_rev, found_rev)
+      results[(svn_rev, refspec)] = SearchResult(git_hash, found_rev,
+                                                 tip_revs[refspec])
+    else:
+      results[(svn_rev, refspec)] = SearchError(
+          'Cannot find revision %s in %s:%s' % (svn_rev, git_repo, refspec))
+  return results
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Microbenchmarks for git_tools."""
+
+import optparse
+import os
+import Queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import git_tools
+
+
+def _WriteProgressStream(path, size):
+  """Write about size bytes of 'git clone' style progress output to path."""
+  with open(path, 'wb') as f:
+    written = 0
+    total = 250000
+    count = 0
+    while written < size:
+      count += 1
+      line = ('Receiving objects: %3d%% (%d/%d), %.2f MiB | 12.34 MiB/s\r' %
+              (count * 100 / total, count, total, count / 1024.0))
+      if count % 1000 == 0:
+        line += 'remote: Counting objects: %d, done.\n' % count
+      f.write(line)
+      written += len(line)
+
+
+def _DrainQueue(out_q):
+  """Consume the StdioBuffer output the way deps2git's message thread does."""
+  while out_q.get() is not None:
+    pass
+
+
+def _ReadBytewise(cmd, out_buffer):
+  """The byte-at-a-time GetStatusOutput() loop, kept as the baseline."""
+  proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT)
+  while True:
+    buf = proc.stdout.read(1)
+    if buf == '\r':
+      buf = '\n'
+    if not buf:
+      break
+    out_buffer.write(buf)
+  proc.wait()
+  out_buffer.close()
+
+
+def _ReadChunked(read_mode):
+  def _Read(cmd, out_buffer):
+    git_tools.GetStatusOutput(cmd, out_buffer=out_buffer, read_mode=read_mode)
+  return _Read
+
+
+def BenchmarkStreamReaders(size, repeat):
+  """Time streaming a synthetic progress stream through a StdioBuffer."""
+  fd, path = tempfile.mkstemp()
+  os.close(fd)
+  try:
+    _WriteProgressStream(path, size)
+    size = os.path.getsize(path)
+    cmd = 'cat "%s"' % path
+    readers = [('bytewise (before)', _ReadBytewise)]
+    readers.extend(('%s (after)' % mode, _ReadChunked(mode))
+                   for mode in git_tools.READ_MODES)
+    print 'Streaming %.1f MiB of progress output, best of %d:' % (
+        size / 1048576.0, repeat)
+    for name, reader in readers:
+      best = None
+      for _ in xrange(repeat):
+        out_q = Queue.Queue()
+        drain = threading.Thread(target=_DrainQueue, args=(out_q,))
+        drain.start()
+        start = time.time()
+        reader(cmd, git_tools.StdioBuffer('bench', out_q))
+        drain.join()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+      print '  %-20s %8.3fs %10.1f MiB/s' % (name, best,
+                                             size / 1048576.0 / best)
+  finally:
+    os.remove(path)
+
+
+def _Git(args, cwd):
+  with open(os.devnull, 'w') as devnull:
+    subprocess.check_call(
+        ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@bench'] + args,
+        cwd=cwd, stdout=devnull, stderr=devnull)
+
+
+def BenchmarkScopedFetch(num_refs, repeat):
+  """Time full and single-ref fetches from a local repo with many refs."""
+  tmp_dir = tempfile.mkdtemp()
+  try:
+    upstream = os.path.join(tmp_dir, 'upstream')
+    mirror = os.path.join(tmp_dir, 'mirror.git')
+    os.makedirs(upstream)
+    _Git(['init', '-q'], upstream)
+    _Git(['symbolic-ref', 'HEAD', 'refs/heads/master'], upstream)
+    _Git(['commit', '-q', '--allow-empty', '-m', 'base'], upstream)
+    # Give every branch-head its own commit, like a real svn mirror.
+    proc = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=upstream,
+                            stdin=subprocess.PIPE)
+    for i in xrange(num_refs):
+      proc.stdin.write(
+          'commit refs/branch-heads/%d\n'
+          'committer bench <bench@bench> 0 +0000\n'
+          'data 7\nbranch\n'
+          'from refs/heads/master\n\n' % i)
+    proc.stdin.close()
+    if proc.wait():
+      raise RuntimeError('git fast-import failed')
+    _Git(['clone', '-q', '--mirror', upstream, mirror], tmp_dir)
+
+    print 'Fetching refs/heads/master from a repo with %d refs, best of %d:' % (
+        num_refs, repeat)
+    for name, full_fetch in (('full (before)', True),
+                             ('scoped (after)', False)):
+      best = None
+      for _ in xrange(repeat):
+        _Git(['commit', '-q', '--allow-empty', '-m', 'new'], upstream)
+        git_tools.FULL_FETCH = full_fetch
+        start = time.time()
+        git_tools.Fetch(mirror, upstream, True, 'refs/heads/master')
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+      print '  %-20s %8.3fs' % (name, best)
+  finally:
+    git_tools.FULL_FETCH = False
+    git_tools.CloseCatFiles()
+    shutil.rmtree(tmp_dir)
+
+
+BENCHMARKS = ('stream', 'fetch')
+
+
+def main():
+  parser = optparse.OptionParser()
+  parser.add_option('--size-mb', type='float', default=8,
+                    help='size of the synthetic progress stream')
+  parser.add_option('--refs', type='int', default=20000,
+                    help='number of refs in the repo used by the fetch '
+                    'benchmark')
+  parser.add_option('--repeat', type='int', default=3,
+                    help='number of runs to take the best time from')
+  parser.add_option('-b', '--benchmark', action='append', choices=BENCHMARKS,
+                    help='benchmark to run (default: all of %s)' %
+                    ', '.join(BENCHMARKS))
+  options = parser.parse_args()[0]
+
+  benchmarks = options.benchmark or BENCHMARKS
+  if 'stream' in benchmarks:
+    BenchmarkStreamReaders(int(options.size_mb * 1048576), options.repeat)
+  if 'fetch' in benchmarks:
+    BenchmarkScopedFetch(options.refs, options.repeat)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,569 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import os
+import Queue
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import git_tools
+
+
+SVN_URL = 'svn://svn.chromium.org/chrome/trunk/src'
+SVN_UUID = '0039d316-1c4b-4281-b951-d872f2087c98'
+
+
+def _Run(args, cwd):
+  subprocess.check_call(
+      ['git', '-c', 'user.name=deps2git', '-c', 'user.email=deps2git@test'] +
+      args, cwd=cwd, stdout=open(os.devnull, 'w'))
+
+
+class GitRepoTestCase(unittest.TestCase):
+  """Base class that provides a scratch repository with git-svn commits."""
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.repo = os.path.join(self.tmp_dir, 'repo')
+    os.makedirs(self.repo)
+    _Run(['init', '-q'], self.repo)
+    _Run(['symbolic-ref', 'HEAD', 'refs/heads/master'], self.repo)
+    self.hashes = {}
+    # Keep Search() from reporting every lookup on stderr.
+    self._stderr = sys.stderr
+    sys.stderr = open(os.devnull, 'w')
+
+  def tearDown(self):
+    sys.stderr.close()
+    sys.stderr = self._stderr
+    shutil.rmtree(self.tmp_dir)
+
+  def Commit(self, svn_rev=None, message='Change'):
+    """Add an empty commit, with a git-svn-id trailer if svn_rev is set."""
+    if svn_rev is not None:
+      message += '\n\ngit-svn-id: %s@%d %s' % (SVN_URL, svn_rev, SVN_UUID)
+    _Run(['commit', '-q', '--allow-empty', '-m', message], self.repo)
+    git_hash = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=self.repo).strip()
+    if svn_rev is not None:
+      self.hashes[svn_rev] = git_hash
+    return git_hash
+
+  def Mirror(self):
+    """Return the path to a fresh 'clone --mirror' of the scratch repo."""
+    mirror = os.path.join(self.tmp_dir, 'mirror.git')
+    _Run(['clone', '-q', '--mirror', self.repo, mirror], self.tmp_dir)
+    return mirror
+
+
+class CreateLessThanOrEqualRegexTest(unittest.TestCase):
+  def testMatches(self):
+    regex = re.compile('^%s$' % git_tools.CreateLessThanOrEqualRegex(78356))
+    for number in (0, 9, 10, 999, 78299, 78349, 78355, 78356):
+      self.assertTrue(regex.match(str(number)), number)
+    for number in (78357, 78360, 78400, 79000, 80000, 100000):
+      self.assertFalse(regex.match(str(number)), number)
+
+
+class GetStatusOutputTest(unittest.TestCase):
+  def testOutBuffer(self):
+    for read_mode in git_tools.READ_MODES:
+      out_q = Queue.Queue()
+      out_buffer = git_tools.StdioBuffer('test', out_q)
+      status, output = git_tools.GetStatusOutput(
+          'printf "one\\rtwo\\nthree"', out_buffer=out_buffer,
+          read_mode=read_mode)
+      self.assertEqual((0, ''), (status, output))
+      lines = []
+      while not out_q.empty():
+        lines.append(out_q.get())
+      self.assertEqual(['test> one', 'test> two', 'test> three', None], lines)
+
+  def testOutput(self):
+    self.assertEqual((3, 'one\ntwo\nthree'), git_tools.GetStatusOutput(
+        'printf "one\r\ntwo\rthree"; exit 3'))
+
+  def testTimeout(self):
+    timeout = git_tools.TIMEOUT
+    git_tools.TIMEOUT = 0.5
+    try:
+      start = time.time()
+      # The shell and sleep are both killed.
+      self.assertEqual((-1, 'Killed after 0.5 seconds.'),
+                       git_tools.GetStatusOutput('sleep 10; sleep 10'))
+      self.assertTrue(time.time() - start < 5)
+      self.assertEqual((0, 'done\n'), git_tools.GetStatusOutput(
+          'sleep 2; echo done', timeout=5))
+    finally:
+      git_tools.TIMEOUT = timeout
+
+  def testWatchdogExits(self):
+    # The watchdog thread stops once nothing is left to watch.
+    self.assertEqual((0, ''), git_tools.GetStatusOutput('true'))
+    thread = git_tools._watchdog.thread
+    if thread:
+      thread.join(5)
+      self.assertFalse(thread.is_alive())
+    self.assertEqual(None, git_tools._watchdog.thread)
+
+  def testKillAll(self):
+    # KillAll() is for good, so use a watchdog of our own.
+    watchdog = git_tools._watchdog
+    git_tools._watchdog = git_tools._Watchdog()
+    try:
+      statuses = []
+      th = threading.Thread(target=lambda: statuses.append(
+          git_tools.GetStatusOutput('sleep 10; sleep 10')[0]))
+      start = time.time()
+      th.start()
+      while not git_tools._watchdog.deadlines:
+        time.sleep(0.05)
+      git_tools.KillAll()
+      th.join(5)
+      self.assertFalse(th.is_alive())
+      # Commands started afterwards are killed right away too.
+      statuses.append(git_tools.GetStatusOutput('sleep 10')[0])
+      self.assertTrue(time.time() - start < 5)
+      self.assertEqual(2, len(statuses))
+      self.assertNotIn(0, statuses)
+    finally:
+      git_tools._watchdog.Stop()
+      git_tools._watchdog = watchdog
+
+
+class GitTest(GitRepoTestCase):
+  def testArgsArePassedAsIs(self):
+    value = 'a "b" $HOME; c\''
+    spawned = git_tools.SpawnCount()
+    git_tools.Git(self.repo, ['config', 'test.value', value])
+    self.assertEqual(
+        (0, value + '\n'),
+        git_tools.Git(self.repo, ['config', 'test.value']))
+    # No shell is started on top of git.
+    self.assertEqual(spawned + 2, git_tools.SpawnCount())
+
+
+class FetchCoordinatorTest(GitRepoTestCase):
+  def setUp(self):
+    GitRepoTestCase.setUp(self)
+    self.Commit(10)
+    self.mirror = self.Mirror()
+    self.fetches = []
+    self._fetch = git_tools.Fetch
+    git_tools.Fetch = self._FakeFetch
+
+  def tearDown(self):
+    git_tools.Fetch = self._fetch
+    git_tools.MAX_FETCH_AGE = None
+    GitRepoTestCase.tearDown(self)
+
+  def _FakeFetch(self, git_repo, git_url, is_mirror, refspec=None):
+    self.fetches.append(git_repo)
+    time.sleep(0.2)
+
+  def _Coordinator(self):
+    return git_tools.FetchCoordinator(self.mirror, self.repo, True)
+
+  def testCoalesce(self):
+    coordinator = self._Coordinator()
+    threads = [threading.Thread(target=coordinator.Fetch,
+                                args=(rev, 'refs/heads/master'))
+               for rev in (10, 12, 11)]
+    for th in threads:
+      th.start()
+    for th in threads:
+      th.join()
+    self.assertEqual(1, len(self.fetches))
+
+    # Older revisions are covered by the fetch, newer ones are not.
+    self.assertFalse(coordinator.Fetch(10, 'refs/heads/master'))
+    self.assertFalse(coordinator.Fetch(12, 'refs/heads/master'))
+    self.assertTrue(coordinator.Fetch(13, 'refs/heads/master'))
+    self.assertEqual(2, len(self.fetches))
+
+  def testRefspecScope(self):
+    coordinator = self._Coordinator()
+    self.assertTrue(coordinator.Fetch(12, 'refs/heads/master'))
+    self.assertTrue(coordinator.Fetch(12, 'refs/branch-heads/1'))
+    self.assertFalse(coordinator.Fetch(12, 'refs/heads/master'))
+
+    # A full fetch covers every ref.
+    self.assertTrue(coordinator.Fetch(20, 'FETCH_HEAD'))
+    self.assertFalse(coordinator.Fetch(20, 'refs/branch-heads/2'))
+    self.assertEqual(3, len(self.fetches))
+
+  def testMaxFetchAge(self):
+    self.assertTrue(self._Coordinator().Fetch(12, 'refs/heads/master'))
+
+    # Later runs trust the stamp only if fetch age checks are enabled.
+    self.assertTrue(self._Coordinator().Fetch(12, 'refs/heads/master'))
+    git_tools.MAX_FETCH_AGE = 60
+    self.assertFalse(self._Coordinator().Fetch(12, 'refs/heads/master'))
+    self.assertTrue(self._Coordinator().Fetch(13, 'refs/heads/master'))
+
+    # The stamp is ignored once it's too old, or if the ref moved since.
+    git_tools.MAX_FETCH_AGE = 0
+    self.assertTrue(self._Coordinator().Fetch(12, 'refs/heads/master'))
+    git_tools.MAX_FETCH_AGE = 60
+    self.assertFalse(self._Coordinator().Fetch(12, 'refs/heads/master'))
+    self.Commit(11)
+    _Run(['fetch', '-q', self.repo, '+refs/heads/master:refs/heads/master'],
+         self.mirror)
+    # A real Fetch() would have restarted the mirror's cat-file process.
+    git_tools.CloseCatFiles()
+    self.assertTrue(self._Coordinator().Fetch(12, 'refs/heads/master'))
+    self.assertEqual(5, len(self.fetches))
+
+
+class FetchTest(GitRepoTestCase):
+  def _Tip(self, git_dir, ref):
+    return subprocess.check_output(
+        ['git', '--git-dir=%s' % git_dir, 'rev-parse', ref]).strip()
+
+  def testFetchRefspec(self):
+    self.assertEqual('+refs/heads/master:refs/heads/master',
+                     git_tools._FetchRefspec('refs/heads/master', True))
+    self.assertEqual('+refs/branch-heads/1:refs/remotes/branch-heads/1',
+                     git_tools._FetchRefspec('refs/remotes/branch-heads/1',
+                                             False))
+    self.assertEqual(None, git_tools._FetchRefspec('FETCH_HEAD', True))
+    self.assertEqual(None, git_tools._FetchRefspec('bleeding_edge', True))
+
+  def testScopedFetch(self):
+    self.Commit(10)
+    _Run(['branch', 'other'], self.repo)
+    mirror = self.Mirror()
+    other_tip = self._Tip(mirror, 'refs/heads/other')
+    _Run(['checkout', '-q', 'other'], self.repo)
+    self.Commit(11)
+    _Run(['checkout', '-q', 'master'], self.repo)
+    master_tip = self.Commit(12)
+
+    git_tools.Fetch(mirror, self.repo, True, 'refs/heads/master')
+    self.assertEqual(master_tip, self._Tip(mirror, 'refs/heads/master'))
+    self.assertEqual(other_tip, self._Tip(mirror, 'refs/heads/other'))
+
+    git_tools.FULL_FETCH = True
+    try:
+      git_tools.Fetch(mirror, self.repo, True, 'refs/heads/master')
+    finally:
+      git_tools.FULL_FETCH = False
+    self.assertEqual(self.hashes[11], self._Tip(mirror, 'refs/heads/other'))
+
+
+class PartialCloneTest(GitRepoTestCase):
+  def setUp(self):
+    GitRepoTestCase.setUp(self)
+    _Run(['config', 'uploadpack.allowfilter', 'true'], self.repo)
+    with open(os.path.join(self.repo, 'data'), 'w') as f:
+      f.write('data')
+    _Run(['add', 'data'], self.repo)
+    self.Commit(10)
+    self.url = 'file://' + os.path.abspath(self.repo)
+    git_tools.PARTIAL_CLONE_FILTER = 'blob:none'
+
+  def tearDown(self):
+    git_tools.PARTIAL_CLONE_FILTER = None
+    GitRepoTestCase.tearDown(self)
+
+  def _MissingObjects(self, mirror):
+    return subprocess.check_output(
+        ['git', '--git-dir=%s' % mirror, 'rev-list', '--objects', '--all',
+         '--missing=print']).count('?')
+
+  def testClone(self):
+    mirror = os.path.join(self.tmp_dir, 'mirror.git')
+    git_tools.Clone(self.url, mirror, True)
+    self.assertEqual(1, self._MissingObjects(mirror))
+    self.assertEqual(self.hashes[10],
+                     git_tools.Search(mirror, 10, True, 'refs/heads/master',
+                                      mode=git_tools.SEARCH_INDEX))
+
+  def testFetchConvertsFullMirror(self):
+    mirror = self.Mirror()
+    with open(os.path.join(self.repo, 'data'), 'w') as f:
+      f.write('new data')
+    _Run(['add', 'data'], self.repo)
+    self.Commit(11)
+    git_tools.Fetch(mirror, self.url, True, 'refs/heads/master')
+    self.assertEqual(1, self._MissingObjects(mirror))
+
+
+class CommitGraphTest(GitRepoTestCase):
+  def tearDown(self):
+    git_tools.WRITE_COMMIT_GRAPH = False
+    GitRepoTestCase.tearDown(self)
+
+  def testWrittenAfterClone(self):
+    self.Commit(10)
+    mirror = os.path.join(self.tmp_dir, 'mirror.git')
+    git_tools.WRITE_COMMIT_GRAPH = True
+    git_tools.Clone(self.repo, mirror, True)
+    git_tools.WaitForCommitGraphs()
+    self.assertTrue(git_tools._HasCommitGraph(mirror, True))
+
+  def testLookupDuringWrite(self):
+    # Lookups, and the index update they start with, don't wait for the
+    # commit-graph to be written.
+    self.Commit(10)
+    mirror = os.path.join(self.tmp_dir, 'mirror.git')
+    writing = threading.Event()
+    git = git_tools.Git
+    def _SlowGit(git_repo, args, *more_args, **kwargs):
+      if args[0] == 'commit-graph':
+        writing.set()
+        time.sleep(3)
+      return git(git_repo, args, *more_args, **kwargs)
+    git_tools.Git = _SlowGit
+    try:
+      git_tools.WRITE_COMMIT_GRAPH = True
+      git_tools.Clone(self.repo, mirror, True)
+      self.assertTrue(writing.wait(5))
+      start = time.time()
+      self.assertEqual(self.hashes[10],
+                       git_tools.Search(mirror, 10, True, 'refs/heads/master',
+                                        mode=git_tools.SEARCH_INDEX))
+      self.assertTrue(time.time() - start < 2)
+      git_tools.WaitForCommitGraphs()
+    finally:
+      git_tools.Git = git
+    self.assertTrue(git_tools._HasCommitGraph(mirror, True))
+
+  def testSkippedWhileWrittenElsewhere(self):
+    self.Commit(10)
+    mirror = os.path.join(self.tmp_dir, 'mirror.git')
+    git_tools.WRITE_COMMIT_GRAPH = True
+    with git_tools._TryLock(mirror + '.deps2git.graph.lock') as locked:
+      self.assertTrue(locked)
+      git_tools.Clone(self.repo, mirror, True)
+      git_tools.WaitForCommitGraphs()
+    self.assertFalse(git_tools._HasCommitGraph(mirror, True))
+
+  def testDisabled(self):
+    self.Commit(10)
+    mirror = os.path.join(self.tmp_dir, 'mirror.git')
+    git_tools.Clone(self.repo, mirror, True)
+    git_tools.WaitForCommitGraphs()
+    self.assertFalse(git_tools._HasCommitGraph(mirror, True))
+
+
+class RepoLockTest(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.mirror = os.path.join(self.tmp_dir, 'repos', 'mirror.git')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def _LockAndRecord(self, events, exclusive):
+    with git_tools.RepoLock(self.mirror, True, exclusive=exclusive):
+      events.append('locked')
+
+  def testExclusiveBlocksShared(self):
+    events = []
+    with git_tools.RepoLock(self.mirror, True, exclusive=True):
+      th = threading.Thread(target=self._LockAndRecord, args=(events, False))
+      th.start()
+      time.sleep(0.2)
+      events.append('released')
+    th.join()
+    self.assertEqual(['released', 'locked'], events)
+
+  def testSharedAllowsShared(self):
+    events = []
+    with git_tools.RepoLock(self.mirror, True):
+      th = threading.Thread(target=self._LockAndRecord, args=(events, False))
+      th.start()
+      th.join()
+      events.append('released')
+    self.assertEqual(['locked', 'released'], events)
+
+
+class SvnRevIndexTest(GitRepoTestCase):
+  def testLookup(self):
+    for svn_rev in (10, 20, 30):
+      self.Commit(svn_rev)
+    index = git_tools.SvnRevIndex(self.repo, False, 'master')
+    self.assertTrue(index.Update())
+    self.assertEqual((None, None), index.Lookup(9))
+    self.assertEqual((self.hashes[10], 10), index.Lookup(10))
+    self.assertEqual((self.hashes[20], 20), index.Lookup(29))
+    self.assertEqual((self.hashes[30], 30), index.Lookup(1000))
+
+  def testSkipsNonSvnCommits(self):
+    self.Commit(10)
+    self.Commit()
+    index = git_tools.SvnRevIndex(self.repo, False, 'master')
+    index.Update()
+    self.assertEqual([10], index.revs)
+
+  def testIncrementalUpdate(self):
+    self.Commit(10)
+    index = git_tools.SvnRevIndex(self.repo, False, 'master')
+    index.Update()
+    self.assertFalse(index.Update())
+    self.Commit(20)
+    tip = self.Commit(30)
+
+    # A fresh object reloads the index from disk and only walks new commits.
+    index = git_tools.SvnRevIndex(self.repo, False, 'master')
+    self.assertEqual([10], index.revs)
+    self.assertTrue(index.Update())
+    self.assertEqual(tip, index.tip)
+    self.assertEqual([10, 20, 30], index.revs)
+    self.assertEqual((self.hashes[20], 20), index.Lookup(25))
+
+  def testNonMonotoneHistory(self):
+    self.Commit(10)
+    self.Commit(30)
+    index = git_tools.SvnRevIndex(self.repo, False, 'master')
+    index.Update()
+    self.Commit(20)
+    # Updated incrementally, and built from scratch.
+    for index in (index, git_tools.SvnRevIndex(self.repo, False,
+                                               'refs/heads/master')):
+      index.Update()
+      self.assertEqual([10, 30, 20], index.revs)
+      self.assertEqual((self.hashes[10], 10), index.Lookup(15))
+      self.assertEqual((self.hashes[20], 20), index.Lookup(25))
+      self.assertEqual((self.hashes[20], 20), index.Lookup(35))
+      self.assertEqual((self.hashes[30], 30), index.Lookup(30, exact=True))
+      self.assertEqual((None, None), index.Lookup(25, exact=True))
+    # The index finds the same commits as 'git log --grep'.
+    for svn_rev in (15, 25, 30, 35):
+      self.assertEqual(
+          git_tools.Search(self.repo, svn_rev, False, 'master',
+                           mode=git_tools.SEARCH_REGEX),
+          git_tools.Search(self.repo, svn_rev, False, 'master',
+                           mode=git_tools.SEARCH_INDEX))
+    self.assertEqual(self.hashes[30], git_tools.SearchExact(
+        self.repo, 30, False, 'master', mode=git_tools.SEARCH_INDEX))
+
+  def testRewrittenHistory(self):
+    self.Commit(10)
+    self.Commit(20)
+    index = git_tools.SvnRevIndex(self.repo, False, 'master')
+    index.Update()
+    _Run(['reset', '-q', '--hard', 'HEAD~1'], self.repo)
+    self.Commit(15)
+    index.Update()
+    self.assertEqual([10, 15], index.revs)
+
+
+class CatFileBatchTest(GitRepoTestCase):
+  def testRead(self):
+    git_hash = self.Commit(10)
+    cat_file = git_tools.CatFileBatch(self.repo, False)
+    try:
+      found_hash, object_type, contents = cat_file.Read('master^{commit}')
+      self.assertEqual(git_hash, found_hash)
+      self.assertEqual('commit', object_type)
+      self.assertTrue(contents.endswith('@10 %s\n' % SVN_UUID))
+      self.assertRaises(git_tools.AbnormalExit, cat_file.Read, 'no-such-ref')
+
+      # The process is restarted after Close() and sees new commits.
+      cat_file.Close()
+      git_hash = self.Commit(20)
+      self.assertEqual(git_hash, cat_file.Read('master')[0])
+    finally:
+      cat_file.Close()
+
+
+class SearchTest(GitRepoTestCase):
+  def setUp(self):
+    GitRepoTestCase.setUp(self)
+    for svn_rev in (5, 8, 13, 21, 34):
+      self.Commit(svn_rev)
+    self.mirror = self.Mirror()
+
+  def testModesAgree(self):
+    for svn_rev in (5, 6, 12, 13, 33, 34, 100):
+      results = [git_tools.Search(self.mirror, svn_rev, True,
+                                  'refs/heads/master', mode=mode)
+                 for mode in git_tools.SEARCH_MODES]
+      self.assertEqual([results[0]] * len(results), results)
+
+  def testExact(self):
+    for mode in git_tools.SEARCH_MODES:
+      self.assertEqual(
+          self.hashes[13],
+          git_tools.SearchExact(self.mirror, 13, True, 'refs/heads/master',
+                                mode=mode))
+      self.assertRaises(git_tools.SearchError, git_tools.SearchExact,
+                        self.mirror, 14, True, 'refs/heads/master', mode=mode)
+
+  def testNotFound(self):
+    for mode in git_tools.SEARCH_MODES:
+      self.assertRaises(git_tools.SearchError, git_tools.Search,
+                        self.mirror, 4, True, 'refs/heads/master', mode=mode)
+
+  def testBisectFallback(self):
+    # Commits without a git-svn-id, or merges, can't be bisected.
+    self.Commit()
+    shutil.rmtree(self.mirror)
+    mirror = self.Mirror()
+    self.assertEqual(None, git_tools._ResolveByBisect(
+        mirror, [100], True, 'refs/heads/master'))
+    self.assertEqual(self.hashes[34],
+                     git_tools.Search(mirror, 100, True, 'refs/heads/master',
+                                      mode=git_tools.SEARCH_BISECT))
+
+  def testBisectMerge(self):
+    _Run(['checkout', '-q', '-b', 'side', 'HEAD~2'], self.repo)
+    self.Commit(25)
+    _Run(['checkout', '-q', 'master'], self.repo)
+    _Run(['merge', '-q', '--no-ff', '-m', 'Merge\n\ngit-svn-id: %s@40 %s' %
+          (SVN_URL, SVN_UUID), 'side'], self.repo)
+    shutil.rmtree(self.mirror)
+    mirror = self.Mirror()
+    self.assertEqual(None, git_tools._ResolveByBisect(
+        mirror, [30], True, 'refs/heads/master'))
+    self.assertEqual(
+        git_tools.Search(mirror, 30, True, 'refs/heads/master',
+                         mode=git_tools.SEARCH_REGEX),
+        git_tools.Search(mirror, 30, True, 'refs/heads/master',
+                         mode=git_tools.SEARCH_BISECT))
+
+  def testBisectOutOfOrder(self):
+    self.assertEqual({20: (self.hashes[13], 13)}, git_tools._ResolveByBisect(
+        self.mirror, [20], True, 'refs/heads/master'))
+    # Revisions going back up are caught even though the bisection itself
+    # wouldn't probe the commits out of order.
+    self.Commit(30)
+    _Run(['fetch', '-q', self.repo, '+refs/heads/master:refs/heads/master'],
+         self.mirror)
+    git_tools.CloseCatFiles()
+    self.assertEqual(None, git_tools._ResolveByBisect(
+        self.mirror, [32], True, 'refs/heads/master'))
+    self.assertEqual(self.hashes[30],
+                     git_tools.Search(self.mirror, 32, True,
+                                      'refs/heads/master',
+                                      mode=git_tools.SEARCH_BISECT))
+    self.assertEqual(self.hashes[30], git_tools.SearchBatch(
+        self.mirror, [(32, 'refs/heads/master')], True,
+        mode=git_tools.SEARCH_BISECT)[(32, 'refs/heads/master')].git_hash)
+
+  def testBatch(self):
+    requests = [('4', 'refs/heads/master'), ('13', 'refs/heads/master'),
+                ('20', 'refs/heads/master'), ('99', 'refs/heads/master'),
+                ('20', 'refs/branch-heads/gone')]
+    for mode in git_tools.SEARCH_MODES:
+      results = git_tools.SearchBatch(self.mirror, requests, True, mode=mode)
+      self.assertTrue(isinstance(results[requests[0]], git_tools.SearchError))
+      self.assertEqual((self.hashes[13], 13, 34), results[requests[1]])
+      self.assertEqual((self.hashes[13], 13, 34), results[requests[2]])
+      self.assertEqual((self.hashes[34], 34, 34), results[requests[3]])
+      # A missing refspec only fails its own requests.
+      self.assertTrue(isinstance(results[requests[4]], git_tools.SearchError))
+
+
+if __name__ == '__main__':
+  unittest.main()
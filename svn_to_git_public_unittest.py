@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import re
+import StringIO
+import sys
+import unittest
+
+import svn_to_git_public
+from svn_to_git_public import BLINK_TRUNK_PUBLIC_RE, BLINK_TRUNK_RE, GIT_HOST
+
+
+def _LegacySvnUrlToGitUrl(path, svn_url):
+  """The chain of tests svn_to_git_public.RULES was written from."""
+
+  match = re.match(
+      '(https?://src.chromium.org/svn|svn://svn.chromium.org/chrome)(/.*)',
+      svn_url)
+  if match:
+    svn_url = match.group(2)
+
+  # A few special cases.
+  if re.match('^https?://sctp-refimpl.googlecode.com/svn/' +
+              'trunk/KERN/usrsctp/usrsctplib$', svn_url):
+    return (path, GIT_HOST + 'external/usrsctplib.git', GIT_HOST)
+
+  if svn_url == '/trunk/deps/page_cycler/acid3':
+    return (path, GIT_HOST + 'chromium/deps/acid3.git', GIT_HOST)
+
+  if svn_url == '/trunk/deps/canvas_bench':
+    return (path, GIT_HOST + 'chromium/canvas_bench.git', GIT_HOST)
+
+  if svn_url == '/trunk/deps/gpu/software_rendering_list':
+    return (path, GIT_HOST + 'chromium/deps/gpu/software_rendering_list.git',
+            GIT_HOST)
+
+  if svn_url == '/trunk/tools/third_party/python_26':
+    return (path, GIT_HOST + 'chromium/deps/python_26.git', GIT_HOST)
+
+  if svn_url == '/trunk/deps/support':
+    return (path, GIT_HOST + 'chromium/support.git', GIT_HOST)
+
+  if svn_url == '/trunk/deps/frame_rate/content':
+    return (path, GIT_HOST + 'chromium/frame_rate/content.git', GIT_HOST)
+
+  if svn_url == 'svn://svn.chromium.org/boto':
+    return (path, GIT_HOST + 'external/boto.git', GIT_HOST)
+
+  if svn_url == 'svn://svn.chromium.org/gsutil/trunk/src':
+    return (path, GIT_HOST + 'external/gsutil/src.git', GIT_HOST)
+
+  if svn_url == 'svn://svn.chromium.org/jsoncpp/trunk/jsoncpp':
+    return (path, GIT_HOST + 'external/jsoncpp/jsoncpp.git', GIT_HOST)
+
+  if svn_url == '/trunk/deps/cdm':
+    return (path, GIT_HOST + 'chromium/cdm.git', GIT_HOST)
+
+  # TODO(niklase) Remove after landing https://codereview.chromium.org/86563002
+  if re.match('^https?://webrtc.googlecode.com/svn/stable/webrtc$', svn_url):
+    return (path, GIT_HOST + 'external/webrtc/stable/webrtc.git', GIT_HOST)
+
+  # TODO(niklase) Remove after landing https://codereview.chromium.org/86563002
+  if re.match('^https?://webrtc.googlecode.com/svn/stable/talk$', svn_url):
+    return (path, GIT_HOST + 'external/webrtc/stable/talk.git', GIT_HOST)
+
+  # TODO(niklase) Remove after landing https://codereview.chromium.org/86563002
+  if re.match('^https?://webrtc.googlecode.com/svn/stable/src$', svn_url):
+    return (path, GIT_HOST + 'external/webrtc/stable/src.git', GIT_HOST)
+
+  # webrtc 'trunk/src' mirror was created without 'trunk' in the name, unlike
+  # the other ones which are matched next.
+  match = re.match('^https?://webrtc.googlecode.com/svn/trunk/src', svn_url)
+  if match:
+    return (path, GIT_HOST + 'external/webrtc/src.git', GIT_HOST)
+
+  # webrtc 'trunk' mappings for everything but 'trunk/src'.
+  match = re.match('^https?://webrtc.googlecode.com/svn/trunk/(.*)', svn_url)
+  if match:
+    repo = '%s.git' % match.group(1)
+    return (path, GIT_HOST + 'external/webrtc/trunk/%s' % repo, GIT_HOST)
+
+  if re.match('^https?://webrtc.googlecode.com/svn/deps/third_party/openmax$',
+              svn_url):
+    return (path, GIT_HOST + 'external/webrtc/deps/third_party/openmax.git',
+            GIT_HOST)
+
+  if svn_url in ('http://selenium.googlecode.com/svn/trunk/py/test',
+                 'https://selenium.googlecode.com/svn/trunk/py/test',
+                 '/trunk/deps/reference_builds/chrome'):
+    # Those can't be git svn cloned. Skipping for now.
+    return
+
+  # Projects on sourceforge using trunk
+  match = re.match('^https?://svn.code.sf.net/p/(.*)/code/trunk(.*)',
+                   svn_url)
+  if match:
+    repo = '%s%s.git' % (match.group(1), match.group(2))
+    return (path, GIT_HOST + 'external/%s' % repo, GIT_HOST)
+
+  # Fallback for old sourceforge URL.
+  match = re.match('^https?://(.*).svn.sourceforge.net/svnroot/(.*)/trunk(.*)',
+                   svn_url)
+  if match:
+    repo = '%s%s.git' % (match.group(2), match.group(3))
+    return (path, GIT_HOST + 'external/%s' % repo, GIT_HOST)
+
+  # Subdirectories of libaddressinput
+  if re.match('^https?://libaddressinput.googlecode.com/svn/trunk', svn_url):
+    if 'libaddressinput' in path:
+      path = path[:path.index('libaddressinput')] + 'libaddressinput/src'
+    return (path, GIT_HOST + 'external/libaddressinput.git', GIT_HOST)
+
+  # Projects on googlecode.com using trunk.
+  match = re.match('^https?://(.*).googlecode.com/svn/trunk(.*)', svn_url)
+  if match:
+    repo = '%s%s.git' % (match.group(1), match.group(2))
+    return (path, GIT_HOST + 'external/%s' % repo, GIT_HOST)
+
+  # Projects on googlecode.com using branches.
+  # Branches should be automatically included in the projects corresponding
+  # 'trunk' mirror as 'branch-heads' refspecs.
+  # This makes some broad assumptions about a "standard" branch layout , i.e.:
+  #   svn/branches/<branch_name>/<optional_sub_path>
+  # This layout can't really be enforced, though it appears to apply to most
+  # repos. Outliers will have to be special-cased.
+  match = re.match('^https?://(.*).googlecode.com/svn/branches/([^/]+)(.*)',
+                   svn_url)
+  if match:
+    repo = '%s%s.git' % (match.group(1), match.group(3))
+    branch_name = match.group(2)
+    return (path, GIT_HOST + 'external/%s' % repo, GIT_HOST, branch_name)
+
+  # Projects that are subdirectories of the native_client repository.
+  match = re.match('^https?://src.chromium.org/native_client/trunk/(.*)',
+                   svn_url)
+  if match:
+    repo = '%s.git' % match.group(1)
+    return (path, GIT_HOST + 'native_client/%s' % repo, GIT_HOST)
+
+  # Projects that are subdirectories of the chromium/{src,tools} repository.
+  match = re.match('/trunk/((src|tools)/.*)', svn_url)
+  if match:
+    repo = '%s.git' % match.group(1)
+    return (path, GIT_HOST + 'chromium/%s' % repo, GIT_HOST)
+
+  # Public-header-only blink directory for iOS.
+  if BLINK_TRUNK_PUBLIC_RE.match(svn_url):
+    return (path, GIT_HOST + 'chromium/blink-public.git', GIT_HOST)
+
+  # Main blink directory.
+  if BLINK_TRUNK_RE.match(svn_url):
+    return (path, GIT_HOST + 'chromium/blink.git', GIT_HOST)
+
+  # llvm project (and possible subdirectory) repos.
+  match = re.match('^https?://src.chromium.org/llvm-project/([^/]*)/trunk(.*)',
+                   svn_url)
+  if match:
+    repo = '%s.git' % ''.join(match.groups())
+    return (path, GIT_HOST + 'chromium/llvm-project/%s' % repo, GIT_HOST)
+
+  # Minimal header-only webkit directories for iOS. At some point after the
+  # transition to the blink repo, these were replaced by the
+  # BLINK_TRUNK_PUBLIC_RE entries above.
+  if svn_url in ['http://svn.webkit.org/repository/webkit/trunk/Source/'
+                 'WebKit/chromium/public',
+                 'http://src.chromium.org/blink/trunk/Source/'
+                 'WebKit/chromium/public'
+                 ]:
+    return (path,
+            GIT_HOST + 'external/WebKit/Source/WebKit/chromium/public.git',
+            GIT_HOST)
+  if svn_url in ['http://svn.webkit.org/repository/webkit/trunk/Source/'
+                 'Platform/chromium/public',
+                 'http://src.chromium.org/blink/trunk/Source/'
+                 'Platform/chromium/public'
+                 ]:
+    return (path,
+            GIT_HOST + 'external/WebKit/Source/Platform/chromium/public.git',
+            GIT_HOST)
+
+  # Ignore all webkit directories (other than the above), since we fetch the
+  # whole thing directly for all but iOS.
+  if svn_url == '/trunk/deps/third_party/WebKit':
+    return
+
+  # blink
+
+  # Subdirectories of the chromium deps/third_party directory.
+  match = re.match('/trunk/deps/third_party/(.*)', svn_url)
+  if match:
+    repo = '%s.git' % match.group(1)
+    return (path, GIT_HOST + 'chromium/deps/%s' % repo, GIT_HOST)
+
+  # Subdirectories of the chromium deps/reference_builds directory.
+  match = re.match('/trunk/deps/reference_builds/(.*)', svn_url)
+  if match:
+    repo = '%s.git' % match.group(1)
+    return (path, GIT_HOST + 'chromium/reference_builds/%s' % repo, GIT_HOST)
+
+  # Nothing yet? Oops.
+  print 'No match for %s' % svn_url
+
+
+# SVN URLs found in Chromium DEPS files, with the paths they were checked out
+# at.
+DEPS_URLS = [
+    ('src/breakpad/src', '/trunk/deps/third_party/breakpad/src'),
+    ('src/googleurl', 'http://google-url.googlecode.com/svn/trunk'),
+    ('src/sdch/open-vcdiff', 'http://open-vcdiff.googlecode.com/svn/trunk'),
+    ('src/testing/gtest', 'http://googletest.googlecode.com/svn/trunk'),
+    ('src/testing/gmock', 'http://googlemock.googlecode.com/svn/trunk'),
+    ('src/third_party/angle', 'http://angleproject.googlecode.com/svn/trunk'),
+    ('src/third_party/angle_dx11',
+     'https://angleproject.googlecode.com/svn/branches/dx11proto'),
+    ('src/third_party/trace-viewer',
+     'http://trace-viewer.googlecode.com/svn/trunk'),
+    ('src/third_party/WebKit', '/trunk/deps/third_party/WebKit'),
+    ('src/third_party/WebKit', 'http://src.chromium.org/blink/trunk'),
+    ('src/third_party/WebKit', 'https://src.chromium.org/blink/trunk'),
+    ('src/third_party/WebKit/public',
+     'http://src.chromium.org/blink/trunk/public'),
+    ('src/third_party/WebKit/Source/WebKit/chromium/public',
+     'http://svn.webkit.org/repository/webkit/trunk/Source/'
+     'WebKit/chromium/public'),
+    ('src/third_party/WebKit/Source/WebKit/chromium/public',
+     'http://src.chromium.org/blink/trunk/Source/WebKit/chromium/public'),
+    ('src/third_party/WebKit/Source/Platform/chromium/public',
+     'http://svn.webkit.org/repository/webkit/trunk/Source/'
+     'Platform/chromium/public'),
+    ('src/third_party/WebKit/Source/Platform/chromium/public',
+     'http://src.chromium.org/blink/trunk/Source/Platform/chromium/public'),
+    ('src/third_party/WebKit/LayoutTests',
+     'http://src.chromium.org/blink/trunk/LayoutTests'),
+    ('src/third_party/icu', '/trunk/deps/third_party/icu46'),
+    ('src/third_party/libjingle/source',
+     'http://libjingle.googlecode.com/svn/trunk'),
+    ('src/third_party/libjingle/source/talk',
+     'http://webrtc.googlecode.com/svn/trunk/talk'),
+    ('src/third_party/webrtc', 'http://webrtc.googlecode.com/svn/trunk/webrtc'),
+    ('src/third_party/webrtc',
+     'http://webrtc.googlecode.com/svn/stable/webrtc'),
+    ('src/third_party/libjingle/source/talk',
+     'http://webrtc.googlecode.com/svn/stable/talk'),
+    ('src/third_party/webrtc', 'http://webrtc.googlecode.com/svn/stable/src'),
+    ('src/third_party/webrtc', 'http://webrtc.googlecode.com/svn/trunk/src'),
+    ('src/third_party/webrtc/src/third_party',
+     'http://webrtc.googlecode.com/svn/trunk/src/third_party'),
+    ('src/third_party/openmax',
+     'http://webrtc.googlecode.com/svn/deps/third_party/openmax'),
+    ('src/third_party/openmax',
+     'http://webrtc.googlecode.com/svn/deps/third_party/openmax/foo'),
+    ('src/third_party/usrsctp/usrsctplib',
+     'https://sctp-refimpl.googlecode.com/svn/trunk/KERN/usrsctp/usrsctplib'),
+    ('src/third_party/usrsctp/usrsctplib',
+     'http://sctp-refimpl.googlecode.com/svn/trunk/KERN/usrsctp/usrsctplib'),
+    ('src/third_party/libaddressinput',
+     'http://libaddressinput.googlecode.com/svn/trunk'),
+    ('src/third_party/libaddressinput/chromium/cpp',
+     'https://libaddressinput.googlecode.com/svn/trunk/cpp'),
+    ('src/third_party/libaddressinput/src/testdata',
+     'http://libaddressinput.googlecode.com/svn/trunk/testdata'),
+    ('src/third/party/other',
+     'http://libaddressinput.googlecode.com/svn/trunk/cpp'),
+    ('src/third_party/pyftpdlib/src',
+     'http://pyftpdlib.googlecode.com/svn/trunk'),
+    ('src/third_party/pywebsocket/src',
+     'http://pywebsocket.googlecode.com/svn/trunk/src'),
+    ('src/third_party/smhasher/src',
+     'http://smhasher.googlecode.com/svn/trunk'),
+    ('src/third_party/snappy/src', 'http://snappy.googlecode.com/svn/trunk'),
+    ('src/third_party/ots', 'http://ots.googlecode.com/svn/trunk'),
+    ('src/third_party/leveldatabase/src',
+     'http://leveldb.googlecode.com/svn/trunk'),
+    ('src/third_party/jsoncpp/source/include',
+     'http://jsoncpp.svn.sourceforge.net/svnroot/jsoncpp/trunk/jsoncpp/'
+     'include'),
+    ('src/third_party/jsoncpp/source/src/lib_json',
+     'http://svn.code.sf.net/p/jsoncpp/code/trunk/jsoncpp/src/lib_json'),
+    ('src/third_party/jsoncpp/source', 'http://svn.code.sf.net/p/jsoncpp/code'),
+    ('src/third_party/jsoncpp/source',
+     'svn://svn.chromium.org/jsoncpp/trunk/jsoncpp'),
+    ('src/third_party/skia/src', 'http://skia.googlecode.com/svn/trunk/src'),
+    ('src/third_party/skia/include',
+     'http://skia.googlecode.com/svn/trunk/include'),
+    ('src/third_party/skia/gyp',
+     'https://skia.googlecode.com/svn/branches/m33/gyp'),
+    ('src/third_party/skia', 'https://skia.googlecode.com/svn/branches/m34'),
+    ('src/third_party/skia', 'https://skia.googlecode.com/svn/branches/m34/'),
+    ('src/third_party/v8', 'http://v8.googlecode.com/svn/trunk'),
+    ('src/v8', 'http://v8.googlecode.com/svn/branches/bleeding_edge'),
+    ('src/v8', 'https://v8.googlecode.com/svn/branches/3.22'),
+    ('src/v8/test/test262/data',
+     'http://test262.googlecode.com/svn/trunk/test/suite'),
+    ('src/native_client', 'http://src.chromium.org/native_client/trunk/src/'
+     'native_client'),
+    ('src/native_client_sdk/src/libraries/third_party/naclports',
+     'https://src.chromium.org/native_client/trunk/src/third_party/naclports'),
+    ('src/third_party/llvm', 'http://src.chromium.org/llvm-project/llvm/trunk'),
+    ('src/third_party/llvm/tools/clang',
+     'http://src.chromium.org/llvm-project/cfe/trunk'),
+    ('src/third_party/llvm/projects/compiler-rt',
+     'https://src.chromium.org/llvm-project/compiler-rt/trunk/lib'),
+    ('src/third_party/llvm', 'http://src.chromium.org/llvm-project/llvm'),
+    ('src/third_party/gsutil', 'svn://svn.chromium.org/gsutil/trunk/src'),
+    ('src/third_party/gsutil/boto', 'svn://svn.chromium.org/boto'),
+    ('src/third_party/gsutil/boto', 'svn://svn.chromium.org/boto/trunk'),
+    ('src/third_party/cros_dbus_cplusplus/source',
+     '/trunk/deps/third_party/cros_dbus_cplusplus'),
+    ('src/third_party/ffmpeg', '/trunk/deps/third_party/ffmpeg'),
+    ('src/third_party/hunspell', '/trunk/deps/third_party/hunspell'),
+    ('src/third_party/hunspell_dictionaries',
+     '/trunk/deps/third_party/hunspell_dictionaries'),
+    ('src/third_party/libvpx', '/trunk/deps/third_party/libvpx'),
+    ('src/third_party/nss', '/trunk/deps/third_party/nss'),
+    ('src/third_party/openssl', '/trunk/deps/third_party/openssl'),
+    ('src/third_party/yasm/source/patched-yasm',
+     '/trunk/deps/third_party/yasm/patched-yasm'),
+    ('src/chrome/tools/test/reference_build/chrome_linux',
+     '/trunk/deps/reference_builds/chrome_linux'),
+    ('src/chrome/tools/test/reference_build/chrome_mac',
+     '/trunk/deps/reference_builds/chrome_mac'),
+    ('src/chrome/tools/test/reference_build/chrome',
+     '/trunk/deps/reference_builds/chrome'),
+    ('src/chrome/test/data/perf/canvas_bench', '/trunk/deps/canvas_bench'),
+    ('src/chrome/test/data/perf/frame_rate/content',
+     '/trunk/deps/frame_rate/content'),
+    ('src/third_party/acid3', '/trunk/deps/page_cycler/acid3'),
+    ('src/third_party/gpu/software_rendering_list',
+     '/trunk/deps/gpu/software_rendering_list'),
+    ('src/third_party/python_26', '/trunk/tools/third_party/python_26'),
+    ('src/third_party/support', '/trunk/deps/support'),
+    ('src/third_party/cdm', '/trunk/deps/cdm'),
+    ('src/tools/gyp', 'http://gyp.googlecode.com/svn/trunk'),
+    ('src/tools/page_cycler/acid3', '/trunk/deps/page_cycler/acid3'),
+    ('src/tools/deps2git', '/trunk/tools/deps2git'),
+    ('src/tools/swarm_client', '/trunk/tools/swarm_client'),
+    ('src/third_party/WebKit/Tools/Scripts', '/trunk/src/third_party/WebKit'),
+    ('src/chrome/test/data/perf/third_party/octane',
+     'http://octane-benchmark.googlecode.com/svn/trunk'),
+    ('src/third_party/webdriver/pylib',
+     'http://selenium.googlecode.com/svn/trunk/py'),
+    ('src/third_party/webdriver/pylib/test',
+     'http://selenium.googlecode.com/svn/trunk/py/test'),
+    ('src/third_party/webdriver/pylib/test',
+     'https://selenium.googlecode.com/svn/trunk/py/test'),
+    ('src/third_party/mozc', 'http://mozc.googlecode.com/svn/trunk/src'),
+    ('src/third_party/opus/src', '/trunk/deps/third_party/opus'),
+    ('src/third_party/bidichecker',
+     'http://bidichecker.googlecode.com/svn/trunk/lib'),
+    ('src/third_party/lss',
+     'http://linux-syscall-support.googlecode.com/svn/trunk/lss'),
+    ('src/third_party/mesa/src', '/trunk/deps/third_party/mesa/src'),
+    ('src/third_party/swig/Lib', '/trunk/deps/third_party/swig/Lib'),
+    ('src/third_party/GTM',
+     'http://google-toolbox-for-mac.googlecode.com/svn/trunk'),
+    ('src/third_party/ocmock',
+     'http://ocmock.googlecode.com/svn/trunk/Source'),
+    ('src/third_party/pdfsqueeze',
+     'http://pdfsqueeze.googlecode.com/svn/trunk'),
+    # Not mapped at all.
+    ('src/third_party/foo', 'http://svn.example.com/svn/trunk/foo'),
+    ('src/third_party/foo', '/branches/1750/src/third_party/foo'),
+    ('src/third_party/foo', 'http://foo.googlecode.com/svn/tags/1.0'),
+    ('src/third_party/foo', 'svn://svn.chromium.org/other'),
+    ('src/third_party/foo', 'http://src.chromium.org/blink/branches/1750'),
+    ('src/third_party/foo', 'git://github.com/foo/bar.git'),
+    ('src/third_party/foo', 'trunk/deps/third_party/foo'),
+    ('src/third_party/foo', ''),
+    # Only the literal hosts of the rules match.
+    ('src/third_party/foo', 'http://srcXchromium.org/blink/trunk'),
+    ('src/third_party/foo', 'http://src.chromium.org:80/blink/trunk'),
+    ('src/third_party/foo', 'http://user@webrtc.googlecode.com/svn/trunk/src'),
+]
+
+# Prefixes the SVN URLs of the main Chromium repository are written with.
+SVN_PREFIXES = [
+    'http://src.chromium.org/svn',
+    'https://src.chromium.org/svn',
+    'svn://svn.chromium.org/chrome',
+]
+
+
+def _Corpus():
+  for path, url in DEPS_URLS:
+    yield path, url
+    if url.startswith('/'):
+      for prefix in SVN_PREFIXES:
+        yield path, prefix + url
+    elif url.startswith('http://'):
+      yield path, 'https://' + url[len('http://'):]
+    if url:
+      yield path, url + '/'
+      yield path, url + '/sub/dir'
+
+
+def _Call(function, path, url):
+  """Return what function returned and printed."""
+  stdout = sys.stdout
+  sys.stdout = StringIO.StringIO()
+  try:
+    return function(path, url), sys.stdout.getvalue()
+  finally:
+    sys.stdout = stdout
+
+
+class SvnUrlToGitUrlTest(unittest.TestCase):
+  def testEquivalence(self):
+    corpus = list(_Corpus())
+    self.assertTrue(len(corpus) > 400)
+    for path, url in corpus:
+      self.assertEqual(_Call(_LegacySvnUrlToGitUrl, path, url),
+                       _Call(svn_to_git_public.SvnUrlToGitUrl, path, url),
+                       url)
+
+  def testBranch(self):
+    self.assertEqual(
+        ('src/v8', GIT_HOST + 'external/v8.git', GIT_HOST, '3.22'),
+        svn_to_git_public.SvnUrlToGitUrl(
+            'src/v8', 'https://v8.googlecode.com/svn/branches/3.22'))
+
+
+if __name__ == '__main__':
+  unittest.main()
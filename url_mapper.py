@@ -0,0 +1,225 @@
+#!/usr/bin/python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Memoizes the mapping of SVN URLs to Git URLs by a chain of rules modules.
+
+The rules modules (svn_to_git_public, buildspec_to_git, --extra-rules files)
+map a (path, svn_url) pair the same way every time, so a mapping only needs
+to be computed once per run, or once per version of the rules if it is kept
+in the conversion cache."""
+
+import collections
+import errno
+import hashlib
+import imp
+import marshal
+import os
+import sys
+import tempfile
+import threading
+
+import url_rules
+
+
+# Default number of mappings kept in memory.
+DEFAULT_MAX_ENTRIES = 10000
+
+# Directory of the compiled rules modules, inside the cache or repos
+# directory.
+COMPILED_RULES_DIR = 'deps2git-rules'
+
+
+def _ReadCompiled(compiled_path, stat):
+  """Return the code cached in compiled_path if it is still current."""
+  try:
+    with open(compiled_path, 'rb') as f:
+      if marshal.load(f) != (imp.get_magic(), stat.st_mtime, stat.st_size):
+        return None
+      return marshal.load(f)
+  except (IOError, EOFError, ValueError, TypeError):
+    return None
+
+
+def _WriteCompiled(compiled_path, stat, code):
+  compiled_dir = os.path.dirname(compiled_path)
+  try:
+    os.makedirs(compiled_dir)
+  except OSError as e:
+    if e.errno != errno.EEXIST:
+      raise
+  # Write to a temporary file first, so concurrent runs never read a partial
+  # one.
+  fd, tmp_path = tempfile.mkstemp(dir=compiled_dir)
+  with os.fdopen(fd, 'wb') as f:
+    marshal.dump((imp.get_magic(), stat.st_mtime, stat.st_size), f)
+    marshal.dump(code, f)
+  os.rename(tmp_path, compiled_path)
+
+
+def LoadRulesModule(path, compiled_dir=None):
+  """Load the rules module in path.
+
+  If compiled_dir is given, the compiled module is kept there and reused
+  until the mtime or size of path changes.  Like __import__, this adds the
+  directory of path to sys.path, so the module can import its neighbours."""
+  path = os.path.abspath(path)
+  name = os.path.splitext(os.path.basename(path))[0]
+  module = sys.modules.get(name)
+  if module and _SourceFile(module) and (
+      os.path.abspath(_SourceFile(module)) == path):
+    return module
+
+  stat = os.stat(path)
+  code = compiled_path = None
+  if compiled_dir:
+    compiled_path = os.path.join(compiled_dir, '%s-%s.pyc' % (
+        name, hashlib.sha1(path).hexdigest()[:16]))
+    code = _ReadCompiled(compiled_path, stat)
+  if code is None:
+    with open(path, 'rU') as f:
+      code = compile(f.read(), path, 'exec')
+    if compiled_path:
+      _WriteCompiled(compiled_path, stat, code)
+
+  rules_dir = os.path.dirname(path)
+  if rules_dir not in sys.path:
+    sys.path.insert(0, rules_dir)
+  module = imp.new_module(name)
+  module.__file__ = path
+  sys.modules[name] = module
+  exec code in module.__dict__
+  return module
+
+
+def _SourceFile(module):
+  path = getattr(module, '__file__', None)
+  if path and os.path.splitext(path)[1] in ('.pyc', '.pyo'):
+    path = path[:-1]
+  return path
+
+
+def Fingerprint(modules):
+  """Return a digest of the source of modules, or None if one has no source.
+
+  url_rules is always included, since rule tables depend on it."""
+  digest = hashlib.sha1()
+  for module in list(modules) + [url_rules]:
+    path = _SourceFile(module)
+    if not path or not os.path.isfile(path):
+      return None
+    with open(path, 'rb') as f:
+      source = f.read()
+    digest.update('%s %d\n' % (module.__name__, len(source)))
+    digest.update(source)
+  return digest.hexdigest()
+
+
+def _Segments(converters):
+  """Return a (table, converter) pair for each step of the converter chain.
+
+  table is a RuleTable merging the RULES of consecutive converters, or None
+  if converter has to be called instead."""
+  def _Strip(table):
+    return table.strip and table.strip.pattern
+  segments = []
+  tables = []
+  for converter in converters:
+    table = getattr(converter, 'RULES', None)
+    if not isinstance(table, url_rules.RuleTable):
+      table = None
+    if table and (not tables or _Strip(table) == _Strip(tables[0])):
+      tables.append(table)
+      continue
+    if tables:
+      segments.append((url_rules.Merge(tables), None))
+      tables = []
+    if table:
+      tables.append(table)
+    else:
+      segments.append((None, converter))
+  if tables:
+    segments.append((url_rules.Merge(tables), None))
+  return segments
+
+
+class UrlMapper(object):
+  """Maps SVN URLs to Git URLs with the first of converters that can.
+
+  Mappings are kept in a bounded LRU memo.  If conv_cache, a
+  conversion_cache.ConversionCache, is given, the memo starts with the
+  mappings that earlier runs saved there with the same rules, and Flush()
+  saves the ones used by this run.
+
+  Rules modules whose mapping depends on what their CleanDeps() found about
+  a DEPS return it as a context, a namedtuple of strings, which Map() passes
+  on to their SvnUrlToGitUrl(); contexts are part of the memo key.
+
+  Consecutive converters that expose their rules as a url_rules.RuleTable
+  named RULES are merged into a single index, so adding more of them
+  doesn't add to the cost of a lookup."""
+
+  def __init__(self, converters, max_entries=DEFAULT_MAX_ENTRIES,
+               conv_cache=None):
+    self.converters = list(converters)
+    self._segments = _Segments(self.converters)
+    self.max_entries = max_entries
+    self.conv_cache = conv_cache
+    self.fingerprint = Fingerprint(self.converters)
+    self.hits = 0
+    self.misses = 0
+    self._lock = threading.Lock()
+    self._memo = collections.OrderedDict()
+    self._used = set()
+    if conv_cache and self.fingerprint:
+      for key, converted_data in conv_cache.GetUrlMappings(
+          self.fingerprint, max_entries).iteritems():
+        self._memo[key] = converted_data
+
+  def Map(self, path, svn_url, contexts=None):
+    """Return what the first converter matching svn_url returned.
+
+    That is a (path, git_url, git_host[, svn_branch]) tuple, or None if no
+    converter matches svn_url.  contexts maps converters to the context
+    their CleanDeps() returned for the DEPS svn_url is from, if any."""
+    contexts = contexts or {}
+    key = (path, svn_url,
+           tuple(contexts.get(converter) for converter in self.converters))
+    with self._lock:
+      if key in self._memo:
+        self.hits += 1
+        converted_data = self._memo.pop(key)
+        self._memo[key] = converted_data
+        self._used.add(key)
+        return converted_data
+    converted_data = None
+    for table, converter in self._segments:
+      if table:
+        converted_data = table.Map(path, svn_url)
+        if converted_data is url_rules.SKIP:
+          converted_data = None
+      elif contexts.get(converter) is not None:
+        converted_data = converter.SvnUrlToGitUrl(path, svn_url,
+                                                  contexts[converter])
+      else:
+        converted_data = converter.SvnUrlToGitUrl(path, svn_url)
+      if converted_data:
+        converted_data = tuple(converted_data)
+        break
+    with self._lock:
+      self.misses += 1
+      self._memo[key] = converted_data
+      self._used.add(key)
+      while len(self._memo) > self.max_entries:
+        self._used.discard(self._memo.popitem(last=False)[0])
+    return converted_data
+
+  def Flush(self):
+    """Save the mappings used so far to the conversion cache, if any."""
+    if not self.conv_cache or not self.fingerprint:
+      return
+    with self._lock:
+      used = dict((key, self._memo[key]) for key in self._used)
+      self._used = set()
+    self.conv_cache.AddUrlMappings(self.fingerprint, used)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Microbenchmarks for mapping SVN URLs through several rules modules."""
+
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import svn_to_git_public
+import url_mapper
+
+
+RULES_MODULE = r"""
+from url_rules import Regex, RuleTable, SKIP
+import svn_to_git_public
+
+RULES = RuleTable('https://private%(index)d.example.com/',
+                  strip=svn_to_git_public.SVN_PREFIX_RE, rules=[
+%(rules)s
+])
+
+def SvnUrlToGitUrl(path, svn_url):
+  result = RULES.Map(path, svn_url)
+  if result is not SKIP:
+    return result
+"""
+
+RULE = (
+    "    Regex('^https?://svn%(rule)d.private%(index)d.example.com/svn/trunk/"
+    "(.*)', 'project%(rule)d/\\1.git'),\n"
+    "    Regex('/trunk/private%(index)d/deps/%(rule)d/(.*)', "
+    "'deps/%(rule)d/\\1.git'),")
+
+# URLs of the public DEPS, all mapped by svn_to_git_public, which comes last.
+PUBLIC_URLS = [
+    '/trunk/deps/third_party/icu46',
+    'http://src.chromium.org/svn/trunk/deps/third_party/libvpx',
+    'http://src.chromium.org/blink/trunk',
+    'http://v8.googlecode.com/svn/trunk',
+    'https://skia.googlecode.com/svn/branches/m34/gyp',
+    'http://webrtc.googlecode.com/svn/trunk/webrtc',
+    'http://src.chromium.org/native_client/trunk/src/native_client',
+    'http://src.chromium.org/llvm-project/cfe/trunk',
+    'svn://svn.chromium.org/boto',
+    '/trunk/tools/deps2git',
+]
+
+
+def _WriteRulesModules(rules_dir, num_modules, num_rules):
+  paths = []
+  for index in xrange(num_modules):
+    rules = '\n'.join(RULE % {'rule': rule, 'index': index}
+                      for rule in xrange(num_rules))
+    path = os.path.join(rules_dir, 'svn_to_git_bench%d.py' % index)
+    with open(path, 'w') as f:
+      f.write(RULES_MODULE % {'index': index, 'rules': rules})
+    paths.append(path)
+  return paths
+
+
+def _Chained(modules):
+  """Try every module in turn, the way deps2git did before merging them."""
+  def _Map(urls):
+    for url in urls:
+      for module in modules:
+        if module.SvnUrlToGitUrl('src/dep', url):
+          break
+  return _Map
+
+
+def _Merged(modules):
+  # No memo, to time the lookups themselves.
+  mapper = url_mapper.UrlMapper(modules, max_entries=0)
+  def _Map(urls):
+    for url in urls:
+      mapper.Map('src/dep', url)
+  return _Map
+
+
+def BenchmarkRulesModules(counts, num_rules, repeat):
+  """Time mapping URLs with an increasing number of extra rules modules."""
+  tmp_dir = tempfile.mkdtemp()
+  try:
+    paths = _WriteRulesModules(tmp_dir, max(counts), num_rules)
+    extra = [url_mapper.LoadRulesModule(path) for path in paths]
+    print ('Mapping %d public URLs behind N modules of %d rules, best of %d:'
+           % (len(PUBLIC_URLS), num_rules * 2, repeat))
+    print '  %-8s %-20s %12s' % ('N', 'mode', 'URLs/s')
+    for count in counts:
+      modules = extra[:count] + [svn_to_git_public]
+      # Private URLs of every module, then the public ones behind them all.
+      urls = ['http://svn0.private%d.example.com/svn/trunk/x' % index
+              for index in xrange(count)] + PUBLIC_URLS
+      urls *= 20
+      for name, mapper in (('chained (before)', _Chained(modules)),
+                           ('merged (after)', _Merged(modules))):
+        # Warm up the lazily compiled indexes.
+        mapper(urls)
+        best = None
+        for _ in xrange(repeat):
+          start = time.time()
+          mapper(urls)
+          elapsed = time.time() - start
+          best = elapsed if best is None else min(best, elapsed)
+        print '  %-8d %-20s %12.0f' % (count, name, len(urls) / best)
+  finally:
+    shutil.rmtree(tmp_dir)
+
+
+def main():
+  parser = optparse.OptionParser()
+  parser.add_option('--modules', default='1,2,4,8,16',
+                    help='comma separated numbers of extra rules modules')
+  parser.add_option('--rules', type='int', default=20,
+                    help='number of rule pairs in each extra rules module')
+  parser.add_option('--repeat', type='int', default=3,
+                    help='number of runs to take the best time from')
+  options = parser.parse_args()[0]
+
+  counts = [int(count) for count in options.modules.split(',')]
+  BenchmarkRulesModules(counts, options.rules, options.repeat)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
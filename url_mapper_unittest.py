@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import collections
+import imp
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import conversion_cache
+import svn_to_git_public
+import url_mapper
+import url_rules
+from url_rules import Regex
+
+
+GIT_HOST = svn_to_git_public.GIT_HOST
+CDM = ('src/third_party/cdm', GIT_HOST + 'chromium/cdm.git', GIT_HOST)
+BOTO = ('src/boto', GIT_HOST + 'external/boto.git', GIT_HOST)
+
+RULES = """
+GIT_HOST = 'https://example.com/'
+
+def SvnUrlToGitUrl(path, svn_url):
+  if svn_url == '/trunk/deps/private':
+    return (path, GIT_HOST + '%s.git', GIT_HOST)
+"""
+
+TABLE_RULES = r"""
+from url_rules import Exact, Regex, RuleTable, SKIP
+import svn_to_git_public
+
+RULES = RuleTable('https://%s.example.com/',
+                  strip=svn_to_git_public.SVN_PREFIX_RE, rules=[
+    Exact('/trunk/deps/cdm', '%s/cdm.git'),
+    Exact('/trunk/deps/third_party/skipped', SKIP),
+    Regex('/trunk/deps/third_party/(%s.*)', '%s/\\1.git'),
+])
+
+def SvnUrlToGitUrl(path, svn_url):
+  raise AssertionError('RULES should be used instead.')
+"""
+
+
+_Context = collections.namedtuple('_Context', ['branch'])
+
+
+class _CountingConverter(object):
+  def __init__(self):
+    self.calls = []
+
+  def SvnUrlToGitUrl(self, path, svn_url, context=None):
+    self.calls.append(svn_url)
+    if svn_url.startswith('/trunk/'):
+      return (path, GIT_HOST + svn_url[len('/trunk/'):] + '.git', GIT_HOST,
+              context and context.branch)
+
+
+class UrlMapperTest(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def _LoadRules(self, repo):
+    path = os.path.join(self.tmp_dir, 'svn_to_git_private.py')
+    with open(path, 'w') as f:
+      f.write(RULES % repo)
+    return imp.load_source('svn_to_git_private', path)
+
+  def _WriteTableRules(self, name):
+    path = os.path.join(self.tmp_dir, 'svn_to_git_%s.py' % name)
+    with open(path, 'w') as f:
+      f.write(TABLE_RULES % ((name,) * 4))
+    return path
+
+  def testLoadRulesModule(self):
+    compiled_dir = os.path.join(self.tmp_dir, 'compiled')
+    path = self._WriteTableRules('one')
+    os.utime(path, (1400000000, 1400000000))
+    module = url_mapper.LoadRulesModule(path, compiled_dir)
+    self.assertTrue(url_mapper.LoadRulesModule(path, compiled_dir) is module)
+    self.assertEqual(1, len(os.listdir(compiled_dir)))
+
+    # The compiled module is used for as long as the file keeps its mtime.
+    del sys.modules['svn_to_git_one']
+    with open(path) as f:
+      source = f.read()
+    with open(path, 'w') as f:
+      f.write(source.replace('one', 'two'))
+    os.utime(path, (1400000000, 1400000000))
+    module = url_mapper.LoadRulesModule(path, compiled_dir)
+    self.assertEqual('https://one.example.com/one/cdm.git',
+                     module.RULES.Map('src/cdm', '/trunk/deps/cdm')[1])
+
+    del sys.modules['svn_to_git_one']
+    os.utime(path, (1400000010, 1400000010))
+    module = url_mapper.LoadRulesModule(path, compiled_dir)
+    self.assertEqual('https://two.example.com/two/cdm.git',
+                     module.RULES.Map('src/cdm', '/trunk/deps/cdm')[1])
+    del sys.modules['svn_to_git_one']
+
+  def testMergedRules(self):
+    modules = [url_mapper.LoadRulesModule(self._WriteTableRules(name))
+               for name in ('first', 'second')]
+    mapper = url_mapper.UrlMapper(modules + [svn_to_git_public])
+    self.assertEqual(1, len(mapper._segments))
+    # Earlier modules take precedence.
+    self.assertEqual(
+        ('src/cdm', 'https://first.example.com/first/cdm.git',
+         'https://first.example.com/'),
+        mapper.Map('src/cdm', 'http://src.chromium.org/svn/trunk/deps/cdm'))
+    self.assertEqual(
+        ('src/x', 'https://second.example.com/second/secondx.git',
+         'https://second.example.com/'),
+        mapper.Map('src/x', '/trunk/deps/third_party/secondx'))
+    # A module skipping a URL leaves it to the next ones.
+    self.assertEqual(
+        ('src/skipped', GIT_HOST + 'chromium/deps/skipped.git', GIT_HOST),
+        mapper.Map('src/skipped', '/trunk/deps/third_party/skipped'))
+    self.assertEqual(None, mapper.Map('src/WebKit',
+                                      '/trunk/deps/third_party/WebKit'))
+    for name in ('first', 'second'):
+      del sys.modules['svn_to_git_%s' % name]
+
+  def testMemo(self):
+    converter = _CountingConverter()
+    mapper = url_mapper.UrlMapper([converter, svn_to_git_public])
+    for _ in xrange(3):
+      self.assertEqual(('src/a', GIT_HOST + 'a.git', GIT_HOST, None),
+                       mapper.Map('src/a', '/trunk/a'))
+      self.assertEqual(BOTO,
+                       mapper.Map('src/boto', 'svn://svn.chromium.org/boto'))
+      self.assertEqual(None, mapper.Map('src/b', '/foo/b'))
+    self.assertEqual(['/trunk/a', 'svn://svn.chromium.org/boto', '/foo/b'],
+                     converter.calls)
+    self.assertEqual((6, 3), (mapper.hits, mapper.misses))
+    # The contexts of the converters are passed on, and part of the key.
+    for branch in ('1750', '1750', '1650'):
+      self.assertEqual(
+          ('src/a', GIT_HOST + 'a.git', GIT_HOST, branch),
+          mapper.Map('src/a', '/trunk/a', {converter: _Context(branch)}))
+    self.assertEqual((7, 5), (mapper.hits, mapper.misses))
+
+  def testEviction(self):
+    converter = _CountingConverter()
+    mapper = url_mapper.UrlMapper([converter], max_entries=2)
+    mapper.Map('src/a', '/trunk/a')
+    mapper.Map('src/b', '/trunk/b')
+    mapper.Map('src/a', '/trunk/a')
+    mapper.Map('src/c', '/trunk/c')
+    mapper.Map('src/a', '/trunk/a')
+    mapper.Map('src/b', '/trunk/b')
+    self.assertEqual(['/trunk/a', '/trunk/b', '/trunk/c', '/trunk/b'],
+                     converter.calls)
+
+  def testPersists(self):
+    cache = conversion_cache.Open(self.tmp_dir)
+    rules = self._LoadRules('private')
+    mapper = url_mapper.UrlMapper([rules, svn_to_git_public], conv_cache=cache)
+    mapper.Map('src/private', '/trunk/deps/private')
+    mapper.Map('src/third_party/cdm', '/trunk/deps/cdm')
+    mapper.Map('src/foo', '/trunk/deps/third_party/foo')
+    mapper.Flush()
+
+    mapper = url_mapper.UrlMapper([rules, svn_to_git_public], conv_cache=cache)
+    self.assertEqual(
+        ('src/private', 'https://example.com/private.git',
+         'https://example.com/'),
+        mapper.Map('src/private', '/trunk/deps/private'))
+    self.assertEqual(CDM, mapper.Map('src/third_party/cdm', '/trunk/deps/cdm'))
+    self.assertEqual(
+        ('src/foo', GIT_HOST + 'chromium/deps/foo.git', GIT_HOST),
+        mapper.Map('src/foo', '/trunk/deps/third_party/foo'))
+    self.assertEqual((3, 0), (mapper.hits, mapper.misses))
+
+    # Changing a rules file invalidates the saved mappings.
+    rules = self._LoadRules('private2')
+    mapper = url_mapper.UrlMapper([rules, svn_to_git_public], conv_cache=cache)
+    self.assertEqual(
+        ('src/private', 'https://example.com/private2.git',
+         'https://example.com/'),
+        mapper.Map('src/private', '/trunk/deps/private'))
+    self.assertEqual((0, 1), (mapper.hits, mapper.misses))
+    cache.Close()
+
+
+class RuleTableTest(unittest.TestCase):
+  def testBackreferences(self):
+    table = url_rules.RuleTable(GIT_HOST, [
+        Regex(r'/(a)(b)(c)/(?P<name>\w+)\Z', 'abc/\\4.git'),
+        Regex(r'/(\w+)/\1/(?P<name>\w+)/(?P=name)\Z', '\\1/\\2.git'),
+        Regex(r'/(x)?(?(1)y|z)/(\w+)\Z', 'xyz/\\2.git'),
+        # Octal escapes, not backreferences.
+        Regex(r'/octal/(\w)\101\Z', 'octal/\\1.git'),
+        Regex(r'/class/(?P<name>[\1]+)\Z', 'class.git'),
+    ])
+    for url, repo in (('/abc/d', 'abc/d.git'),
+                      ('/a/a/b/b', 'a/b.git'),
+                      ('/xy/d', 'xyz/d.git'),
+                      ('/z/d', 'xyz/d.git'),
+                      ('/octal/qA', 'octal/q.git'),
+                      ('/class/\x01', 'class.git')):
+      self.assertEqual(('src/d', GIT_HOST + repo, GIT_HOST),
+                       table.Map('src/d', url), url)
+    for url in ('/a/b/c/c', '/a/a/b/c', '/xz/d', '/y/d', '/octal/qq'):
+      self.assertEqual(None, table.Map('src/d', url), url)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,335 @@
+#!/usr/bin/python
+# Copyright (c) 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Declarative SVN URL to Git URL mapping rules, compiled for fast dispatch.
+
+A rules module lists its mappings as an ordered table of Regex and Exact
+rules.  RuleTable compiles them once: the rules that can apply to a URL only
+depend on its host (or on it being a bare '/path') and on the literal text
+its path starts with, so the table is split into buckets keyed by those, and
+each bucket is matched with a single combined regex instead of trying the
+rules one by one.  The first rule that matches wins, exactly as with a chain
+of 'if re.match(...)' tests.
+
+A rules module exposing its table as RULES is mapped with it directly, which
+lets url_mapper merge the tables of several modules into a single index;
+its SvnUrlToGitUrl() must then map URLs as RULES.Map() does, returning None
+for SKIP."""
+
+import os
+import re
+
+
+# Result of a rule for URLs that are deliberately not converted.
+SKIP = object()
+
+# Python 2 compiles at most 100 groups into one regex.
+_MAX_GROUPS = 99
+
+# Captures the host of 'scheme://host/...' URLs.
+_URL_HOST_RE = re.compile(r'[^/]*://([^/]*)')
+
+# Captures the host of rule patterns starting with a literal
+# 'scheme://host/'.  The dots of the host are left unescaped in patterns and
+# are matched as regex dots, like the rest of the pattern.
+_PATTERN_HOST_RE = re.compile(r'\^?[a-z]+\??://([A-Za-z0-9.-]+)/')
+
+_GROUP_REF_RE = re.compile(r'\\(\d+)')
+
+# Splits a pattern into the tokens _Renumber() rewrites, and single
+# characters.  A backslash and three octal digits, or a zero and up to two
+# more, are an octal escape rather than a backreference.
+_PATTERN_TOKEN_RE = re.compile(r'''
+    \\[0-7]{3} | \\0[0-7]{0,2} |
+    \\(?P<ref>[1-9][0-9]?) |
+    \\. |
+    \[\^?\]?(?:\\.|[^\]\\])*\] |
+    \(\?P<(?P<group>\w+)> |
+    \(\?P=(?P<named_ref>\w+)\) |
+    \(\?\((?P<condition>\w+)\) |
+    .''', re.VERBOSE | re.DOTALL)
+
+
+def _LiteralPrefix(pattern):
+  """Return the literal text all the strings matching pattern start with.
+
+  Return None if pattern has top-level alternatives or inline flags, which
+  may make even its beginning match other strings."""
+  prefix = []
+  literal = True
+  depth = 0
+  i = 0
+  while i < len(pattern):
+    c = pattern[i]
+    i += 1
+    if c == '\\':
+      c = pattern[i:i + 1]
+      i += 1
+      if c.isalnum() or not c:
+        literal = False
+        continue
+    elif c == '[':
+      # Skip the character class; ']' right after '[' or '[^' is literal.
+      if pattern[i:i + 1] == '^':
+        i += 1
+      if pattern[i:i + 1] == ']':
+        i += 1
+      while i < len(pattern) and pattern[i] != ']':
+        i += 2 if pattern[i] == '\\' else 1
+      i += 1
+      literal = False
+      continue
+    elif c == '(':
+      if pattern[i:i + 1] == '?' and pattern[i + 1:i + 2] in 'iLmsux':
+        return None
+      depth += 1
+      literal = False
+      continue
+    elif c == ')':
+      depth -= 1
+      continue
+    elif c == '|':
+      if depth == 0:
+        return None
+      continue
+    elif c in '.^$*+?{':
+      if literal and c in '*?{' and prefix:
+        # The previous character is optional.
+        prefix.pop()
+      literal = False
+      continue
+    if literal:
+      prefix.append(c)
+  return ''.join(prefix)
+
+
+class Rule(object):
+  """Maps the SVN URLs matching pattern to a Git repository.
+
+  repo and branch are templates expanded with the groups matched by pattern,
+  referred to as \\1, \\2...  repo may instead be SKIP.  path, if given, is
+  called with the checkout path and returns the path to use instead."""
+
+  def __init__(self, pattern, repo, branch=None, path=None):
+    self.pattern = pattern
+    self.regex = re.compile(pattern)
+    self.repo = repo
+    self.branch = branch
+    self.path = path
+    # The host of the URLs the rule can match, or None if it can match any,
+    # and the literal text their path starts with.
+    self.host = None
+    self.path_prefix = ''
+    if _LiteralPrefix(pattern) is None:
+      return
+    if pattern.startswith('/'):
+      self.host = '/'
+      self.path_prefix = _LiteralPrefix(pattern)
+    else:
+      match = _PATTERN_HOST_RE.match(pattern)
+      if match:
+        self.host = re.compile(match.group(1) + r'\Z')
+        self.path_prefix = _LiteralPrefix(pattern[match.end() - 1:]) or ''
+
+  def AppliesTo(self, host, path_prefix):
+    """Return whether URLs with that host and path prefix might match.
+
+    See _UrlHost() and _UrlPath()."""
+    if not path_prefix.startswith(self.path_prefix):
+      return False
+    if not self.host:
+      return True
+    if self.host == '/' or host == '/':
+      return self.host == host
+    return bool(self.host.match(host))
+
+  def Result(self, git_host, path, groups):
+    if self.repo is SKIP:
+      return SKIP
+    if self.path:
+      path = self.path(path)
+    result = (path, git_host + _Expand(self.repo, groups), git_host)
+    if self.branch:
+      result += (_Expand(self.branch, groups),)
+    return result
+
+
+def Regex(pattern, repo, branch=None, path=None):
+  """A rule for the URLs that re.match(pattern, url)."""
+  return Rule(pattern, repo, branch, path)
+
+
+def Exact(urls, repo, branch=None, path=None):
+  """A rule for the URLs equal to urls, a string or a tuple of strings."""
+  if isinstance(urls, basestring):
+    urls = (urls,)
+  rule = Rule('(?:%s)\\Z' % '|'.join(re.escape(url) for url in urls),
+              repo, branch, path)
+  # re.escape() escapes the dots of the host too, so take it from the URLs.
+  rule.host = None
+  rule.path_prefix = ''
+  hosts = set(_UrlHost(url) for url in urls)
+  if len(hosts) == 1 and '' not in hosts:
+    host = hosts.pop()
+    if host != '/':
+      host = re.compile(re.escape(host) + r'\Z')
+    rule.host = host
+    rule.path_prefix = os.path.commonprefix([_UrlPath(url) for url in urls])
+  return rule
+
+
+def _Expand(template, groups):
+  return _GROUP_REF_RE.sub(lambda m: groups[int(m.group(1)) - 1] or '',
+                           template)
+
+
+def _Renumber(rule, offset):
+  """Return the pattern of rule with its groups numbered from offset + 1.
+
+  The names of its groups are dropped, since several rules of a combined
+  regex may use the same name, and its backreferences are renumbered to
+  match."""
+  def _Group(name):
+    if name.isdigit():
+      return offset + int(name)
+    return offset + rule.regex.groupindex[name]
+
+  def _Token(match):
+    if match.group('group'):
+      return '('
+    ref = match.group('ref') or match.group('named_ref')
+    if ref:
+      # Grouped, so that a digit after it isn't read as part of it.
+      return '(?:\\%d)' % _Group(ref)
+    if match.group('condition'):
+      return '(?(%d)' % _Group(match.group('condition'))
+    return match.group(0)
+
+  return _PATTERN_TOKEN_RE.sub(_Token, rule.pattern)
+
+
+def _UrlHost(url):
+  """Return the host of url, '/' for bare paths and '' for anything else."""
+  if url.startswith('/'):
+    return '/'
+  match = _URL_HOST_RE.match(url)
+  return match.group(1) if match else ''
+
+
+def _UrlPath(url):
+  """Return the part of url after its host, or url if it has none."""
+  match = _URL_HOST_RE.match(url)
+  return url[match.end():] if match and not url.startswith('/') else url
+
+
+class RuleTable(object):
+  """An ordered list of rules, compiled into per-host combined regexes.
+
+  If strip is given, the URLs it matches are replaced by its last group
+  before being matched against the rules."""
+
+  def __init__(self, git_host, rules, strip=None):
+    self.strip = strip
+    self.rules = list(rules)
+    # The git host and index of the table each rule comes from; see Merge().
+    self._git_hosts = [git_host]
+    self._owners = [0] * len(self.rules)
+    # The path prefixes of the rules, and their lengths, longest first.
+    self._path_prefixes = None
+    self._path_prefix_lengths = None
+    # (host, path prefix, first owner) -> [(combined regex, {outer group
+    # index: (rule, owner)})].  Filled lazily; racing threads compute
+    # identical buckets, so there is no lock.
+    self._buckets = {}
+
+  def _PathPrefix(self, path):
+    """Return the longest path prefix of a rule that path starts with."""
+    if self._path_prefixes is None:
+      prefixes = set(rule.path_prefix for rule in self.rules)
+      self._path_prefix_lengths = sorted(set(len(p) for p in prefixes),
+                                         reverse=True)
+      self._path_prefixes = prefixes
+    for length in self._path_prefix_lengths:
+      if path[:length] in self._path_prefixes:
+        return path[:length]
+    return ''
+
+  def _Bucket(self, host, path_prefix, first_owner):
+    key = (host, path_prefix, first_owner)
+    bucket = self._buckets.get(key)
+    if bucket is None:
+      bucket = []
+      patterns = []
+      rules = {}
+      groups = 0
+      for rule, owner in zip(self.rules, self._owners):
+        if owner < first_owner or not rule.AppliesTo(host, path_prefix):
+          continue
+        if groups + 1 + rule.regex.groups > _MAX_GROUPS:
+          bucket.append((re.compile('|'.join(patterns)), rules))
+          patterns, rules, groups = [], {}, 0
+        # Wrap each rule in a group to tell which one matched.
+        patterns.append('(%s)' % _Renumber(rule, groups + 1))
+        rules[groups + 1] = (rule, owner)
+        groups += 1 + rule.regex.groups
+      if patterns:
+        bucket.append((re.compile('|'.join(patterns)), rules))
+      self._buckets[key] = bucket
+    return bucket
+
+  def Strip(self, svn_url):
+    """Return svn_url as the rules see it."""
+    if self.strip:
+      match = self.strip.match(svn_url)
+      if match:
+        return match.group(self.strip.groups)
+    return svn_url
+
+  def Map(self, path, svn_url):
+    """Return the result of the first rule matching svn_url.
+
+    That is a (path, git_url, git_host[, svn_branch]) tuple, or SKIP.  Return
+    None if no rule matches."""
+    svn_url = self.Strip(svn_url)
+    host = _UrlHost(svn_url)
+    path_prefix = self._PathPrefix(_UrlPath(svn_url))
+    first_owner = 0
+    skipped = False
+    while first_owner < len(self._git_hosts):
+      for regex, rules in self._Bucket(host, path_prefix, first_owner):
+        match = regex.match(svn_url)
+        if match:
+          # The group of the matching rule is the outermost, so closes last.
+          index = match.lastindex
+          rule, owner = rules[index]
+          groups = match.groups()[index:index + rule.regex.groups]
+          result = rule.Result(self._git_hosts[owner], path, groups)
+          if result is not SKIP:
+            return result
+          # A table skipping a URL leaves it to the next tables.
+          skipped = True
+          first_owner = owner + 1
+          break
+      else:
+        break
+    return SKIP if skipped else None
+
+
+def Merge(tables):
+  """Return a RuleTable trying each of tables in turn, as one index.
+
+  A URL that a table maps to SKIP is matched against the next tables.  The
+  tables must strip URLs the same way."""
+  strips = set(table.strip and table.strip.pattern for table in tables)
+  if len(strips) > 1:
+    raise ValueError('Can\'t merge rule tables stripping different prefixes.')
+  merged = RuleTable(None, [], tables[0].strip)
+  merged._git_hosts = []
+  for table in tables:
+    offset = len(merged._git_hosts)
+    merged.rules.extend(table.rules)
+    merged._owners.extend(offset + owner for owner in table._owners)
+    merged._git_hosts.extend(table._git_hosts)
+  return merged